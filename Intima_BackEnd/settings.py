@@ -18,10 +18,68 @@ load_dotenv(dotenv_path=Path(".env.dev"))
 
 # Weaviate settings
 WEAVIATE_URL = os.environ.get('WEAVIATE_URL', 'http://localhost:8080')
+WEAVIATE_HEALTH_CHECK_INTERVAL = int(os.environ.get('WEAVIATE_HEALTH_CHECK_INTERVAL', 30))  # seconds between background liveness checks
 
 # OpenAI settings
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 
+# Shared OpenAI client: timeouts, retries and keep-alive connection pool
+OPENAI_READ_TIMEOUT = float(os.environ.get('OPENAI_READ_TIMEOUT', 60))  # seconds
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5))  # seconds
+OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 2))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 50))
+OPENAI_ASYNC_MAX_CONNECTIONS = int(os.environ.get('OPENAI_ASYNC_MAX_CONNECTIONS', 500))  # per ASGI worker event loop
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 60))  # seconds an idle connection is kept
+
+# Embedding sizes stored as Weaviate named vectors, all derived from one 3072-d embedding
+EMBEDDING_VECTOR_DIMENSIONS = [
+    int(dimensions) for dimensions in os.environ.get('EMBEDDING_VECTOR_DIMENSIONS', '256,1536,3072').split(',')
+]
+EMBEDDING_SEARCH_DIMENSIONS = int(os.environ.get('EMBEDDING_SEARCH_DIMENSIONS', 1536))  # default query size
+
+# Batch ingestion settings
+EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 256))  # texts per embeddings request
+WEAVIATE_BATCH_SIZE = int(os.environ.get('WEAVIATE_BATCH_SIZE', 100))  # objects per insert_many call
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 4))
+CHUNK_MAX_TOKENS = int(os.environ.get('CHUNK_MAX_TOKENS', 400))  # tokens per stored chunk
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', 50))  # tokens shared by consecutive chunks
+INGEST_CHECKPOINT_PATH = os.environ.get('INGEST_CHECKPOINT_PATH', os.path.join(BASE_DIR, '.ingest_checkpoint.jsonl'))
+
+# Near-duplicate documents (MinHash over word shingles) share a cluster_id at ingest
+DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', 'True') == 'True'
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.8))  # estimated Jaccard similarity
+DEDUP_SKIP_DUPLICATES = os.environ.get('DEDUP_SKIP_DUPLICATES', 'False') == 'True'  # store one document per cluster
+
+# Local BM25 index over the documents directory, used when Weaviate or OpenAI is down
+LEXICAL_INDEX_PATH = os.environ.get('LEXICAL_INDEX_PATH', os.path.join(BASE_DIR, '.lexical_index.json.gz'))
+
+# Background ingestion of AIDocument uploads (run_ingest_worker)
+INGEST_WORKER_CONCURRENCY = int(os.environ.get('INGEST_WORKER_CONCURRENCY', 2))  # jobs in parallel per worker process
+INGEST_POLL_INTERVAL_SECONDS = float(os.environ.get('INGEST_POLL_INTERVAL_SECONDS', 5))
+INGEST_MAX_ATTEMPTS = int(os.environ.get('INGEST_MAX_ATTEMPTS', 5))
+INGEST_RETRY_BASE_SECONDS = int(os.environ.get('INGEST_RETRY_BASE_SECONDS', 30))
+INGEST_JOB_TIMEOUT_SECONDS = int(os.environ.get('INGEST_JOB_TIMEOUT_SECONDS', 900))  # reclaim jobs stuck in processing
+
+# Embedding cache: in-process LRU in front of the EmbeddingCacheEntry table
+EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'True') == 'True'
+EMBEDDING_CACHE_LRU_SIZE = int(os.environ.get('EMBEDDING_CACHE_LRU_SIZE', 2048))  # vectors kept per process (~12 KB each at 3072-d)
+EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get('EMBEDDING_CACHE_MAX_ROWS', 100000))  # rows kept in the database
+EMBEDDING_CACHE_PRUNE_EVERY = int(os.environ.get('EMBEDDING_CACHE_PRUNE_EVERY', 1000))  # inserts between evictions
+EMBEDDING_CACHE_DTYPE = os.environ.get('EMBEDDING_CACHE_DTYPE', 'float32')  # or 'float16' to halve storage
+
+# OpenAI embedding quotas used to pace ingestion
+OPENAI_EMBEDDING_RPM = int(os.environ.get('OPENAI_EMBEDDING_RPM', 3000))  # requests per minute
+OPENAI_EMBEDDING_TPM = int(os.environ.get('OPENAI_EMBEDDING_TPM', 1000000))  # tokens per minute
+
+# Semantic answer cache: reuse chat answers for near-duplicate questions
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'True') == 'True'
+ANSWER_CACHE_MAX_DISTANCE = float(os.environ.get('ANSWER_CACHE_MAX_DISTANCE', 0.05))  # cosine distance; 0.05 ~ 0.95 similarity
+ANSWER_CACHE_DIMENSIONS = int(os.environ.get('ANSWER_CACHE_DIMENSIONS', EMBEDDING_SEARCH_DIMENSIONS))  # question vector size
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', 50000))
+ANSWER_CACHE_PRUNE_EVERY = int(os.environ.get('ANSWER_CACHE_PRUNE_EVERY', 200))  # stores between evictions
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -85,6 +143,68 @@ DATABASES = {
     }
 }
 
+# Caches: 'default' stays per-process; 'shared' is visible to every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',  # created by `manage.py createcachetable`
+    },
+}
+
+# Search result cache (invalidated by every document write/delete)
+SEARCH_CACHE_ENABLED = os.environ.get('SEARCH_CACHE_ENABLED', 'True') == 'True'
+SEARCH_CACHE_ALIAS = os.environ.get('SEARCH_CACHE_ALIAS', 'shared')
+SEARCH_CACHE_TIMEOUT = int(os.environ.get('SEARCH_CACHE_TIMEOUT', 3600))  # seconds
+
+# Re-ranking of search results: duplicate collapsing and maximal marginal relevance (chat's default)
+MMR_FETCH_FACTOR = int(os.environ.get('MMR_FETCH_FACTOR', 4))  # candidates fetched per returned result
+SEARCH_COLLAPSE_DUPLICATES = os.environ.get('SEARCH_COLLAPSE_DUPLICATES', 'True') == 'True'  # one hit per duplicate cluster
+CHAT_MMR_ENABLED = os.environ.get('CHAT_MMR_ENABLED', 'True') == 'True'
+CHAT_MMR_LAMBDA = float(os.environ.get('CHAT_MMR_LAMBDA', 0.5))  # 1 = relevance only ... 0 = diversity only
+
+# Cursor pagination of chat history and conversation lists (newest first, cursors load older items)
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', 50))  # messages per page
+CONVERSATION_PAGE_SIZE = int(os.environ.get('CONVERSATION_PAGE_SIZE', 50))  # conversations per page
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 200))  # upper bound for ?limit=
+
+# Chat messages are written with one SQL statement per request, or (write-behind) queued and bulk-inserted
+# by a background thread; the queue is flushed at exit, so only a hard kill can lose queued messages
+CHAT_WRITE_BEHIND_ENABLED = os.environ.get('CHAT_WRITE_BEHIND_ENABLED', 'False') == 'True'
+CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('CHAT_WRITE_BEHIND_BATCH_SIZE', 100))  # messages per bulk insert
+CHAT_WRITE_BEHIND_INTERVAL = float(os.environ.get('CHAT_WRITE_BEHIND_INTERVAL', 1.0))  # seconds between flushes
+CHAT_WRITE_BEHIND_MAX_PENDING = int(os.environ.get('CHAT_WRITE_BEHIND_MAX_PENDING', 5000))  # requests flush inline beyond this
+
+# A retried chat request waits this long (seconds) for the in-flight request with the same message_id,
+# in any worker: message_id claims always take a lock in the SINGLE_FLIGHT_CACHE_ALIAS cache
+CHAT_IN_FLIGHT_TIMEOUT = float(os.environ.get('CHAT_IN_FLIGHT_TIMEOUT', 60))
+
+# Single-flight: identical concurrent embedding and chat completion calls run once and share the result.
+# A streamed chat that joins another request's completion gets the finished answer as a single token
+SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'True') == 'True'
+SINGLE_FLIGHT_SHARED = os.environ.get('SINGLE_FLIGHT_SHARED', 'False') == 'True'  # also across workers, via a lock in the cache
+SINGLE_FLIGHT_CACHE_ALIAS = os.environ.get('SINGLE_FLIGHT_CACHE_ALIAS', 'shared')
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 60))  # seconds a follower waits for the leader
+SINGLE_FLIGHT_RESULT_TTL = int(os.environ.get('SINGLE_FLIGHT_RESULT_TTL', 10))  # seconds other workers can pick up a result
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get('SINGLE_FLIGHT_POLL_INTERVAL', 0.1))  # seconds between cross-worker checks
+
+# Chat prompts are cached per process; their file's mtime is checked at most this often
+PROMPT_RELOAD_INTERVAL = int(os.environ.get('PROMPT_RELOAD_INTERVAL', 5))  # seconds
+
+# Token budget for the context documents sent with each chat prompt
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', 3000))
+CHAT_CONTEXT_TOKEN_BUDGETS = {  # per-model overrides
+    'gpt-4': int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET_GPT4', 1500)),  # 8k context window
+}
+
+# In-process NumPy copy of the Document vectors, refreshed from Weaviate when the knowledge base changes
+LOCAL_VECTOR_INDEX_ENABLED = os.environ.get('LOCAL_VECTOR_INDEX_ENABLED', 'False') == 'True'
+LOCAL_VECTOR_INDEX_DIR = os.environ.get('LOCAL_VECTOR_INDEX_DIR', os.path.join(BASE_DIR, '.vector_index'))
+LOCAL_VECTOR_INDEX_MAX_ROWS = int(os.environ.get('LOCAL_VECTOR_INDEX_MAX_ROWS', 100000))  # larger collections stay in Weaviate
+LOCAL_VECTOR_INDEX_MAX_AGE = int(os.environ.get('LOCAL_VECTOR_INDEX_MAX_AGE', 3600))  # seconds before a snapshot is re-fetched anyway
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
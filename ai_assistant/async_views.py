@@ -0,0 +1,273 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .utils.answer_cache import answer_cache, document_set_hash
+from .utils.chat_store import find_chat_message, save_chat_message
+from .utils.single_flight import chat_request_flights, completion_flights
+from .utils.openai_client import get_async_openai_client
+from .utils.weaviate_client import get_async_weaviate_manager
+from .views import ChatAPIView, ChatRateThrottle, SearchAPIView, SearchRateThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """Base for native async endpoints served under ASGI.
+
+    DRF's APIView is synchronous, so these are plain Django views that
+    replicate the parts of the DRF pipeline the chat and search endpoints
+    rely on: JSON bodies, JWT authentication and throttling. OpenAI and
+    Weaviate calls are awaited, so one worker can hold many requests in
+    flight; the (short) database work, including saving the chat message,
+    runs in a thread via ``sync_to_async``.
+    """
+
+    http_method_names = ['post']
+    require_authentication = True
+    throttle_classes = []
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            self.data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Request body must be valid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+
+        request.user = await self._authenticate(request) or AnonymousUser()
+        if request.user.is_anonymous and self.require_authentication:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided or are invalid."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                return JsonResponse(
+                    {"detail": "Request was throttled."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(int(throttle.wait() or 1))}
+                )
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def _authenticate(self, request):
+        """Return the user for the request's JWT, or None"""
+        try:
+            # Token validation is CPU-only, but loading the user hits the database
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except APIException:
+            return None
+        if result is None:
+            return None
+        return result[0]
+
+
+class AsyncSearchAPIView(AsyncAPIView):
+    """Async equivalent of SearchAPIView"""
+
+    require_authentication = False
+    throttle_classes = [SearchRateThrottle]
+
+    async def post(self, request):
+        search = SearchAPIView()
+        try:
+            options, error = search._parse_search_options(self.data)
+            if error:
+                return JsonResponse(error, status=status.HTTP_400_BAD_REQUEST)
+
+            manager = get_async_weaviate_manager(admin_access=True)
+            results = await manager.search_documents(
+                options['question'], limit=options['limit'], embedding_dimensions=options['embedding_dimensions'],
+                alpha=options['alpha'], fusion_type=options['fusion_type'], mmr_lambda=options['mmr_lambda']
+            )
+            return JsonResponse(search._search_payload(options, results))
+
+        except Exception as e:
+            logger.error(f"Async search API error: {e}", exc_info=True)
+            return JsonResponse(
+                {"error": "An error occurred while searching. Please try again."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AsyncChatAPIView(AsyncAPIView):
+    """Async equivalent of ChatAPIView (same request and response format)"""
+
+    throttle_classes = [ChatRateThrottle]
+
+    async def post(self, request):
+        chat = ChatAPIView()
+        try:
+            options, error = chat._parse_chat_options(self.data, request.user)
+            if error:
+                return JsonResponse(error, status=status.HTTP_400_BAD_REQUEST)
+
+            # A retried message_id gets the stored answer instead of a second pipeline run
+            flight, stored = await self._claim_message_id(options)
+            if flight is None:
+                return self._replay_response(chat, options, stored)
+            try:
+                payload, record = await self._answer(chat, options)
+            except BaseException:
+                await flight.afail()
+                raise
+            await flight.afinish(record)
+            if payload is None:
+                # Another worker saved this message_id first; answer with its message
+                return self._replay_response(chat, options, record)
+            return JsonResponse(payload)
+
+        except Exception as e:
+            logger.error(f"Async chat API error: {e}", exc_info=True)
+            return JsonResponse({
+                "success": False,
+                "message": "An error occurred while processing your request",
+                "error": str(e),
+                "error_code": "INTERNAL_ERROR",
+                "conversation_id": self.data.get('conversation_id'),
+                "message_id": self.data.get('message_id'),
+                "timestamp": timezone.now().isoformat()
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def _answer(self, chat, options):
+        """Async ``ChatAPIView._answer``"""
+        user = options['user']
+        question = options['question']
+        message_id = options['message_id']
+        model = options['model']
+
+        # Served from memory; the registry only stats the file every PROMPT_RELOAD_INTERVAL seconds
+        prompt = chat._load_prompt()
+        manager = get_async_weaviate_manager(admin_access=True)
+
+        results, search_error_type = await self._retrieve(chat, manager, question, options)
+        context, sources, packing = chat._build_context(results, model)
+
+        if not context:
+            answer = chat._no_context_answer(search_error_type)
+            record, created = await self._save_message(
+                user, options['conversation_id'], message_id, question, answer, model, []
+            )
+            return (chat._no_context_payload(options, answer) if created else None), record
+
+        # Near-duplicate questions over the same documents reuse a cached answer
+        question_embedding, cached_answer = None, None
+        if options['use_answer_cache'] and search_error_type is None:
+            question_embedding = await answer_cache.aembed(question)
+            cache_key = {
+                "doc_set_hash": document_set_hash(results),
+                "prompt_version": prompt.version,
+                "model": model,
+            }
+            if question_embedding is not None:
+                cached_answer = await answer_cache.alookup(manager, question_embedding, **cache_key)
+
+        if cached_answer:
+            answer = cached_answer["answer"]
+            ai_model_used = model
+        else:
+            try:
+                # Identical questions in flight over the same documents share one completion
+                (answer, total_tokens), is_leader = await completion_flights.ado(
+                    chat._completion_key(question, prompt, model, results),
+                    lambda: self._generate_response(chat, question, context, prompt, model),
+                    shared=True, cacheable=lambda result: result[1] is not None
+                )
+                ai_model_used = model
+                if is_leader and question_embedding is not None and total_tokens:
+                    await answer_cache.astore(
+                        manager, question, question_embedding,
+                        answer=answer, sources=sources, total_tokens=total_tokens, **cache_key
+                    )
+            except Exception as openai_error:
+                logger.warning(f"OpenAI response generation failed: {openai_error}")
+                answer = chat._generate_simple_response(question, context)
+                ai_model_used = "fallback-simple"
+
+        record, created = await self._save_message(
+            user, options['conversation_id'], message_id, question, answer, ai_model_used, sources, prompt.version
+        )
+        if not created:
+            return None, record
+
+        return chat._answer_payload(
+            options, answer, sources, ai_model_used, search_error_type, context, results,
+            chat._answer_cache_summary(question_embedding, cached_answer), packing
+        ), record
+
+    async def _claim_message_id(self, options):
+        """Async ``ChatAPIView._claim_message_id``"""
+        message_id = options['message_id']
+        while True:
+            flight = await chat_request_flights.ajoin(message_id, shared=True)
+            if flight.timed_out:
+                return None, None
+            if not flight.leader:
+                if flight.result is not None:
+                    return None, flight.result
+                continue
+            try:
+                stored = await sync_to_async(find_chat_message)(message_id) if options['user'] else None
+            except BaseException:
+                await flight.afail()
+                raise
+            if stored is not None:
+                await flight.afinish(stored)
+                return None, stored
+            return flight, None
+
+    def _replay_response(self, chat, options, stored):
+        error = chat._replay_error(options, stored)
+        if error:
+            return JsonResponse(error, status=status.HTTP_409_CONFLICT)
+        return JsonResponse(chat._replay_payload(options, stored))
+
+    async def _retrieve(self, chat, manager, question, options):
+        """Async ``ChatAPIView._retrieve``"""
+        try:
+            results = await manager.search_documents(
+                question, limit=options['limit'], alpha=options['alpha'], fusion_type=options['fusion_type'],
+                mmr_lambda=options['mmr_lambda'], raise_errors=True
+            )
+            return results, None
+        except Exception as search_error:
+            logger.error(f"Vector search failed: {search_error}", exc_info=True)
+            results = await sync_to_async(chat._fallback_document_search)(question, options['limit'])
+            return results, chat._classify_search_error(search_error)
+
+    async def _save_message(self, user, conversation_id, message_id, question, answer, model_used, sources,
+                            prompt_version=''):
+        if user:
+            return await sync_to_async(save_chat_message)(
+                user, conversation_id, message_id, question, answer, model_used, sources, prompt_version
+            )
+        return None, True
+
+    async def _generate_response(self, chat, question, context, prompt, model):
+        """Async ``ChatAPIView._generate_response_with_custom_prompt``, returning ``(answer, total_tokens)``"""
+        try:
+            response = await get_async_openai_client().chat.completions.create(
+                model=model,
+                messages=chat._build_messages(question, context, prompt),
+                temperature=0.3,
+                max_tokens=1000,
+            )
+            total_tokens = response.usage.total_tokens if response.usage else None
+            return response.choices[0].message.content, total_tokens
+
+        except Exception as e:
+            logger.error(f"Error generating AI response: {e}", exc_info=True)
+            return "I apologize, but I encountered an error while generating the response. Please try again.", None
+
@@ -0,0 +1,74 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Measure the concurrent-request capacity of a running chat or search endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Endpoint to load, e.g. http://localhost:8000/ai/chat/async/')
+        parser.add_argument('--concurrency', default='1,10,50,100',
+                            help='Comma-separated numbers of requests kept in flight')
+        parser.add_argument('--requests', type=int, default=200, help='Requests sent at each concurrency level')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer Authorization header')
+        parser.add_argument('--question', default='Is the morning-after pill safe?')
+        parser.add_argument('--vary-question', action='store_true',
+                            help='Make every question unique so the search and answer caches never hit')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        self.stdout.write(f"Benchmarking {options['url']} with {options['requests']} requests per level")
+        self.stdout.write(f"{'concurrency':>11} {'ok':>5} {'429':>5} {'errors':>6} {'req/s':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+
+        for level in levels:
+            result = asyncio.run(self._run_level(level, options))
+            latencies = sorted(result['latencies']) or [0.0]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{level:>11} {result['ok']:>5} {result['throttled']:>5} {result['errors']:>6} "
+                f"{result['ok'] / result['elapsed']:>8.1f} {statistics.median(latencies) * 1000:>8.0f} "
+                f"{p95 * 1000:>8.0f} {latencies[-1] * 1000:>8.0f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    async def _run_level(self, concurrency, options):
+        headers = {'Content-Type': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+
+        result = {'ok': 0, 'throttled': 0, 'errors': 0, 'latencies': []}
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(headers=headers, timeout=options['timeout'], limits=limits) as client:
+            async def send(index):
+                question = options['question']
+                if options['vary_question']:
+                    question = f"{question} (benchmark {time.time_ns()}-{index})"
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(options['url'], json={'question': question})
+                    except httpx.HTTPError:
+                        result['errors'] += 1
+                        return
+                    if response.status_code == 429:
+                        result['throttled'] += 1
+                    elif response.status_code < 400:
+                        result['ok'] += 1
+                        result['latencies'].append(time.perf_counter() - started)
+                    else:
+                        result['errors'] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(send(index) for index in range(options['requests'])))
+            result['elapsed'] = max(time.perf_counter() - started, 1e-6)
+
+        return result
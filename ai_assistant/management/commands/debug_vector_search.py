@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from ai_assistant.utils.weaviate_client import WeaviateManager
-from knowledgebase.vectorization import generate_embedding
+from knowledgebase.vectorization import generate_embedding, SEARCH_DIMENSIONS, vector_name
 
 class Command(BaseCommand):
     help = 'Debug vector search functionality'
@@ -11,7 +11,7 @@ class Command(BaseCommand):
         with WeaviateManager(admin_access=True) as manager:
             # Step 1: Test embedding generation
             try:
-                embedding = generate_embedding(query)
+                embedding = generate_embedding(query, dimensions=SEARCH_DIMENSIONS)
                 self.stdout.write(f"✓ Embedding generated: {len(embedding)} dimensions")
             except Exception as e:
                 self.stdout.write(f"✗ Embedding failed: {e}")
@@ -42,6 +42,7 @@ class Command(BaseCommand):
             try:
                 result = documents.query.near_vector(
                     near_vector=embedding,
+                    target_vector=vector_name(SEARCH_DIMENSIONS),
                     limit=5,
                     return_properties=["title", "content"],
                     include_vector=False
@@ -1,10 +1,22 @@
 from django.core.management.base import BaseCommand
 from ai_assistant.utils.schema_manager import initialize_schemas
+from ai_assistant.utils.weaviate_client import WeaviateManager
 
 class Command(BaseCommand):
     help = 'Initialize Weaviate schemas with proper authentication'
     
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recreate',
+            action='store_true',
+            help='Drop and recreate the Document collection (e.g. to add named vectors); re-run process_documents afterwards'
+        )
+    
     def handle(self, *args, **options):
+        if options['recreate']:
+            self.stdout.write(self.style.WARNING('Recreating the Document collection...'))
+            with WeaviateManager(admin_access=True) as manager:
+                manager.recreate_document_schema()
         self.stdout.write('Initializing Weaviate schemas...')
         initialize_schemas()
         self.stdout.write(self.style.SUCCESS('Successfully initialized Weaviate schemas'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0004_conversation_conversation_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', max_length=12),
+        ),
+    ]
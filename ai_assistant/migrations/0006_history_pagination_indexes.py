@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0005_chatmessage_prompt_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', 'timestamp'], name='chatmessage_conv_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', 'is_deleted', 'last_updated'], name='conversation_user_recent_idx'),
+        ),
+    ]
@@ -1,10 +1,34 @@
 import uuid
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr
 from django.contrib.auth import get_user_model
 
 
 User = get_user_model()
 
+# Characters of the last answer shown in conversation lists
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
+class ConversationQuerySet(models.QuerySet):
+    def with_last_message(self):
+        """Annotate each conversation with its last message's ID, timestamp and answer preview.
+
+        Correlated subqueries keep a conversation list to a single query. The
+        preview is one character longer than LAST_MESSAGE_PREVIEW_LENGTH so
+        callers can tell whether it was cut off.
+        """
+        last_message = ChatMessage.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+        return self.annotate(
+            last_message_pk=Subquery(last_message.values('id')[:1]),
+            last_message_timestamp=Subquery(last_message.values('timestamp')[:1]),
+            last_message_preview=Subquery(
+                last_message.annotate(
+                    preview=Substr('answer', 1, LAST_MESSAGE_PREVIEW_LENGTH + 1)
+                ).values('preview')[:1]
+            ),
+        )
+
 class Conversation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     conversation_id = models.CharField(max_length=100, unique=True, null=True, blank=True)  # Frontend conversation ID
@@ -14,9 +38,17 @@ class Conversation(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
+    objects = ConversationQuerySet.as_manager()
+
     def __str__(self):
         return self.title or f"Conversation {self.id}"
 
+    class Meta:
+        indexes = [
+            # Conversation lists, paginated by (last_updated, id)
+            models.Index(fields=['user', 'is_deleted', 'last_updated'], name='conversation_user_recent_idx'),
+        ]
+
 class ChatMessage(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
@@ -25,6 +57,7 @@ class ChatMessage(models.Model):
     answer = models.TextField()
     model_used = models.CharField(max_length=100)
     sources = models.JSONField(default=list)
+    prompt_version = models.CharField(max_length=12, blank=True, default='')  # hash of the system message used
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
@@ -34,4 +67,8 @@ class ChatMessage(models.Model):
         ordering = ['timestamp']
         verbose_name = "Chat Message"
         verbose_name_plural = "Chat Messages"
+        indexes = [
+            # Chat history, paginated by (timestamp, id)
+            models.Index(fields=['conversation', 'timestamp'], name='chatmessage_conv_time_idx'),
+        ]
 
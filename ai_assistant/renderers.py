@@ -0,0 +1,26 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF negotiate ``Accept: text/event-stream`` for streaming views.
+
+    Streaming views return a StreamingHttpResponse directly; this renderer
+    only renders the plain Responses they return before streaming starts
+    (e.g. validation errors), as a single ``error`` event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return sse_event("error", data).encode(self.charset)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.utils.dateformat import format
-from .models import Conversation, ChatMessage
+from .models import LAST_MESSAGE_PREVIEW_LENGTH, Conversation, ChatMessage
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,11 +15,16 @@ class ConversationSerializer(serializers.ModelSerializer):
         fields = ['id', 'conversation_id', 'title', 'created_at', 'last_updated', 'last_message']
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-timestamp').first()
-        if last_msg:
-            return {
-                'id': last_msg.id,
-                'text': last_msg.answer,  # or last_msg.question if you prefer
-                'timestamp': format(last_msg.timestamp, 'Y-m-d H:i:s'),
-            }
-        return None
+        # Querysets from Conversation.objects.with_last_message() carry the data already
+        if not hasattr(obj, 'last_message_pk'):
+            obj = Conversation.objects.with_last_message().get(pk=obj.pk)
+        if obj.last_message_pk is None:
+            return None
+        text = obj.last_message_preview
+        if len(text) > LAST_MESSAGE_PREVIEW_LENGTH:
+            text = text[:LAST_MESSAGE_PREVIEW_LENGTH].rstrip() + '...'
+        return {
+            'id': obj.last_message_pk,
+            'text': text,  # preview of the answer
+            'timestamp': format(obj.last_message_timestamp, 'Y-m-d H:i:s'),
+        }
@@ -1,3 +1,38 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TransactionTestCase, override_settings
+
+from .utils.single_flight import SingleFlight
+
+
+@override_settings(SINGLE_FLIGHT_ENABLED=True, SINGLE_FLIGHT_CACHE_ALIAS='shared')
+class SingleFlightAsyncSharedTests(TransactionTestCase):
+    """``ado(shared=True)`` must publish its result and release the lock in the database cache"""
+
+    def setUp(self):
+        self.flights = SingleFlight("test", shared=True)
+        self.lock_key, self.result_key = self.flights._keys("key")
+        caches['shared'].delete_many([self.lock_key, self.result_key])
+
+    def test_leader_publishes_result_and_releases_lock(self):
+        async def work():
+            return [1, 2, 3]
+
+        result, is_leader = asyncio.run(self.flights.ado("key", work, shared=True))
+
+        self.assertEqual(result, [1, 2, 3])
+        self.assertTrue(is_leader)
+        self.assertIsNone(caches['shared'].get(self.lock_key))
+        self.assertEqual(caches['shared'].get(self.result_key), [1, 2, 3])
+        self.assertEqual(self.flights.get_stats()["in_flight"], 0)
+
+    def test_failed_leader_releases_lock(self):
+        async def work():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.flights.ado("key", work, shared=True))
+
+        self.assertIsNone(caches['shared'].get(self.lock_key))
+        self.assertIsNone(caches['shared'].get(self.result_key))
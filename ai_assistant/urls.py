@@ -1,10 +1,15 @@
 from django.urls import path
-from .views import ChatAPIView,HealthCheckAPIView,SearchAPIView,DocumentStatsAPIView,ChatHistoryAPIView,ChatHistoryListAPIView,OpenAIStatusAPIView
+from .async_views import AsyncChatAPIView, AsyncSearchAPIView
+from .views import ChatAPIView,ChatStreamAPIView,HealthCheckAPIView,SearchAPIView,DocumentStatsAPIView,ChatHistoryAPIView,ChatHistoryListAPIView,OpenAIStatusAPIView
 
 
 urlpatterns = [
     path('search/', SearchAPIView.as_view(), name='search'),
     path('chat/', ChatAPIView.as_view(), name='chat'),
+    path('chat/stream/', ChatStreamAPIView.as_view(), name='chat-stream'),
+    # Native async variants; only worthwhile under an ASGI server (see README)
+    path('search/async/', AsyncSearchAPIView.as_view(), name='search-async'),
+    path('chat/async/', AsyncChatAPIView.as_view(), name='chat-async'),
     path('chat/history/', ChatHistoryAPIView.as_view(), name='chat-history'),
     path('chat/conversations/', ChatHistoryListAPIView.as_view(), name='chat-conversation-list'),
     path('health/', HealthCheckAPIView.as_view(), name='health'),
@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from weaviate.classes.query import Filter, MetadataQuery, Sort
+
+logger = logging.getLogger(__name__)
+
+
+def document_set_hash(results):
+    """Hash the retrieved chunks (identity and content) an answer was grounded on"""
+    keys = sorted(
+        f"{result.uuid}:{hashlib.sha256(result.properties.get('content', '').encode('utf-8')).hexdigest()}"
+        for result in results
+    )
+    return hashlib.sha256("\n".join(keys).encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Semantic cache of chat answers stored in the AnswerCache Weaviate collection.
+
+    An answer is reused when a new question's embedding lies within
+    ANSWER_CACHE_MAX_DISTANCE of a cached question *and* the retrieved
+    document set, prompt version and model all match exactly, so a paraphrase
+    never gets an answer grounded on different context. Entries expire after
+    ANSWER_CACHE_TTL_SECONDS; expired and excess (oldest first) entries are
+    evicted every ANSWER_CACHE_PRUNE_EVERY stores. Hit/miss and saved-token
+    totals are kept per process (like ``SearchCache``'s), so counting costs
+    no round trips. Errors degrade to misses.
+    """
+
+    def __init__(self):
+        self.max_distance = settings.ANSWER_CACHE_MAX_DISTANCE
+        self.dimensions = settings.ANSWER_CACHE_DIMENSIONS
+        self.ttl = timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS)
+        self.max_entries = settings.ANSWER_CACHE_MAX_ENTRIES
+        self.lock = threading.Lock()
+        self.stores_since_prune = 0
+        self.stats = {"hits": 0, "misses": 0, "saved_tokens": 0}
+
+    def embed(self, question):
+        """Embed a question for lookup, or return None if embedding failed"""
+        from knowledgebase.vectorization import generate_embedding
+        embedding = generate_embedding(question, dimensions=self.dimensions)
+        # generate_embedding falls back to a zero vector on errors
+        return embedding if any(embedding) else None
+
+    async def aembed(self, question):
+        from knowledgebase.vectorization import agenerate_embedding
+        embedding = await agenerate_embedding(question, dimensions=self.dimensions)
+        return embedding if any(embedding) else None
+
+    def _query(self, embedding, doc_set_hash, prompt_version, model):
+        """near_vector arguments for a lookup"""
+        return {
+            "near_vector": embedding,
+            "distance": self.max_distance,
+            "limit": 1,
+            "filters": (
+                Filter.by_property("doc_set_hash").equal(doc_set_hash)
+                & Filter.by_property("prompt_version").equal(prompt_version)
+                & Filter.by_property("model").equal(model)
+                & Filter.by_property("embedding_dimensions").equal(self.dimensions)
+                & Filter.by_property("expires_at").greater_than(timezone.now())
+            ),
+            "return_properties": ["question", "answer", "sources", "total_tokens"],
+            "return_metadata": MetadataQuery(distance=True),
+        }
+
+    def lookup(self, manager, embedding, doc_set_hash, prompt_version, model):
+        """Return the best cached answer as a dict, or None on a miss"""
+        try:
+            collection = manager.get_collection("AnswerCache")
+            result = collection.query.near_vector(**self._query(embedding, doc_set_hash, prompt_version, model))
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            result = None
+        return self._record_lookup(result)
+
+    async def alookup(self, manager, embedding, doc_set_hash, prompt_version, model):
+        """``lookup`` for an AsyncWeaviateManager"""
+        try:
+            collection = await manager.get_collection("AnswerCache")
+            result = await collection.query.near_vector(**self._query(embedding, doc_set_hash, prompt_version, model))
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            result = None
+        return self._record_lookup(result)
+
+    def _record_lookup(self, result):
+        """Count a lookup and turn its result into an answer dict (or None)"""
+        if result is None or not result.objects:
+            self._count("misses")
+            return None
+
+        entry = result.objects[0]
+        saved_tokens = entry.properties.get("total_tokens") or 0
+        self._count("hits")
+        self._count("saved_tokens", saved_tokens)
+        return {
+            "answer": entry.properties["answer"],
+            "sources": list(entry.properties.get("sources") or []),
+            "cached_question": entry.properties.get("question"),
+            "distance": entry.metadata.distance,
+            "total_tokens": saved_tokens,
+        }
+
+    def _properties(self, question, doc_set_hash, prompt_version, model, answer, sources, total_tokens):
+        now = timezone.now()
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": sources,
+            "model": model,
+            "prompt_version": prompt_version,
+            "doc_set_hash": doc_set_hash,
+            "embedding_dimensions": self.dimensions,
+            "total_tokens": total_tokens or 0,
+            "created_at": now,
+            "expires_at": now + self.ttl,
+        }
+
+    def store(self, manager, question, embedding, doc_set_hash, prompt_version, model,
+              answer, sources, total_tokens):
+        try:
+            collection = manager.get_collection("AnswerCache")
+            collection.data.insert(
+                properties=self._properties(question, doc_set_hash, prompt_version, model,
+                                            answer, sources, total_tokens),
+                vector=embedding
+            )
+        except Exception as e:
+            logger.warning(f"Answer cache store failed: {e}")
+            return
+
+        if self._prune_due():
+            self.prune(manager)
+
+    async def astore(self, manager, question, embedding, doc_set_hash, prompt_version, model,
+                     answer, sources, total_tokens):
+        """``store`` for an AsyncWeaviateManager"""
+        from asgiref.sync import sync_to_async
+        from .weaviate_client import get_weaviate_manager
+
+        try:
+            collection = await manager.get_collection("AnswerCache")
+            await collection.data.insert(
+                properties=self._properties(question, doc_set_hash, prompt_version, model,
+                                            answer, sources, total_tokens),
+                vector=embedding
+            )
+        except Exception as e:
+            logger.warning(f"Answer cache store failed: {e}")
+            return
+
+        if self._prune_due():
+            # Pruning is rare and needs several round trips; run it on the sync client
+            await sync_to_async(self.prune, thread_sensitive=False)(get_weaviate_manager(admin_access=True))
+
+    def _prune_due(self):
+        with self.lock:
+            self.stores_since_prune += 1
+            due = self.stores_since_prune >= settings.ANSWER_CACHE_PRUNE_EVERY
+            if due:
+                self.stores_since_prune = 0
+        return due
+
+    def prune(self, manager):
+        """Delete expired entries, then the oldest entries beyond ANSWER_CACHE_MAX_ENTRIES"""
+        try:
+            collection = manager.get_collection("AnswerCache")
+            expired = collection.data.delete_many(
+                where=Filter.by_property("expires_at").less_than(timezone.now())
+            ).successful
+
+            overflow = collection.aggregate.over_all(total_count=True).total_count - self.max_entries
+            evicted = 0
+            if overflow > 0:
+                oldest = collection.query.fetch_objects(
+                    limit=min(overflow, 1000),
+                    sort=Sort.by_property("created_at", ascending=True),
+                    return_properties=[]
+                )
+                uuids = [entry.uuid for entry in oldest.objects]
+                if uuids:
+                    evicted = collection.data.delete_many(
+                        where=Filter.by_id().contains_any(uuids)
+                    ).successful
+            logger.info(f"Answer cache pruned: {expired} expired, {evicted} evicted")
+            return expired + evicted
+        except Exception as e:
+            logger.warning(f"Answer cache prune failed: {e}")
+            return 0
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def get_stats(self):
+        """Cache stats; the counts only cover this worker process"""
+        with self.lock:
+            hits, misses, saved_tokens = self.stats["hits"], self.stats["misses"], self.stats["saved_tokens"]
+        lookups = hits + misses
+        return {
+            "enabled": settings.ANSWER_CACHE_ENABLED,
+            "counters": "per-process",
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "saved_tokens": saved_tokens,
+            "max_distance": self.max_distance,
+        }
+
+
+answer_cache = AnswerCache()
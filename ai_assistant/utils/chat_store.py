@@ -0,0 +1,283 @@
+import atexit
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from ai_assistant.models import ChatMessage, Conversation
+
+logger = logging.getLogger(__name__)
+
+
+def conversation_title(question):
+    return question[:50] + "..." if len(question) > 50 else question
+
+
+def save_chat_message(user, conversation_id, message_id, question, answer, model_used, sources, prompt_version=''):
+    """Persist a chat exchange and bump its conversation, creating the conversation if needed.
+
+    With CHAT_WRITE_BEHIND_ENABLED the write is queued on ``chat_write_buffer``
+    and returns immediately; otherwise it is a single statement. Returns
+    ``(record, created)``: if ``message_id`` was already stored, ``record`` is
+    the stored message and ``created`` is False.
+    """
+    record = {
+        "user_id": user.pk,
+        "conversation_id": conversation_id,
+        "message_id": message_id,
+        "question": question,
+        "answer": answer,
+        "model_used": model_used,
+        "sources": sources,
+        "prompt_version": prompt_version,
+    }
+    if settings.CHAT_WRITE_BEHIND_ENABLED:
+        chat_write_buffer.submit(record)
+        return record, True
+    return write_chat_message(record)
+
+
+def find_chat_message(message_id):
+    """The saved or still queued chat message ``message_id`` as a record dict, or None"""
+    record = chat_write_buffer.find(message_id)
+    if record is not None:
+        return record
+    message = ChatMessage.objects.filter(message_id=message_id).values(
+        'user_id', 'conversation__conversation_id', 'message_id', 'question', 'answer',
+        'model_used', 'sources', 'prompt_version'
+    ).first()
+    if message is not None:
+        message["conversation_id"] = message.pop("conversation__conversation_id")
+    return message
+
+
+# One statement saves a message: the conversation is created if it doesn't
+# exist yet (unless the message_id is already taken), the message inserted
+# unless its message_id is, and an existing conversation bumped only when the
+# message went in. A new conversation starts out with last_updated = now, and
+# the UPDATE can't see rows inserted by the same statement anyway.
+WRITE_CHAT_MESSAGE_SQL = """
+WITH new_conversation AS (
+    INSERT INTO {conversation} (id, conversation_id, user_id, title, created_at, last_updated, is_deleted)
+    SELECT %(conversation_pk)s, %(conversation_id)s, %(user_id)s, %(title)s, %(now)s, %(now)s, false
+    WHERE NOT EXISTS (SELECT 1 FROM {message} WHERE message_id = %(message_id)s)
+    ON CONFLICT (conversation_id) DO NOTHING
+    RETURNING id
+), target AS (
+    SELECT id FROM new_conversation
+    UNION ALL
+    SELECT id FROM {conversation} WHERE conversation_id = %(conversation_id)s AND user_id = %(user_id)s
+    LIMIT 1
+), new_message AS (
+    INSERT INTO {message} (
+        conversation_id, user_id, message_id, question, answer, model_used, sources, prompt_version, timestamp
+    )
+    SELECT id, %(user_id)s, %(message_id)s, %(question)s, %(answer)s, %(model_used)s, %(sources)s::jsonb,
+           %(prompt_version)s, %(now)s
+    FROM target WHERE true
+    ON CONFLICT (message_id) DO NOTHING
+    RETURNING conversation_id
+), bumped AS (
+    UPDATE {conversation} SET last_updated = %(now)s WHERE id IN (SELECT conversation_id FROM new_message)
+)
+SELECT count(*) FROM new_message
+"""
+
+
+def write_chat_message(record):
+    """Save a message, creating or bumping its conversation, in a single statement.
+
+    Returns ``(record, created)``. A message_id that is already stored (a
+    retry answered by another worker) is neither written again nor bumps its
+    conversation; the stored message is returned instead. Only when nothing
+    was inserted is the database asked why, so the happy path is one round
+    trip for both new and existing conversations.
+    """
+    now = timezone.now()
+    sql = WRITE_CHAT_MESSAGE_SQL.format(
+        conversation=connection.ops.quote_name(Conversation._meta.db_table),
+        message=connection.ops.quote_name(ChatMessage._meta.db_table),
+    )
+    params = dict(record, conversation_pk=uuid.uuid4(), title=conversation_title(record["question"]),
+                  sources=json.dumps(record["sources"]), now=now)
+
+    # A second attempt only happens if a concurrent request created the
+    # conversation after this statement's snapshot was taken
+    for _ in range(2):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            inserted = cursor.fetchone()[0]
+        if inserted:
+            return record, True
+        stored = find_chat_message(record["message_id"])
+        if stored is not None:
+            return stored, False
+    raise IntegrityError(f"Conversation {record['conversation_id']} belongs to another user")
+
+
+class ChatWriteBuffer:
+    """In-process write-behind queue for chat messages.
+
+    Requests append to the queue and return; a background thread writes it
+    every CHAT_WRITE_BEHIND_INTERVAL seconds, or as soon as
+    CHAT_WRITE_BEHIND_BATCH_SIZE messages are waiting, as one transaction per
+    batch: the batch's conversations are looked up, created and bumped in
+    bulk and its messages inserted with a single ``bulk_create``. A failed
+    batch goes back to the front of the queue and is retried.
+
+    The queue is flushed at interpreter exit, so a graceful worker shutdown
+    loses nothing; a hard kill loses at most the messages still queued. If
+    the queue reaches CHAT_WRITE_BEHIND_MAX_PENDING (database slow or down),
+    requests flush it themselves instead of letting it grow.
+    """
+
+    def __init__(self, batch_size=None, interval=None, max_pending=None):
+        self.batch_size = batch_size or settings.CHAT_WRITE_BEHIND_BATCH_SIZE
+        self.interval = interval or settings.CHAT_WRITE_BEHIND_INTERVAL
+        self.max_pending = max_pending or settings.CHAT_WRITE_BEHIND_MAX_PENDING
+        self.pending = deque()
+        self.writing = []  # batch taken off the queue but not yet committed
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.closed = False
+
+    def submit(self, record):
+        if self.closed:
+            # Shutting down: nothing will flush the queue any more
+            write_chat_message(record)
+            return
+        with self.lock:
+            self.pending.append(record)
+            pending = len(self.pending)
+            self._ensure_thread()
+        if pending >= self.max_pending:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Chat write-behind flush failed with {pending} messages queued: {e}", exc_info=True)
+        elif pending >= self.batch_size:
+            self.wake.set()
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        if self.thread is None:
+            atexit.register(self.close)
+        self.thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.closed:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Chat write-behind flush failed, will retry: {e}", exc_info=True)
+
+    def flush(self):
+        """Write every queued message, one transaction per batch"""
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                    self.writing = batch
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                except Exception:
+                    with self.lock:
+                        self.pending.extendleft(reversed(batch))
+                    raise
+                finally:
+                    with self.lock:
+                        self.writing = []
+
+    def _write(self, batch):
+        with transaction.atomic():
+            conversations = self._upsert_conversations(batch)
+            messages = []
+            for record in batch:
+                conversation_pk = conversations.get((record["user_id"], record["conversation_id"]))
+                if conversation_pk is None:
+                    logger.error(
+                        f"Dropping chat message {record['message_id']}: conversation "
+                        f"{record['conversation_id']} belongs to another user"
+                    )
+                    continue
+                messages.append(ChatMessage(
+                    conversation_id=conversation_pk,
+                    **{key: value for key, value in record.items() if key != "conversation_id"}
+                ))
+            # A message_id that is already stored (a retried request) is skipped
+            ChatMessage.objects.bulk_create(messages, ignore_conflicts=True)
+        logger.info(f"Chat write-behind flushed {len(messages)} messages")
+
+    def _upsert_conversations(self, batch):
+        """Create and bump the batch's conversations, returning {(user_id, conversation_id): pk}"""
+        first_records = {}
+        for record in batch:
+            first_records.setdefault((record["user_id"], record["conversation_id"]), record)
+        conversation_ids = {conversation_id for _, conversation_id in first_records}
+
+        def lookup(ids):
+            return {
+                (user_id, conversation_id): pk
+                for pk, user_id, conversation_id in Conversation.objects.filter(
+                    conversation_id__in=ids
+                ).values_list('pk', 'user_id', 'conversation_id')
+            }
+
+        conversations = lookup(conversation_ids)
+        missing = [key for key in first_records if key not in conversations]
+        if missing:
+            Conversation.objects.bulk_create([
+                Conversation(conversation_id=conversation_id, user_id=user_id,
+                             title=conversation_title(first_records[(user_id, conversation_id)]["question"]))
+                for user_id, conversation_id in missing
+            ], ignore_conflicts=True)
+            # Re-read rather than trust our pks: another worker may have created some of them first
+            conversations.update(lookup({conversation_id for _, conversation_id in missing}))
+
+        Conversation.objects.filter(pk__in=list(conversations.values())).update(last_updated=timezone.now())
+        return conversations
+
+    def find(self, message_id):
+        """The queued record for ``message_id``, or None if it is not waiting to be written"""
+        with self.lock:
+            for record in self.writing:
+                if record["message_id"] == message_id:
+                    return record
+            for record in self.pending:
+                if record["message_id"] == message_id:
+                    return record
+        return None
+
+    def close(self):
+        """Stop the background thread and write whatever is still queued"""
+        self.closed = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Chat write-behind lost {len(self.pending)} messages at shutdown: {e}", exc_info=True)
+
+    def get_stats(self):
+        return {
+            "enabled": settings.CHAT_WRITE_BEHIND_ENABLED,
+            "pending": len(self.pending),
+        }
+
+
+chat_write_buffer = ChatWriteBuffer()
@@ -0,0 +1,109 @@
+import logging
+import re
+
+from django.conf import settings
+
+from knowledgebase.chunking import iter_units
+from knowledgebase.tokenization import count_tokens, split_by_tokens
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "=" * 50
+
+
+def context_token_budget(model):
+    """Token budget for the context documents of a prompt to ``model``"""
+    return settings.CHAT_CONTEXT_TOKEN_BUDGETS.get(model, settings.CHAT_CONTEXT_TOKEN_BUDGET)
+
+
+def _sentence_key(sentence):
+    """Comparison key that ignores case, punctuation and spacing differences"""
+    return " ".join(re.findall(r"\w+", sentence.casefold()))
+
+
+def _document_header(result, index):
+    title = result.properties.get("title", f"Document {index + 1}")
+    # Label chunks of multi-part documents so citations stay meaningful
+    chunk_count = result.properties.get("chunk_count") or 1
+    if chunk_count > 1:
+        chunk_index = result.properties.get("chunk_index") or 0
+        return title, f"Document: {title} (part {chunk_index + 1} of {chunk_count})"
+    return title, f"Document: {title}"
+
+
+def pack_context(results, budget):
+    """Assemble prompt context from search results within ``budget`` tokens.
+
+    Results are taken in rank order and split into sentences. Sentences that
+    already appeared in a higher-ranked result (overlapping chunks, templated
+    near-copies) are dropped, and packing stops once the next sentence would
+    exceed the budget. Returns ``(context, sources, summary)``, where sources
+    lists the titles that made it into the context.
+    """
+    parts = []
+    sources = []
+    seen = set()
+    used = 0
+    duplicates = 0
+    truncated = False
+    separator_tokens = count_tokens(SEPARATOR + "\n") + 1
+
+    for index, result in enumerate(results):
+        if truncated:
+            break
+        try:
+            content = result.properties.get("content", "").strip()
+            if not content:
+                continue
+            title, header = _document_header(result, index)
+        except Exception as e:
+            logger.warning(f"Error processing result {index}: {e}")
+            continue
+
+        header_tokens = separator_tokens + count_tokens(header) + 1
+        if used + header_tokens >= budget:
+            truncated = True
+            break
+
+        lines = []
+        has_text = False
+        document_tokens = header_tokens
+        for sentence, is_heading, starts_paragraph in iter_units(content.splitlines()):
+            key = _sentence_key(sentence)
+            if not is_heading and key in seen:
+                duplicates += 1
+                continue
+
+            sentence_tokens = count_tokens(sentence) + 1
+            if used + document_tokens + sentence_tokens > budget:
+                remaining = budget - used - document_tokens - 1
+                if not parts and not has_text and remaining > 0:
+                    # Never return an empty context because the first sentence alone is too long
+                    lines.append(split_by_tokens(sentence, remaining)[0])
+                    document_tokens += remaining + 1
+                    has_text = True
+                truncated = True
+                break
+
+            seen.add(key)
+            if lines and not (is_heading or starts_paragraph):
+                lines[-1] += " " + sentence
+            else:
+                lines.append(sentence)
+            document_tokens += sentence_tokens
+            has_text = has_text or not is_heading
+
+        # A result whose every sentence was a duplicate adds nothing
+        if has_text:
+            parts.append(f"{SEPARATOR}\n{header}\n" + "\n".join(lines))
+            used += document_tokens
+            if title not in sources:
+                sources.append(title)
+
+    context = "\n\n".join(parts)
+    return context, sources, {
+        "packed_tokens": count_tokens(context) if context else 0,
+        "token_budget": budget,
+        "duplicate_sentences_removed": duplicates,
+        "truncated": truncated,
+    }
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import threading
+import logging
+import weakref
+
+import httpx
+from django.conf import settings
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI, DefaultHttpxClient
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+
+
+def _client_options():
+    return {
+        "api_key": getattr(settings, 'OPENAI_API_KEY', None) or os.environ.get('OPENAI_API_KEY'),
+        "timeout": httpx.Timeout(settings.OPENAI_READ_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        "max_retries": settings.OPENAI_MAX_RETRIES,
+    }
+
+
+def _pool_limits(max_connections):
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def _create_client():
+    http_client = DefaultHttpxClient(limits=_pool_limits(settings.OPENAI_MAX_CONNECTIONS))
+    logger.info("Created shared OpenAI client")
+    return OpenAI(http_client=http_client, **_client_options())
+
+
+def get_openai_client():
+    """Return this process's shared OpenAI client, creating it on first use.
+
+    All embedding, chat and status calls go through this client so they
+    reuse one keep-alive connection pool (no TLS handshake per request) and
+    share the timeouts and retry policy configured in settings. Keyed by PID
+    so forked workers never share sockets with their parent.
+    """
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is None:
+        with _lock:
+            client = _clients.get(pid)
+            if client is None:
+                client = _create_client()
+                _clients[pid] = client
+    return client
+
+
+def get_async_openai_client():
+    """Return the AsyncOpenAI client for the running event loop, creating it on first use.
+
+    httpx async connection pools are bound to the loop they were created on,
+    so there is one client per loop (in practice one per ASGI worker). Its
+    pool is sized by OPENAI_ASYNC_MAX_CONNECTIONS since a single async worker
+    can have far more calls in flight than a threaded one.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = DefaultAsyncHttpxClient(limits=_pool_limits(settings.OPENAI_ASYNC_MAX_CONNECTIONS))
+        client = AsyncOpenAI(http_client=http_client, **_client_options())
+        _async_clients[loop] = client
+        logger.info("Created shared AsyncOpenAI client")
+    return client
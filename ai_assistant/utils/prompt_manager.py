@@ -1,9 +1,36 @@
+import hashlib
 import os
+import threading
+import time
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROMPT = """You are a helpful AI assistant. Answer questions based on the provided context documents.
+
+GUIDELINES:
+- Use only the information from the provided context
+- If the context doesn't contain enough information, clearly state this
+- Be accurate, helpful, and comprehensive
+- Cite specific documents when referencing information
+- Maintain a professional yet approachable tone"""
+
+# Appended to every prompt to form the chat system message
+CONTEXT_HANDLING_RULES = """CONTEXT HANDLING RULES:
+- Use ONLY the information provided in the context documents below
+- If the context doesn't contain enough information, clearly state this
+- Never make up information not present in the context
+- Always cite which documents you're referencing
+- Provide helpful, accurate, and compassionate responses
+- Focus on sexual health, reproductive wellness, and contraception topics"""
+
+
+def prompt_version(system_message):
+    """Short content hash identifying a system message"""
+    return hashlib.sha256(system_message.encode('utf-8')).hexdigest()[:12]
+
+
 class PromptManager:
     def __init__(self):
         # Define the prompts directory path
@@ -61,6 +88,7 @@ class PromptManager:
                 f.write(content)
             
             logger.info(f"Successfully saved prompt to: {prompt_name}")
+            prompt_registry.invalidate(prompt_name)
             return True
             
         except Exception as e:
@@ -69,11 +97,87 @@ class PromptManager:
     
     def get_default_prompt(self):
         """Return a default prompt if no custom prompt is specified"""
-        return """You are a helpful AI assistant. Answer questions based on the provided context documents.
+        return DEFAULT_PROMPT
 
-GUIDELINES:
-- Use only the information from the provided context
-- If the context doesn't contain enough information, clearly state this
-- Be accurate, helpful, and comprehensive
-- Cite specific documents when referencing information
-- Maintain a professional yet approachable tone"""
+
+class Prompt:
+    """A loaded prompt with its pre-rendered chat system message and version hash"""
+
+    def __init__(self, name, text, mtime):
+        self.name = name
+        self.text = text
+        self.mtime = mtime  # None for the fallback prompt
+        self.system_message = f"{text}\n\n{CONTEXT_HANDLING_RULES}"
+        self.version = prompt_version(self.system_message)
+
+
+class PromptRegistry:
+    """Process-wide cache of prompts, hot-reloaded when their file changes.
+
+    A prompt is read and rendered once; after that the file's mtime is
+    checked at most every PROMPT_RELOAD_INTERVAL seconds and the prompt is
+    re-read only if it changed. A missing file falls back to DEFAULT_PROMPT.
+    """
+
+    def __init__(self, prompts_dir=None, reload_interval=None):
+        self.prompts_dir = prompts_dir or os.path.join(settings.BASE_DIR, 'prompts')
+        self.reload_interval = settings.PROMPT_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self.lock = threading.Lock()
+        self.prompts = {}  # file name -> Prompt
+        self.checked_at = {}  # file name -> time.monotonic() of the last mtime check
+
+    @staticmethod
+    def _file_name(prompt_name):
+        return prompt_name if prompt_name.endswith('.txt') else prompt_name + '.txt'
+
+    def _is_fresh(self, name, now):
+        return name in self.prompts and now - self.checked_at.get(name, 0) < self.reload_interval
+
+    def get(self, prompt_name):
+        """Return the ``Prompt`` for ``prompt_name``, reloading it if its file changed"""
+        name = self._file_name(prompt_name)
+        now = time.monotonic()
+        if self._is_fresh(name, now):
+            return self.prompts[name]
+
+        with self.lock:
+            if self._is_fresh(name, now):
+                return self.prompts[name]
+            self.checked_at[name] = now
+            path = os.path.join(self.prompts_dir, name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            current = self.prompts.get(name)
+            if current is not None and current.mtime == mtime:
+                return current
+            prompt = self._load(name, path, mtime)
+            if prompt is None:
+                # Unreadable (e.g. mid-write): keep serving the previous version and retry next check
+                self.checked_at.pop(name, None)
+                return current or Prompt(name, DEFAULT_PROMPT, None)
+            self.prompts[name] = prompt
+            return prompt
+
+    def _load(self, name, path, mtime):
+        if mtime is None:
+            logger.warning(f"Prompt file '{name}' not found, using fallback prompt")
+            return Prompt(name, DEFAULT_PROMPT, None)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read().strip()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error(f"Error loading prompt from {name}: {e}")
+            return None
+        prompt = Prompt(name, text, mtime)
+        logger.info(f"Loaded prompt {name} (version {prompt.version})")
+        return prompt
+
+    def invalidate(self, prompt_name):
+        """Force the next ``get`` to re-check the prompt file"""
+        self.checked_at.pop(self._file_name(prompt_name), None)
+
+
+prompt_registry = PromptRegistry()
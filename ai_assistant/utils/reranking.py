@@ -0,0 +1,53 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr(query_vector, candidate_vectors, limit, lambda_mult=0.5):
+    """Maximal marginal relevance: pick ``limit`` candidates that are relevant but not redundant.
+
+    Each step selects the candidate maximising
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``,
+    so 1 ranks by relevance alone and 0 only avoids repetition. Returns the
+    chosen row indices of ``candidate_vectors`` in selection order.
+    """
+    candidates = _unit_rows(np.asarray(candidate_vectors, dtype=np.float32))
+    if not len(candidates):
+        return []
+    query = _unit_rows(np.asarray(query_vector, dtype=np.float32))
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+
+    selected = []
+    for _ in range(min(limit, len(candidates))):
+        # Nothing selected yet: the first pick is simply the most relevant
+        penalty = np.where(np.isinf(redundancy), 0, redundancy)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[:, best])
+    return selected
+
+
+def rerank_mmr(query_vector, results, vector_name, limit, lambda_mult=0.5):
+    """Re-rank search results with ``mmr`` using their ``vector_name`` vectors.
+
+    Results without that vector (e.g. fetched without vectors) are returned
+    in their original order, truncated to ``limit``.
+    """
+    vectors = [(getattr(result, "vector", None) or {}).get(vector_name) for result in results]
+    if any(vector is None for vector in vectors):
+        logger.warning("Search results carry no vectors; skipping MMR re-ranking")
+        return list(results[:limit])
+    return [results[index] for index in mmr(query_vector, vectors, limit, lambda_mult)]
@@ -5,6 +5,7 @@ def initialize_schemas():
     try:
         manager = WeaviateManager(admin_access=True)
         manager.create_document_schema()
+        manager.create_answer_cache_schema()
         print("Schema initialization completed successfully")
     except Exception as e:
         print(f"Error initializing schemas: {e}")
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "kb:generation"
+
+
+def normalize_query(query):
+    """Case-fold and collapse whitespace so repeated questions share a cache key"""
+    return " ".join(query.casefold().split())
+
+
+class SearchHit:
+    """Minimal stand-in for a Weaviate result object rebuilt from the cache"""
+
+    __slots__ = ("uuid", "properties", "metadata", "vector")
+
+    def __init__(self, uuid, properties, distance=None, score=None, vector=None):
+        self.uuid = uuid
+        self.properties = properties
+        self.metadata = _Metadata(distance, score)
+        self.vector = vector or {}
+
+
+class _Metadata:
+    __slots__ = ("distance", "score")
+
+    def __init__(self, distance=None, score=None):
+        self.distance = distance
+        self.score = score
+
+
+class SearchCache:
+    """Caches normalized query -> top-k search results in Django's cache framework.
+
+    Keys embed a knowledge-base generation counter which is bumped whenever
+    documents are written or deleted, so a cached result never outlives an
+    ingest. The counter lives in the same (shared) cache, so every Gunicorn
+    worker sees the same generation. Hit/miss totals are kept per process:
+    counting them in the shared cache would add two more round trips (and
+    a non-atomic ``add``/``incr``) to every search. Cache errors degrade to
+    misses.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = alias or settings.SEARCH_CACHE_ALIAS
+        self.timeout = timeout or settings.SEARCH_CACHE_TIMEOUT
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self):
+        try:
+            generation = self.cache.get(GENERATION_KEY)
+            if generation is None:
+                self.cache.add(GENERATION_KEY, 1, timeout=None)
+                generation = self.cache.get(GENERATION_KEY, 1)
+            return generation
+        except Exception as e:
+            logger.warning(f"Search cache unavailable: {e}")
+            return None
+
+    def bump_generation(self):
+        """Invalidate every cached result; call after any change to stored documents"""
+        try:
+            self.cache.add(GENERATION_KEY, 1, timeout=None)
+            return self.cache.incr(GENERATION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to bump knowledge-base generation: {e}")
+            return None
+
+    def key(self, query, dimensions, limit, variant="vector"):
+        """Cache key for a search, or None if the cache is disabled or unreachable.
+
+        ``variant`` distinguishes search modes (see ``search_variant``).
+        """
+        if not settings.SEARCH_CACHE_ENABLED:
+            return None
+        generation = self.generation()
+        if generation is None:
+            return None
+        digest = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+        return f"search:{generation}:{variant}:{dimensions}:{limit}:{digest}"
+
+    def get(self, key):
+        """Return cached results for ``key`` as SearchHit objects, or None on a miss"""
+        if key is None:
+            return None
+        try:
+            cached = self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            cached = None
+        self._count(cached is not None)
+        if cached is None:
+            return None
+        return [
+            SearchHit(item["uuid"], item["properties"], item["distance"], item.get("score"))
+            for item in cached
+        ]
+
+    def set(self, key, results):
+        if key is None:
+            return
+        cached = [
+            {
+                "uuid": str(result.uuid),
+                "properties": dict(result.properties),
+                "distance": getattr(result.metadata, "distance", None) if result.metadata else None,
+                "score": getattr(result.metadata, "score", None) if result.metadata else None,
+            }
+            for result in results
+        ]
+        try:
+            self.cache.set(key, cached, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_stats(self):
+        """Cache stats; ``hits`` and ``misses`` only cover this worker process"""
+        try:
+            generation = self.cache.get(GENERATION_KEY, 0)
+        except Exception as e:
+            return {"enabled": settings.SEARCH_CACHE_ENABLED, "error": str(e)}
+        hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": settings.SEARCH_CACHE_ENABLED,
+            "counters": "per-process",
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "generation": generation,
+        }
+
+
+search_cache = SearchCache()
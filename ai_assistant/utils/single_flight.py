@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_GONE = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.timed_out = False
+        self.waiters = []  # (loop, future) of async followers
+
+    def wait(self, timeout):
+        """Block until the leader finishes; False if ``timeout`` seconds passed first"""
+        return self.done.wait(timeout)
+
+    def notify(self):
+        for loop, future in self.waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiter's loop is already closed
+                pass
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class Flight:
+    """One caller's part in a single flight.
+
+    A ``leader`` runs the work and must end it with ``finish`` or ``fail``
+    (``afinish`` or ``afail`` on an event loop).
+    A follower has the leader's ``result`` or ``error`` instead, unless it
+    ``timed_out`` waiting for it.
+    """
+
+    def __init__(self, group, key, call, leader):
+        self.group = group
+        self.key = key
+        self.call = call
+        self.leader = leader
+        self.result = None
+        self.error = None
+        self.timed_out = False
+        self.lock_key = None
+        self.result_key = None
+
+    def _follow(self, call):
+        self.leader = False
+        if call.timed_out:
+            self.timed_out = True
+        else:
+            self.result, self.error = call.result, call.error
+
+    def finish(self, result, cacheable=True):
+        """Hand ``result`` to the followers (and, if ``cacheable``, to other workers)"""
+        if self.lock_key:
+            self.group._shared_store(self.lock_key, self.result_key, result if cacheable else None)
+        self.group._finish(self.key, self.call, result=result)
+
+    def fail(self, error=None):
+        """End a flight that produced no result; followers get ``error``"""
+        if self.lock_key:
+            self.group._shared_store(self.lock_key, self.result_key, None)
+        self.group._finish(self.key, self.call, error=error)
+
+    # The shared cache is a database cache, which can't be used from an event
+    # loop: async callers must end their flights with these
+
+    async def afinish(self, result, cacheable=True):
+        """Async ``finish``"""
+        if self.lock_key:
+            await sync_to_async(self.group._shared_store)(
+                self.lock_key, self.result_key, result if cacheable else None
+            )
+        self.group._finish(self.key, self.call, result=result)
+
+    async def afail(self, error=None):
+        """Async ``fail``"""
+        if self.lock_key:
+            await sync_to_async(self.group._shared_store)(self.lock_key, self.result_key, None)
+        self.group._finish(self.key, self.call, error=error)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key so the work runs once.
+
+    Within a process the first caller for a key (the leader) runs the
+    work and callers arriving while it runs wait for it and share its
+    result or exception. Async followers wait on a future of their own
+    event loop, so they hold no thread whichever thread or loop the leader
+    runs on. A shared flight also takes a lock in the shared
+    cache: leaders in other workers then poll for the result it stores
+    there, for SINGLE_FLIGHT_RESULT_TTL seconds, instead of running the
+    work themselves. Flights are shared when the caller asks for it and the
+    group allows it (``shared``, by default SINGLE_FLIGHT_SHARED). A
+    follower whose leader takes longer than ``timeout`` times out, and any
+    shared cache failure falls back to running without the lock.
+
+    ``do``/``ado`` wrap a function; ``join``/``ajoin`` return a ``Flight``
+    for callers that cannot (e.g. a streamed response).
+    """
+
+    def __init__(self, namespace, timeout=None, shared=None):
+        self.namespace = namespace
+        self.timeout = timeout or settings.SINGLE_FLIGHT_TIMEOUT
+        self.shared = settings.SINGLE_FLIGHT_SHARED if shared is None else shared
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def _begin(self, key):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self.calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key, call, result=None, error=None, timed_out=False):
+        call.result, call.error, call.timed_out = result, error, timed_out
+        with self.lock:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+            call.done.set()
+        call.notify()
+
+    def join(self, key, shared=False):
+        """Join the flight for ``key``, waiting for its leader if there is one"""
+        call, is_leader = self._begin(key)
+        flight = Flight(self, key, call, is_leader)
+        if not is_leader:
+            if call.wait(self.timeout):
+                flight._follow(call)
+            else:
+                flight.leader, flight.timed_out = False, True
+            return flight
+        if shared and self.shared:
+            self._join_shared(flight)
+        return flight
+
+    async def ajoin(self, key, shared=False):
+        """Async ``join``"""
+        call, is_leader = self._begin(key)
+        flight = Flight(self, key, call, is_leader)
+        if not is_leader:
+            if await self._await(call):
+                flight._follow(call)
+            else:
+                flight.leader, flight.timed_out = False, True
+            return flight
+        if shared and self.shared:
+            await self._ajoin_shared(flight)
+        return flight
+
+    async def _await(self, call):
+        """Wait for ``call`` on a future of the running loop, which the leader resolves thread-safely"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if call.done.is_set():
+                return True
+            call.waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def do(self, key, fn, shared=False, cacheable=None):
+        """Run ``fn()`` once for concurrent callers with the same ``key``, returning ``(result, is_leader)``.
+
+        ``cacheable(result)`` returning False keeps a result (e.g. a failure
+        fallback) from being stored for other workers. A follower that times
+        out runs ``fn`` itself.
+        """
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn(), True
+        flight = self.join(key, shared)
+        if flight.timed_out:
+            logger.warning(f"Single-flight {self.namespace}: leader still running after {self.timeout}s")
+            return fn(), True
+        if not flight.leader:
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        flight.finish(result, cacheable is None or cacheable(result))
+        return result, True
+
+    async def ado(self, key, fn, shared=False, cacheable=None):
+        """Async ``do`` for a coroutine function ``fn``"""
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await fn(), True
+        flight = await self.ajoin(key, shared)
+        if flight.timed_out:
+            logger.warning(f"Single-flight {self.namespace}: leader still running after {self.timeout}s")
+            return await fn(), True
+        if not flight.leader:
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+        try:
+            result = await fn()
+        except BaseException as e:
+            await flight.afail(e)
+            raise
+        await flight.afinish(result, cacheable is None or cacheable(result))
+        return result, True
+
+    # Cross-worker coordination through the shared cache. Every cache
+    # operation degrades to "no coordination" on errors; None results are
+    # never shared.
+
+    @property
+    def cache(self):
+        return caches[settings.SINGLE_FLIGHT_CACHE_ALIAS]
+
+    def _keys(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        base = f"flight:{self.namespace}:{digest}"
+        return f"{base}:lock", f"{base}:result"
+
+    def _shared_lookup(self, result_key):
+        try:
+            return self.cache.get(result_key)
+        except Exception as e:
+            logger.warning(f"Single-flight cache read failed: {e}")
+            return None
+
+    def _shared_acquire(self, lock_key):
+        try:
+            return self.cache.add(lock_key, 1, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Single-flight lock failed, running without it: {e}")
+            return True
+
+    def _shared_store(self, lock_key, result_key, result):
+        try:
+            if result is not None:
+                self.cache.set(result_key, result, timeout=settings.SINGLE_FLIGHT_RESULT_TTL)
+            self.cache.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Single-flight cache write failed: {e}")
+
+    def _shared_poll(self, lock_key, result_key):
+        """The stored result, None to keep waiting, or _GONE if the leader is gone without one"""
+        result = self._shared_lookup(result_key)
+        if result is not None:
+            return result
+        try:
+            return None if self.cache.get(lock_key) is not None else _GONE
+        except Exception:
+            return _GONE
+
+    def _take_lock(self, flight):
+        """Try to lead ``flight`` across workers; returns a result left by another worker, if any"""
+        lock_key, result_key = self._keys(flight.key)
+        # A result left by a leader that just finished
+        result = self._shared_lookup(result_key)
+        if result is not None:
+            return result
+        if self._shared_acquire(lock_key):
+            flight.lock_key, flight.result_key = lock_key, result_key
+        return None
+
+    def _adopt(self, flight, result):
+        """Another worker led the flight: hand its result to this process's followers"""
+        self._finish(flight.key, flight.call, result=result)
+        flight._follow(flight.call)
+
+    def _give_up(self, flight):
+        self._finish(flight.key, flight.call, timed_out=True)
+        flight._follow(flight.call)
+
+    def _join_shared(self, flight):
+        lock_key, result_key = self._keys(flight.key)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result = self._take_lock(flight)
+            if result is not None:
+                return self._adopt(flight, result)
+            if flight.lock_key:
+                return
+            # Another worker is leading: wait for its result
+            while time.monotonic() < deadline:
+                time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+                result = self._shared_poll(lock_key, result_key)
+                if result is _GONE:
+                    break
+                if result is not None:
+                    return self._adopt(flight, result)
+            else:
+                return self._give_up(flight)
+            # The leader finished without a shareable result or its lock expired; try to take over
+
+    async def _ajoin_shared(self, flight):
+        lock_key, result_key = self._keys(flight.key)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result = await sync_to_async(self._take_lock)(flight)
+            if result is not None:
+                return self._adopt(flight, result)
+            if flight.lock_key:
+                return
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+                result = await sync_to_async(self._shared_poll)(lock_key, result_key)
+                if result is _GONE:
+                    break
+                if result is not None:
+                    return self._adopt(flight, result)
+            else:
+                return self._give_up(flight)
+
+    def get_stats(self):
+        return {"in_flight": len(self.calls), "coalesced": self.coalesced}
+
+
+# Embedding API calls, keyed by (dimensions, normalized text)
+embedding_flights = SingleFlight("embedding")
+# Chat completions, keyed by (normalized question, model, prompt version, retrieved documents)
+completion_flights = SingleFlight("completion")
+# Chat requests being answered, keyed by message_id. Always shared, so a retry
+# that reaches another worker waits for the first request instead of redoing it
+chat_request_flights = SingleFlight("chat-request", timeout=settings.CHAT_IN_FLIGHT_TIMEOUT, shared=True)
@@ -0,0 +1,225 @@
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+
+from .search_cache import SearchHit, search_cache
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """Unit-normalized float32 vectors of one named vector, row-aligned with their objects"""
+
+    def __init__(self, generation, dimensions, matrix, uuids, properties, built_at):
+        self.generation = generation
+        self.dimensions = dimensions
+        self.matrix = matrix
+        self.uuids = uuids
+        self.properties = properties
+        self.built_at = built_at
+
+    def search(self, embedding, limit, include_vector=False):
+        from knowledgebase.vectorization import vector_name
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm or not len(self.uuids):
+            return []
+        similarities = self.matrix @ (query / norm)
+
+        k = min(limit, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        # Same convention as Weaviate's cosine distance
+        name = vector_name(self.dimensions)
+        return [
+            SearchHit(
+                self.uuids[row], dict(self.properties[row]), distance=float(1.0 - similarities[row]),
+                vector={name: self.matrix[row]} if include_vector else None
+            )
+            for row in top
+        ]
+
+
+class LocalVectorIndex:
+    """In-process replica of the Document vectors for brute-force cosine search.
+
+    The corpus is small enough that a matrix product over every vector beats a
+    network round trip to Weaviate. Each named vector is snapshotted to
+    LOCAL_VECTOR_INDEX_DIR as a .npy matrix plus a JSON sidecar of UUIDs and
+    properties, named after the knowledge-base generation (see
+    ``search_cache``); workers memory-map the matrix, so they share its pages.
+    A snapshot is re-fetched from Weaviate when the generation moves on or it
+    is older than LOCAL_VECTOR_INDEX_MAX_AGE. Weaviate stays the source of
+    truth: whenever the index cannot answer, ``search`` returns None and the
+    caller queries Weaviate.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.LOCAL_VECTOR_INDEX_DIR
+        self.max_rows = settings.LOCAL_VECTOR_INDEX_MAX_ROWS
+        self.max_age = settings.LOCAL_VECTOR_INDEX_MAX_AGE
+        self.lock = threading.Lock()
+        self.snapshots = {}  # dimensions -> _Snapshot
+        self.oversized = {}  # dimensions -> generation at which the collection exceeded max_rows
+
+    def search(self, manager, embedding, dimensions, limit, include_vector=False):
+        """Return the top ``limit`` objects for ``embedding`` as SearchHit objects, or None"""
+        # Without the generation there is no way to tell whether a snapshot is current
+        generation = search_cache.generation()
+        if generation is None:
+            return None
+        snapshot = self._snapshot(manager, dimensions, generation)
+        if snapshot is None:
+            return None
+        return snapshot.search(embedding, limit, include_vector)
+
+    def _is_current(self, snapshot, generation):
+        return (
+            snapshot is not None
+            and snapshot.generation == generation
+            and time.time() - snapshot.built_at < self.max_age
+        )
+
+    def _snapshot(self, manager, dimensions, generation):
+        snapshot = self.snapshots.get(dimensions)
+        if self._is_current(snapshot, generation):
+            return snapshot
+        if self.oversized.get(dimensions) == generation:
+            return None
+
+        with self.lock:
+            snapshot = self.snapshots.get(dimensions)
+            if self._is_current(snapshot, generation):
+                return snapshot
+            try:
+                # Another worker may already have written this generation
+                snapshot = self._load(dimensions, generation)
+                if not self._is_current(snapshot, generation):
+                    snapshot = self._refresh(manager, dimensions, generation)
+            except Exception as e:
+                logger.warning(f"Local vector index unavailable, searching Weaviate: {e}")
+                return None
+            if snapshot is not None:
+                self.snapshots[dimensions] = snapshot
+            return snapshot
+
+    def _meta_path(self, dimensions, generation):
+        return os.path.join(self.directory, f"document-{dimensions}-{generation}.json")
+
+    def _load(self, dimensions, generation):
+        meta_path = self._meta_path(dimensions, generation)
+        # The sidecar is written last and names its own matrix, so its presence
+        # means that matrix is complete
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        # No matrix: written by an older version, or pruned by another worker's refresh
+        if 'matrix' not in meta or not os.path.exists(os.path.join(self.directory, meta['matrix'])):
+            return None
+        matrix_path = os.path.join(self.directory, meta['matrix'])
+        matrix = np.load(matrix_path, mmap_mode='r')
+        logger.info(f"Loaded local vector index snapshot {matrix_path} ({len(meta['uuids'])} vectors)")
+        return _Snapshot(generation, dimensions, matrix, meta['uuids'], meta['properties'], meta['built_at'])
+
+    def _refresh(self, manager, dimensions, generation):
+        """Fetch every vector of this size from Weaviate and write a new snapshot"""
+        from knowledgebase.vectorization import vector_name
+        from .weaviate_client import SEARCH_RETURN_PROPERTIES
+
+        started = time.monotonic()
+        documents = manager.get_collection("Document")
+        total = documents.aggregate.over_all(total_count=True).total_count
+        if total > self.max_rows:
+            logger.info(f"Document collection has {total} objects (> {self.max_rows}); not indexing locally")
+            self.oversized[dimensions] = generation
+            return None
+
+        name = vector_name(dimensions)
+        uuids, properties, vectors = [], [], []
+        for obj in documents.iterator(include_vector=True, return_properties=SEARCH_RETURN_PROPERTIES):
+            vector = (obj.vector or {}).get(name)
+            if vector is None:
+                continue
+            uuids.append(str(obj.uuid))
+            properties.append(dict(obj.properties))
+            vectors.append(vector)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        built_at = time.time()
+        self._write(dimensions, generation, matrix, uuids, properties, built_at)
+        logger.info(
+            f"Refreshed local vector index: {len(uuids)} x {dimensions} vectors for generation "
+            f"{generation} in {time.monotonic() - started:.2f}s"
+        )
+        return self._load(dimensions, generation)
+
+    def _write(self, dimensions, generation, matrix, uuids, properties, built_at):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = self._meta_path(dimensions, generation)
+        # Every build gets a matrix file of its own, which the sidecar names:
+        # workers refreshing the same generation at once never overwrite each
+        # other's matrix, so a sidecar can't be paired with another build's
+        matrix_name = f"document-{dimensions}-{generation}-{uuid.uuid4().hex}.npy"
+        matrix_path = os.path.join(self.directory, matrix_name)
+        self._write_atomic(matrix_path, lambda f: np.save(f, matrix))
+        meta = {"matrix": matrix_name, "uuids": uuids, "properties": properties, "built_at": built_at}
+        self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+        # Drop older generations, and builds of this one that are past max_age
+        # (younger ones may belong to a worker that has yet to write its
+        # sidecar); workers still mapping them keep their pages until they refresh
+        current = f"document-{dimensions}-{generation}-"
+        for path in glob.glob(os.path.join(self.directory, f"document-{dimensions}-*")):
+            name = os.path.basename(path)
+            if path in (matrix_path, meta_path):
+                continue
+            try:
+                if name.startswith(current) and time.time() - os.path.getmtime(path) < self.max_age:
+                    continue
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_atomic(self, path, write):
+        """Write ``path`` through a temporary file unique to this call, then move it into place"""
+        # The dot prefix keeps it out of the cleanup glob while another worker writes it
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp', delete=False
+        ) as tmp_file:
+            try:
+                write(tmp_file)
+            except BaseException:
+                tmp_file.close()
+                os.remove(tmp_file.name)
+                raise
+        os.replace(tmp_file.name, path)
+
+    def get_stats(self):
+        return {
+            "enabled": settings.LOCAL_VECTOR_INDEX_ENABLED,
+            "snapshots": [
+                {
+                    "dimensions": snapshot.dimensions,
+                    "vectors": len(snapshot.uuids),
+                    "generation": snapshot.generation,
+                    "age_seconds": round(time.time() - snapshot.built_at),
+                }
+                for snapshot in self.snapshots.values()
+            ],
+        }
+
+
+local_vector_index = LocalVectorIndex()
@@ -1,52 +1,193 @@
 import weaviate
 from django.conf import settings
 from weaviate.connect import ConnectionParams
-from weaviate.classes.config import Configure
+from weaviate.classes.config import Configure, DataType, Property, VectorDistances
 from weaviate.auth import AuthApiKey  # Correct import to avoid deprecation warning
+from weaviate.classes.data import DataObject
+from weaviate.classes.query import Filter, HybridFusion, MetadataQuery
 from uuid import uuid5, NAMESPACE_URL
+import asyncio
+import atexit
+import hashlib
 import os
+import threading
+import weakref
+from .search_cache import search_cache
 from django.utils import timezone
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+DOCUMENT_PROPERTIES = [
+    Property(name="content", data_type=DataType.TEXT, description="The content of the document chunk"),
+    Property(name="title", data_type=DataType.TEXT, description="The title of the document"),
+    Property(name="file_path", data_type=DataType.TEXT, description="Path to the original document"),
+    Property(name="content_hash", data_type=DataType.TEXT, description="SHA-256 of the document content"),
+    Property(name="embedding_model", data_type=DataType.TEXT, description="Model used to embed the content"),
+    Property(name="embedding_dimensions", data_type=DataType.INT, description="Dimensions of the stored vector"),
+    Property(name="parent_id", data_type=DataType.TEXT, description="UUID of the document this chunk belongs to"),
+    Property(name="chunk_index", data_type=DataType.INT, description="Position of the chunk within its document"),
+    Property(name="chunk_count", data_type=DataType.INT, description="Number of chunks in the parent document"),
+    Property(name="token_count", data_type=DataType.INT, description="Number of tokens in the chunk"),
+    Property(name="cluster_id", data_type=DataType.TEXT, description="UUID of the canonical document of its near-duplicate cluster"),
+]
+
+ANSWER_CACHE_PROPERTIES = [
+    Property(name="question", data_type=DataType.TEXT, description="The question that was answered"),
+    Property(name="answer", data_type=DataType.TEXT, description="The generated answer"),
+    Property(name="sources", data_type=DataType.TEXT_ARRAY, description="Titles of the documents cited"),
+    Property(name="model", data_type=DataType.TEXT, description="Chat model that generated the answer"),
+    Property(name="prompt_version", data_type=DataType.TEXT, description="Version hash of the system prompt"),
+    Property(name="doc_set_hash", data_type=DataType.TEXT, description="Hash of the retrieved document chunks"),
+    Property(name="embedding_dimensions", data_type=DataType.INT, description="Size of the question vector"),
+    Property(name="total_tokens", data_type=DataType.INT, description="Tokens the completion cost"),
+    Property(name="created_at", data_type=DataType.DATE, description="When the answer was cached"),
+    Property(name="expires_at", data_type=DataType.DATE, description="When the cached answer expires"),
+]
+
+
+SEARCH_RETURN_PROPERTIES = ["title", "content", "file_path", "parent_id", "chunk_index", "chunk_count", "cluster_id"]
+
+# BM25F fields for hybrid/keyword search; a match in the title counts double
+HYBRID_QUERY_PROPERTIES = ["content", "title^2"]
+
+FUSION_TYPES = {
+    "relative_score": HybridFusion.RELATIVE_SCORE,
+    "ranked": HybridFusion.RANKED,
+}
+
+
+def search_variant(alpha=None, fusion_type=None, mmr_lambda=None):
+    """Label for the kind of search, used to keep cached results apart"""
+    if alpha is None:
+        variant = "vector"
+    elif alpha == 0:
+        # Keyword-only searches have no query vector to re-rank against
+        return "bm25"
+    else:
+        variant = f"hybrid:{alpha:g}:{fusion_type or 'relative_score'}"
+    if mmr_lambda is not None:
+        variant += f"+mmr:{mmr_lambda:g}"
+    return variant
+
+
+def search_query(query, query_embedding, embedding_dimensions, limit, alpha=None, fusion_type=None,
+                 include_vector=False):
+    """Return the Document query method name and its arguments for a search.
+
+    ``alpha=None`` is a pure near_vector search, ``alpha=0`` a pure BM25
+    search (no embedding needed) and anything in between a hybrid search.
+    ``include_vector`` returns each object's vector of the searched size.
+    """
+    from knowledgebase.vectorization import vector_name
+
+    common = {
+        "limit": limit,
+        "return_properties": SEARCH_RETURN_PROPERTIES,
+        "include_vector": [vector_name(embedding_dimensions)] if include_vector else False,
+    }
+    if alpha is None:
+        return "near_vector", dict(
+            common,
+            near_vector=query_embedding,
+            target_vector=vector_name(embedding_dimensions),
+            return_metadata=MetadataQuery(distance=True)
+        )
+    if alpha == 0:
+        return "bm25", dict(
+            common,
+            query=query,
+            query_properties=HYBRID_QUERY_PROPERTIES,
+            return_metadata=MetadataQuery(score=True)
+        )
+    return "hybrid", dict(
+        common,
+        query=query,
+        vector=query_embedding,
+        target_vector=vector_name(embedding_dimensions),
+        alpha=alpha,
+        fusion_type=FUSION_TYPES[fusion_type or "relative_score"],
+        query_properties=HYBRID_QUERY_PROPERTIES,
+        return_metadata=MetadataQuery(score=True, distance=True)
+    )
+
+
+def diversify(query_embedding, results, embedding_dimensions, limit, mmr_lambda=None, collapse=False):
+    """Cut over-fetched search results down to ``limit``.
+
+    ``collapse`` keeps one result per near-duplicate cluster (see
+    ``knowledgebase.dedup``); ``mmr_lambda`` then MMR re-ranks what is left.
+    """
+    if collapse:
+        from knowledgebase.dedup import collapse_duplicates
+        results = collapse_duplicates(results, len(results))
+    if mmr_lambda is None or query_embedding is None:
+        return list(results[:limit])
+    from knowledgebase.vectorization import vector_name
+    from .reranking import rerank_mmr
+    return rerank_mmr(query_embedding, results, vector_name(embedding_dimensions), limit, mmr_lambda)
+
+
+def compute_content_hash(content):
+    """Stable hash of document content used for change detection"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def weaviate_api_key(admin_access=False):
+    """The API key for the given access level"""
+    if admin_access:
+        return os.environ.get('WEAVIATE_ADMIN_KEY')
+    return os.environ.get('WEAVIATE_USER_KEY')
+
+
+def weaviate_connection_params():
+    return ConnectionParams.from_url(
+        url=settings.WEAVIATE_URL,
+        grpc_port=50051  # Default gRPC port for Weaviate
+    )
+
+
 class WeaviateManager:
-    def __init__(self, admin_access=False):
+    def __init__(self, admin_access=False, lazy=False):
         # Set the appropriate API key based on access level
-        if admin_access:
-            self.api_key = os.environ.get('WEAVIATE_ADMIN_KEY')
-        else:
-            self.api_key = os.environ.get('WEAVIATE_USER_KEY')
+        self.api_key = weaviate_api_key(admin_access)
             
         self.admin_access = admin_access
         self.client = None
         self.collections = None
-        self.connect()
+        self.connect_lock = threading.Lock()
+        if not lazy:
+            self.connect()
         
     def connect(self):
         """Explicitly connect to Weaviate"""
-        try:
-            connection_params = ConnectionParams.from_url(
-                url=settings.WEAVIATE_URL,
-                grpc_port=50051  # Default gRPC port for Weaviate
-            )
+        with self.connect_lock:
+            # Drop a previous (broken) client before replacing it
+            if self.client is not None:
+                try:
+                    self.client.close()
+                except Exception:
+                    pass
+                self.client = None
+                self.collections = None
 
-            # Connect with authentication
-            self.client = weaviate.WeaviateClient(
-                connection_params=connection_params,
-                auth_client_secret=AuthApiKey(api_key=self.api_key)
-            )
+            try:
+                # Connect with authentication
+                client = weaviate.WeaviateClient(
+                    connection_params=weaviate_connection_params(),
+                    auth_client_secret=AuthApiKey(api_key=self.api_key)
+                )
 
-            # Explicitly connect the client
-            self.client.connect()
-            
-            # Get the collections object for easier access
-            self.collections = self.client.collections
-            
-        except Exception as e:
-            print(f"Error initializing Weaviate connection: {e}")
-            raise
+                # Explicitly connect the client
+                client.connect()
+                self.client = client
+                
+                # Get the collections object for easier access
+                self.collections = self.client.collections
+                
+            except Exception as e:
+                print(f"Error initializing Weaviate connection: {e}")
+                raise
 
     def __enter__(self):
         """Support for context manager pattern"""
@@ -71,144 +212,708 @@ class WeaviateManager:
         self.close()
 
     def ensure_connected(self):
-        """Ensure the client is connected, reconnect if necessary"""
-        if self.client is None:
-            self.connect()
-            return
-            
-        try:
-            # Simple operation to test connection
-            self.client.get_meta()
-        except weaviate.exceptions.WeaviateClosedClientError:
-            print("Reconnecting to Weaviate...")
-            self.connect()
-        except Exception as e:
-            print(f"Error checking Weaviate connection: {e}")
-            # Attempt to reconnect
+        """Ensure the client is connected, reconnect if necessary.
+
+        This only checks local connection state; it never makes a network
+        round trip (liveness is checked in the background for pooled managers).
+        """
+        if self.client is None or not self.client.is_connected():
+            if self.client is not None:
+                print("Reconnecting to Weaviate...")
             self.connect()
 
+    def mark_unhealthy(self):
+        """Drop the client so the next call reconnects (e.g. after a connection error)"""
+        self.close()
+
+    def get_collection(self, name):
+        """Return a collection handle, connecting first if needed"""
+        self.ensure_connected()
+        return self.collections.get(name)
+
     def create_document_schema(self):
         """Create schema for document storage if it doesn't exist"""
+        from knowledgebase.vectorization import VECTOR_DIMENSIONS, vector_name
+
         # Best practice: Explicitly define schema rather than using auto-schema
-        try:
-            self.ensure_connected()
-            self.collections.get("Document")
+        self.ensure_connected()
+        if self.collections.exists("Document"):
             print("Document collection already exists")
-        except weaviate.exceptions.WeaviateQueryError:
-            # Create the collection with explicit properties
-            self.collections.create(
-                name="Document",
-                description="A document in the knowledge base",
-                vectorizer_config=Configure.Vectorizer.none(),  # We'll provide our own vectors
-                properties=[
-                    {
-                        "name": "content",
-                        "dataType": ["text"],
-                        "description": "The content of the document"
-                    },
-                    {
-                        "name": "title", 
-                        "dataType": ["string"],
-                        "description": "The title of the document"
-                    },
-                    {
-                        "name": "file_path",
-                        "dataType": ["string"],
-                        "description": "Path to the original document"
-                    }
-                ]
+            self._ensure_document_properties()
+            return
+
+        # Create the collection with explicit properties and one named vector per stored size
+        self.collections.create(
+            name="Document",
+            description="A document in the knowledge base",
+            vectorizer_config=[
+                Configure.NamedVectors.none(name=vector_name(dimensions))  # We'll provide our own vectors
+                for dimensions in VECTOR_DIMENSIONS
+            ],
+            properties=DOCUMENT_PROPERTIES
+        )
+        print("Created Document collection")
+
+    def create_answer_cache_schema(self):
+        """Create the AnswerCache collection (see ``answer_cache``) if it doesn't exist"""
+        self.ensure_connected()
+        if self.collections.exists("AnswerCache"):
+            print("AnswerCache collection already exists")
+            return
+
+        self.collections.create(
+            name="AnswerCache",
+            description="Chat answers reused for near-duplicate questions",
+            vectorizer_config=Configure.Vectorizer.none(),  # Question embeddings are provided
+            vector_index_config=Configure.VectorIndex.hnsw(distance_metric=VectorDistances.COSINE),
+            properties=ANSWER_CACHE_PROPERTIES
+        )
+        print("Created AnswerCache collection")
+
+    def recreate_document_schema(self):
+        """Drop and recreate the Document collection (all stored documents are lost)"""
+        self.ensure_connected()
+        if self.collections.exists("Document"):
+            self.collections.delete("Document")
+            print("Deleted Document collection")
+            search_cache.bump_generation()
+        self.create_document_schema()
+
+    def _ensure_document_properties(self):
+        """Add properties introduced after the collection was first created, and flag missing named vectors"""
+        from knowledgebase.vectorization import VECTOR_DIMENSIONS, vector_name
+
+        collection = self.collections.get("Document")
+        config = collection.config.get()
+
+        existing = {prop.name for prop in config.properties}
+        for prop in DOCUMENT_PROPERTIES:
+            if prop.name not in existing:
+                collection.config.add_property(prop)
+                print(f"Added property '{prop.name}' to Document collection")
+
+        # Named vectors cannot be added to an existing collection
+        missing_vectors = {vector_name(dimensions) for dimensions in VECTOR_DIMENSIONS} - set(config.vector_config or {})
+        if missing_vectors:
+            logger.warning(
+                f"Document collection is missing named vectors {sorted(missing_vectors)}; "
+                "run 'initialize_weaviate --recreate' and then 'process_documents' to rebuild it"
             )
-            print("Created Document collection")
-    
+
+    @staticmethod
+    def document_uuid(file_path):
+        """Deterministic UUID of a document, shared with its first chunk"""
+        return str(uuid5(NAMESPACE_URL, os.path.normpath(file_path)))
+
+    @staticmethod
+    def chunk_uuid(file_path, chunk_index):
+        """Deterministic UUID of one chunk of a document"""
+        file_path = os.path.normpath(file_path)
+        if chunk_index == 0:
+            # Single-chunk documents keep the UUID they had before chunking existed
+            return str(uuid5(NAMESPACE_URL, file_path))
+        return str(uuid5(NAMESPACE_URL, f"{file_path}#chunk-{chunk_index}"))
+
+    def build_chunks(self, document, chunks):
+        """Attach storage metadata (UUIDs, parent link, hashes) to the chunks of one document"""
+        chunks = list(chunks)
+        file_path = os.path.normpath(document['file_path'])
+        return [
+            {
+                "uuid": self.chunk_uuid(file_path, index),
+                "title": document['title'],
+                "content": chunk['text'],
+                "file_path": file_path,
+                "content_hash": document['content_hash'],
+                "chunk_hash": compute_content_hash(chunk['text']),
+                "parent_id": self.document_uuid(file_path),
+                "cluster_id": document.get('cluster_id') or self.document_uuid(file_path),
+                "chunk_index": index,
+                "chunk_count": len(chunks),
+                "token_count": chunk['token_count'],
+            }
+            for index, chunk in enumerate(chunks)
+        ]
+
+    def _expected_properties(self, content_hash, cluster_id):
+        """Change-detection properties a stored chunk must match to be reused"""
+        from knowledgebase.vectorization import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+
+        return {
+            "content_hash": content_hash,
+            "cluster_id": cluster_id,
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_dimensions": EMBEDDING_DIMENSIONS
+        }
+
+    def _chunk_properties(self, chunk):
+        """Build the stored properties of a chunk"""
+        properties = {
+            key: chunk[key]
+            for key in ("title", "content", "file_path", "parent_id", "chunk_index", "chunk_count", "token_count")
+        }
+        properties.update(self._expected_properties(chunk['content_hash'], chunk['cluster_id']))
+        return properties
+
     def store_document(self, title, content, file_path):
-        """Store a document with its embedding in Weaviate"""
-        from knowledgebase.vectorization import generate_embedding
+        """Chunk, embed and store a document in Weaviate, skipping it if unchanged"""
+        from knowledgebase.chunking import chunk_text
+
+        document = {
+            "title": title,
+            "file_path": os.path.normpath(file_path),
+            "content_hash": compute_content_hash(content),
+            "is_blank": not content.strip()
+        }
+        return self._store_if_changed(document, lambda: chunk_text(content))
+
+    def store_file(self, file_path, title=None):
+        """Like ``store_document`` but hashes and chunks the file as a stream"""
+        from knowledgebase.chunking import chunk_file, file_is_blank, hash_file
+
+        file_path = os.path.normpath(file_path)
+        document = {
+            "title": title or os.path.basename(file_path),
+            "file_path": file_path,
+            "content_hash": hash_file(file_path),
+            "is_blank": file_is_blank(file_path)
+        }
+        return self._store_if_changed(document, lambda: chunk_file(file_path))
+
+    def _store_if_changed(self, document, make_chunks):
+        """Store one document's chunks unless the stored copy is already up to date"""
+        from knowledgebase.vectorization import generate_embeddings
         
         try:
             # Ensure connection is active
             self.ensure_connected()
-                
-            # Normalize the file path to ensure consistency
-            normalized_path = os.path.normpath(file_path)
-                
-            # Generate a deterministic UUID based on the file path
-            deterministic_uuid = str(uuid5(NAMESPACE_URL, normalized_path))
-                
-            # Check if document with this UUID already exists
-            documents = self.collections.get("Document")
-                
-            # Use exists() method instead of get_by_id()
-            exists = documents.data.exists(deterministic_uuid)
-                
-            if exists:
-                print(f"Document {title} already exists with UUID: {deterministic_uuid}")
-                return deterministic_uuid
-                    
-            # Generate embedding
-            embedding = generate_embedding(content)
-            print(f"Generated embedding with {len(embedding)} dimensions")
-                
-            # Insert the document with its vector and deterministic UUID
-            result = documents.data.insert(
-                properties={
-                    "title": title,
-                    "content": content,
-                    "file_path": normalized_path
-                },
-                vector=embedding,
-                uuid=deterministic_uuid
+            title = document['title']
+            document_uuid = self.document_uuid(document['file_path'])
+
+            # Skip the embedding calls if the stored copy is identical
+            changed, _, _ = self.diff_documents(
+                [document],
+                manifest=self.fetch_document_manifest(file_path=document['file_path'])
             )
-                
-            print(f"Document {title} stored with UUID: {deterministic_uuid}")
-            return deterministic_uuid
+            if not changed:
+                print(f"Document {title} is unchanged (UUID: {document_uuid})")
+                return document_uuid
+
+            chunks = self.build_chunks(document, make_chunks())
+            embeddings = generate_embeddings([chunk['content'] for chunk in chunks])
+            print(f"Generated {len(embeddings)} chunk embeddings for {title}")
+
+            self.write_chunks(chunks, embeddings)
+            self.delete_documents(self.stale_chunk_uuids(document, chunks))
+
+            print(f"Document {title} stored as {len(chunks)} chunk(s) with UUID: {document_uuid}")
+            return document_uuid
         
-        except weaviate.exceptions.UnexpectedStatusCodeError as e:
-            # Handle the case where the object already exists (status 422)
-            if "already exists" in str(e):
-                print(f"Document {title} already exists with UUID: {deterministic_uuid}")
-                return deterministic_uuid
-            else:
-                print(f"Error storing document: {e}")
-                raise
         except Exception as e:
             print(f"Error storing document: {e}")
             raise
 
-    def search_documents(self, query, limit=5, embedding_dimensions=None):
-        """Search for documents similar to the query using text-embedding-3-large"""
-        from knowledgebase.vectorization import generate_embedding
+    @staticmethod
+    def _is_stale(stored, properties):
+        """Whether a stored object needs re-embedding to match ``properties``"""
+        return any(stored.get(key) != value for key, value in properties.items())
+
+    def fetch_document_manifest(self, file_path=None):
+        """Fetch change-detection metadata for stored chunks.
+
+        Without ``file_path`` every chunk is fetched in one paginated pass.
+        Returns a dict mapping UUID -> properties (file_path, content_hash,
+        cluster_id, embedding_model, embedding_dimensions, chunk_count).
+        """
+        self.ensure_connected()
+        collection = self.collections.get("Document")
+        return_properties = [
+            "file_path", "content_hash", "cluster_id", "embedding_model", "embedding_dimensions", "chunk_count"
+        ]
+
+        if file_path is not None:
+            result = collection.query.fetch_objects(
+                filters=Filter.by_property("file_path").equal(os.path.normpath(file_path)),
+                limit=10000,
+                return_properties=return_properties
+            )
+            return {str(obj.uuid): obj.properties for obj in result.objects}
+
+        return {
+            str(obj.uuid): obj.properties
+            for obj in collection.iterator(return_properties=return_properties)
+        }
+
+    def diff_documents(self, documents, scope_dir=None, manifest=None):
+        """Compare local documents against the stored chunk manifest.
+
+        ``documents`` are dicts with ``title``, ``file_path``, ``content_hash``
+        and optionally ``cluster_id`` (see ``knowledgebase.dedup``) and
+        ``is_blank``. Returns ``(changed, vanished, stats)``: the documents that are new or
+        changed (by content hash, embedding model or dimensions, or with chunks
+        missing), the UUIDs of every stored chunk under ``scope_dir`` whose file
+        no longer exists locally, and a dict of per-document counts (added,
+        updated, unchanged, empty, deleted). Each document gets a
+        ``stored_chunk_uuids`` set for ``stale_chunk_uuids``.
+
+        Blank documents have no chunks, so nothing in the manifest records
+        them; they are counted as empty rather than added on every sync. One
+        that still has stored chunks is changed, so those chunks get deleted.
+        """
+        if manifest is None:
+            manifest = self.fetch_document_manifest()
+
+        stored_by_path = {}
+        for chunk_uuid, stored in manifest.items():
+            stored_by_path.setdefault(stored.get("file_path"), {})[chunk_uuid] = stored
+
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "empty": 0, "deleted": 0}
+        changed = []
+        local_paths = set()
+        for doc in documents:
+            doc['file_path'] = os.path.normpath(doc['file_path'])
+            local_paths.add(doc['file_path'])
+
+            stored_chunks = stored_by_path.get(doc['file_path'], {})
+            doc['stored_chunk_uuids'] = set(stored_chunks)
+            # A document that joins or leaves a duplicate cluster is rewritten (its
+            # embeddings come from the embedding cache, so this costs no API calls)
+            expected = self._expected_properties(
+                doc['content_hash'], doc.get('cluster_id') or self.document_uuid(doc['file_path'])
+            )
+
+            if not stored_chunks and doc.get('is_blank'):
+                stats["empty"] += 1
+            elif not stored_chunks:
+                stats["added"] += 1
+                changed.append(doc)
+            elif any(
+                self._is_stale(stored, expected) or (stored.get("chunk_count") or 1) != len(stored_chunks)
+                for stored in stored_chunks.values()
+            ):
+                stats["updated"] += 1
+                changed.append(doc)
+            else:
+                stats["unchanged"] += 1
+
+        vanished = []
+        if scope_dir is not None:
+            scope_dir = os.path.normpath(scope_dir) + os.sep
+            for file_path, stored_chunks in stored_by_path.items():
+                if file_path not in local_paths and (file_path or "").startswith(scope_dir):
+                    vanished.extend(stored_chunks)
+                    stats["deleted"] += 1
+
+        return changed, vanished, stats
+
+    @staticmethod
+    def stale_chunk_uuids(document, chunks):
+        """UUIDs of previously stored chunks of ``document`` not overwritten by ``chunks``"""
+        return sorted(document.get('stored_chunk_uuids', set()) - {chunk['uuid'] for chunk in chunks})
+
+    def sync_documents(self, documents, scope_dir=None, batch_size=None):
+        """Bring Weaviate in line with a local set of documents.
+
+        ``documents`` are dicts with ``title``, ``content`` and ``file_path``.
+        Only new or changed documents are chunked, embedded and upserted, and
+        stored documents whose file lives under ``scope_dir`` but is no longer
+        in ``documents`` are deleted. Returns the counts from ``diff_documents``.
+        """
+        from knowledgebase.chunking import chunk_text
+        from knowledgebase.vectorization import generate_embeddings
+
+        if batch_size is None:
+            batch_size = getattr(settings, 'WEAVIATE_BATCH_SIZE', 100)
+
+        for doc in documents:
+            doc['content_hash'] = compute_content_hash(doc['content'])
+            doc['is_blank'] = not doc['content'].strip()
+        changed, vanished, stats = self.diff_documents(documents, scope_dir=scope_dir)
+
+        chunks = []
+        stale = list(vanished)
+        for doc in changed:
+            doc_chunks = self.build_chunks(doc, chunk_text(doc['content']))
+            chunks.extend(doc_chunks)
+            stale.extend(self.stale_chunk_uuids(doc, doc_chunks))
+
+        embeddings = generate_embeddings([chunk['content'] for chunk in chunks])
+        for start in range(0, len(chunks), batch_size):
+            self.write_chunks(chunks[start:start + batch_size], embeddings[start:start + batch_size])
+
+        self.delete_documents(stale)
+        return stats
+
+    def delete_documents(self, uuids, batch_size=None, with_chunks=False):
+        """Delete documents by UUID in batches, returning the number of objects deleted.
+
+        With ``with_chunks`` the chunks whose ``parent_id`` is one of ``uuids``
+        go too, so a document UUID removes the whole document.
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, 'WEAVIATE_BATCH_SIZE', 100)
+
+        self.ensure_connected()
+        collection = self.collections.get("Document")
+        deleted = 0
+        for start in range(0, len(uuids), batch_size):
+            batch = uuids[start:start + batch_size]
+            where = Filter.by_id().contains_any(batch)
+            if with_chunks:
+                where = where | Filter.by_property("parent_id").contains_any(batch)
+            result = collection.data.delete_many(where=where)
+            deleted += result.successful
+        if deleted:
+            search_cache.bump_generation()
+        return deleted
+
+    def write_chunks(self, chunks, embeddings):
+        """Upsert already-embedded chunks (see ``build_chunks``) with a single insert_many call.
+
+        ``embeddings`` are full-size; every named vector is derived from them locally.
+
+        Returns a dict mapping the index of each failed chunk to its error message.
+        """
+        self.ensure_connected()
+        collection = self.collections.get("Document")
+
+        from knowledgebase.vectorization import derive_named_vectors
+
+        objects = [
+            DataObject(
+                properties=self._chunk_properties(chunk),
+                vector=derive_named_vectors(embedding),
+                uuid=chunk['uuid']
+            )
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        result = collection.data.insert_many(objects)
+        search_cache.bump_generation()
+
+        failures = {}
+        for index, error in result.errors.items():
+            chunk = chunks[index]
+            print(f"Error storing chunk {chunk['chunk_index']} of {chunk['title']}: {error.message}")
+            failures[index] = error.message
+        print(f"Stored {len(objects) - len(failures)} chunks in batch")
+        return failures
+
+    def search_documents(self, query, limit=5, embedding_dimensions=None, alpha=None, fusion_type=None,
+                         mmr_lambda=None, collapse_duplicates=None, raise_errors=False):
+        """Search for documents similar to the query using text-embedding-3-large.
+
+        The query is embedded at the size of the named vector it is routed to
+        (see ``resolve_search_dimensions``), e.g. 256 for low-latency searches
+        or 3072 for maximum recall. Results of repeated queries are served
+        from ``search_cache`` until the next document write or delete.
+
+        Passing ``alpha`` switches to hybrid search: BM25F keyword scores over
+        content and title fused (``fusion_type``) with vector similarity,
+        weighted 0 = keywords only ... 1 = vector only. With ``alpha=0`` the
+        query is never embedded.
+
+        Near-duplicate documents are collapsed to their best-ranked hit
+        (``collapse_duplicates``, default SEARCH_COLLAPSE_DUPLICATES). With
+        ``mmr_lambda`` set, the candidates are also re-ranked by maximal
+        marginal relevance (see ``reranking.mmr``) so similar chunks don't
+        crowd out other information; this has no effect on keyword-only
+        searches. Either way MMR_FETCH_FACTOR times ``limit`` candidates are
+        fetched first.
+
+        With LOCAL_VECTOR_INDEX_ENABLED, pure vector searches are answered
+        from the in-process ``local_vector_index`` replica, falling back to
+        Weaviate whenever it cannot serve them.
+
+        Errors (Weaviate unreachable, query embedding failed) return no
+        results, or are raised with ``raise_errors=True`` so callers can fall
+        back to another retriever.
+        """
+        from knowledgebase.vectorization import generate_embedding, resolve_search_dimensions
         
         try:
-            # Ensure connection is active
-            self.ensure_connected()
+            # Route the query to the matching named vector
+            embedding_dimensions = resolve_search_dimensions(embedding_dimensions)
+            if alpha == 0:
+                mmr_lambda = None
+            if collapse_duplicates is None:
+                collapse_duplicates = settings.SEARCH_COLLAPSE_DUPLICATES
+            rerank = mmr_lambda is not None or collapse_duplicates
+            fetch_limit = limit * settings.MMR_FETCH_FACTOR if rerank else limit
+            
+            # Key on the generation read *before* searching, so results racing
+            # an ingest are filed under the generation it invalidates
+            variant = search_variant(alpha, fusion_type, mmr_lambda) + ("+collapsed" if collapse_duplicates else "")
+            cache_key = search_cache.key(query, embedding_dimensions, limit, variant)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Search cache hit: {len(cached)} results")
+                return cached
             
-            # Use consistent 1536 dimensions if none specified
-            if embedding_dimensions is None:
-                embedding_dimensions = 1536
+            # Generate embedding for the query at the size of that vector
+            query_embedding = None
+            if alpha is None or alpha > 0:
+                # A zero vector would match arbitrary documents, so embedding errors abort the search
+                query_embedding = generate_embedding(query, dimensions=embedding_dimensions, raise_errors=True)
+                logger.info(f"Generated query embedding with {len(query_embedding)} dimensions")
             
-            # Generate embedding for the query with optional dimensions
-            query_embedding = generate_embedding(query, dimensions=embedding_dimensions)
-            logger.info(f"Generated query embedding with {len(query_embedding)} dimensions")
+            if alpha is None and settings.LOCAL_VECTOR_INDEX_ENABLED:
+                from .vector_index import local_vector_index
+                results = local_vector_index.search(
+                    self, query_embedding, embedding_dimensions, fetch_limit, include_vector=mmr_lambda is not None
+                )
+                if results is not None:
+                    logger.info(f"Served {len(results)} results from the local vector index")
+                    results = diversify(
+                        query_embedding, results, embedding_dimensions, limit, mmr_lambda, collapse_duplicates
+                    )
+                    search_cache.set(cache_key, results)
+                    return results
+            
+            # Ensure connection is active
+            self.ensure_connected()
             
             # Get the Document collection
             documents = self.collections.get("Document")
             
             # Search for similar documents
-            result = documents.query.near_vector(
-                near_vector=query_embedding,
-                limit=limit,
-                return_properties=["title", "content", "file_path"],
-                include_vector=False
+            method, arguments = search_query(
+                query, query_embedding, embedding_dimensions, fetch_limit, alpha, fusion_type,
+                include_vector=mmr_lambda is not None
             )
+            result = getattr(documents.query, method)(**arguments)
             
             print(f"Search completed: found {len(result.objects)} results")
+            results = diversify(
+                query_embedding, result.objects, embedding_dimensions, limit, mmr_lambda, collapse_duplicates
+            )
+            search_cache.set(cache_key, results)
             
             # Return the objects
-            return result.objects
+            return results
 
             
+        except weaviate.exceptions.WeaviateConnectionError as e:
+            logger.error(f"Lost connection to Weaviate while searching: {e}")
+            self.mark_unhealthy()
+            if raise_errors:
+                raise
+            return []
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
+            if raise_errors:
+                raise
             import traceback
             traceback.print_exc()
             return []
+
+
+class PooledWeaviateManager(WeaviateManager):
+    """Process-wide WeaviateManager shared by all requests of a worker.
+
+    The connection is opened lazily on first use and kept open: leaving a
+    ``with`` block returns it to the pool instead of closing it. A daemon
+    thread checks liveness every WEAVIATE_HEALTH_CHECK_INTERVAL seconds and
+    marks the manager unhealthy, so the next request reconnects without any
+    extra round trip on the hot path.
+    """
+
+    def __init__(self, admin_access=False):
+        super().__init__(admin_access=admin_access, lazy=True)
+        self.healthy = None  # unknown until the first background check
+        self.reconnect_lock = threading.Lock()
+        self.last_checked_at = None
+        self.stop_event = threading.Event()
+        self.health_thread = threading.Thread(
+            target=self._health_loop,
+            name=f"weaviate-health-{'admin' if admin_access else 'user'}",
+            daemon=True
+        )
+        self.health_thread.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Keep the pooled connection open"""
+        if exc_type is not None and issubclass(exc_type, weaviate.exceptions.WeaviateBaseError):
+            self.mark_unhealthy()
+
+    def __del__(self):
+        pass
+
+    def ensure_connected(self):
+        if self.healthy is False:
+            with self.reconnect_lock:
+                # Another request may have reconnected while we waited
+                if self.healthy is False:
+                    print("Reconnecting to Weaviate after failed health check...")
+                    self.connect()
+                    self.healthy = None
+            return
+        super().ensure_connected()
+
+    def mark_unhealthy(self):
+        """Reconnect on next use instead of closing a connection other requests share"""
+        self.healthy = False
+
+    def _health_loop(self):
+        interval = settings.WEAVIATE_HEALTH_CHECK_INTERVAL
+        while not self.stop_event.wait(interval):
+            try:
+                self.ensure_connected()
+                self.healthy = bool(self.client.is_live())
+            except Exception as e:
+                logger.warning(f"Weaviate health check failed: {e}")
+                self.healthy = False
+            self.last_checked_at = timezone.now()
+
+    def shutdown(self):
+        """Stop the health checker and close the connection"""
+        self.stop_event.set()
+        self.close()
+
+
+_pooled_managers = {}
+_pool_lock = threading.Lock()
+
+
+def get_weaviate_manager(admin_access=False):
+    """Return this worker process's shared WeaviateManager for the given access level.
+
+    Keyed by PID so that forked workers (e.g. Gunicorn) never share a
+    connection with their parent.
+    """
+    key = (os.getpid(), admin_access)
+    manager = _pooled_managers.get(key)
+    if manager is None:
+        with _pool_lock:
+            manager = _pooled_managers.get(key)
+            if manager is None:
+                manager = PooledWeaviateManager(admin_access=admin_access)
+                _pooled_managers[key] = manager
+    return manager
+
+
+@atexit.register
+def close_pooled_managers():
+    """Close this process's pooled connections on shutdown"""
+    pid = os.getpid()
+    with _pool_lock:
+        for key in [key for key in _pooled_managers if key[0] == pid]:
+            _pooled_managers.pop(key).shutdown()
+
+
+class AsyncWeaviateManager:
+    """asyncio counterpart of PooledWeaviateManager for the ASGI views.
+
+    Wraps a WeaviateAsyncClient that is connected lazily and shared by every
+    request on one event loop (see ``get_async_weaviate_manager``). Only the
+    read path needed by the async endpoints is implemented.
+    """
+
+    def __init__(self, admin_access=False):
+        self.api_key = weaviate_api_key(admin_access)
+        self.admin_access = admin_access
+        self.client = None
+        self.connect_lock = asyncio.Lock()
+
+    async def ensure_connected(self):
+        if self.client is not None and self.client.is_connected():
+            return
+        async with self.connect_lock:
+            # Another request may have connected while we waited
+            if self.client is not None and self.client.is_connected():
+                return
+            await self.close()
+            client = weaviate.WeaviateAsyncClient(
+                connection_params=weaviate_connection_params(),
+                auth_client_secret=AuthApiKey(api_key=self.api_key)
+            )
+            await client.connect()
+            self.client = client
+            logger.info("Connected async Weaviate client")
+
+    async def close(self):
+        if self.client is not None:
+            client, self.client = self.client, None
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Error closing async Weaviate connection: {e}")
+
+    async def get_collection(self, name):
+        await self.ensure_connected()
+        return self.client.collections.get(name)
+
+    async def search_documents(self, query, limit=5, embedding_dimensions=None, alpha=None, fusion_type=None,
+                               mmr_lambda=None, collapse_duplicates=None, raise_errors=False):
+        """Async ``WeaviateManager.search_documents``, sharing its result cache"""
+        from asgiref.sync import sync_to_async
+        from knowledgebase.vectorization import agenerate_embedding, resolve_search_dimensions
+
+        try:
+            embedding_dimensions = resolve_search_dimensions(embedding_dimensions)
+            if alpha == 0:
+                mmr_lambda = None
+            if collapse_duplicates is None:
+                collapse_duplicates = settings.SEARCH_COLLAPSE_DUPLICATES
+            rerank = mmr_lambda is not None or collapse_duplicates
+            fetch_limit = limit * settings.MMR_FETCH_FACTOR if rerank else limit
+
+            variant = search_variant(alpha, fusion_type, mmr_lambda) + ("+collapsed" if collapse_duplicates else "")
+            cache_key = await sync_to_async(search_cache.key)(query, embedding_dimensions, limit, variant)
+            cached = await sync_to_async(search_cache.get)(cache_key)
+            if cached is not None:
+                logger.info(f"Search cache hit: {len(cached)} results")
+                return cached
+
+            query_embedding = None
+            if alpha is None or alpha > 0:
+                query_embedding = await agenerate_embedding(query, dimensions=embedding_dimensions, raise_errors=True)
+
+            if alpha is None and settings.LOCAL_VECTOR_INDEX_ENABLED:
+                from .vector_index import local_vector_index
+                # Refreshing the replica needs the sync client; searching it is a quick matrix product
+                results = await sync_to_async(local_vector_index.search)(
+                    get_weaviate_manager(admin_access=True), query_embedding, embedding_dimensions, fetch_limit,
+                    include_vector=mmr_lambda is not None
+                )
+                if results is not None:
+                    results = diversify(
+                        query_embedding, results, embedding_dimensions, limit, mmr_lambda, collapse_duplicates
+                    )
+                    await sync_to_async(search_cache.set)(cache_key, results)
+                    return results
+
+            documents = await self.get_collection("Document")
+            method, arguments = search_query(
+                query, query_embedding, embedding_dimensions, fetch_limit, alpha, fusion_type,
+                include_vector=mmr_lambda is not None
+            )
+            result = await getattr(documents.query, method)(**arguments)
+            results = diversify(
+                query_embedding, result.objects, embedding_dimensions, limit, mmr_lambda, collapse_duplicates
+            )
+            await sync_to_async(search_cache.set)(cache_key, results)
+            return results
+
+        except weaviate.exceptions.WeaviateConnectionError as e:
+            logger.error(f"Lost connection to Weaviate while searching: {e}")
+            await self.close()
+            if raise_errors:
+                raise
+            return []
+        except Exception as e:
+            logger.error(f"Error searching documents: {e}", exc_info=True)
+            if raise_errors:
+                raise
+            return []
+
+
+_async_managers = weakref.WeakKeyDictionary()  # event loop -> {admin_access: manager}
+
+
+def get_async_weaviate_manager(admin_access=False):
+    """Return the AsyncWeaviateManager shared by all requests on the running event loop"""
+    managers = _async_managers.setdefault(asyncio.get_running_loop(), {})
+    manager = managers.get(admin_access)
+    if manager is None:
+        manager = managers[admin_access] = AsyncWeaviateManager(admin_access=admin_access)
+    return manager
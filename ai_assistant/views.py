@@ -2,16 +2,26 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.http import StreamingHttpResponse
 from rest_framework.throttling import UserRateThrottle
-from openai import OpenAI
 from django.conf import settings
-from .utils.weaviate_client import WeaviateManager
-from knowledgebase.vectorization import generate_embedding
+from .utils.weaviate_client import FUSION_TYPES, get_weaviate_manager, search_variant
+from .utils.openai_client import get_openai_client
+from .utils.search_cache import normalize_query, search_cache
+from .utils.vector_index import local_vector_index
+from .utils.answer_cache import answer_cache, document_set_hash
+from .utils.chat_store import chat_write_buffer, find_chat_message, save_chat_message
+from .utils.single_flight import chat_request_flights, completion_flights, embedding_flights
+from .utils.context_packer import context_token_budget, pack_context
+from knowledgebase.vectorization import generate_embedding, resolve_search_dimensions, SEARCH_DIMENSIONS, VECTOR_DIMENSIONS
+from knowledgebase.embedding_cache import embedding_cache
+from knowledgebase.lexical_index import get_lexical_index
 import logging
 import os
 from typing import List, Dict, Any
 from django.utils import timezone
-from .utils.prompt_manager import PromptManager
+from .utils.prompt_manager import prompt_registry
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication 
 from rest_framework.authentication import TokenAuthentication
@@ -21,10 +31,50 @@ from django.db.models import Max
 from .models import Conversation,ChatMessage
 from .serializers import ChatMessageSerializer
 from .serializers import ConversationSerializer
+from .renderers import EventStreamRenderer, sse_event
+from .pagination import InvalidCursor, KeysetPaginator
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def parse_hybrid_options(data):
+    """Read the optional hybrid search controls, returning ``(alpha, fusion_type)``.
+
+    ``alpha`` (0 = keywords only ... 1 = vector only) switches a request to
+    hybrid search; invalid values fall back to pure vector search.
+    """
+    alpha = data.get('alpha')
+    if alpha is not None:
+        try:
+            alpha = float(alpha)
+            if not 0 <= alpha <= 1:
+                alpha = None
+        except (ValueError, TypeError):
+            alpha = None
+    fusion_type = data.get('fusion_type')
+    if fusion_type not in FUSION_TYPES:
+        fusion_type = None
+    return alpha, fusion_type
+
+
+def parse_mmr_lambda(data, default=None):
+    """Read the optional MMR re-ranking trade-off ``mmr_lambda``.
+
+    1 ranks by relevance only, 0 by diversity only; ``false``/``null``
+    turns re-ranking off and invalid values keep ``default``.
+    """
+    if 'mmr_lambda' not in data:
+        return default
+    mmr_lambda = data.get('mmr_lambda')
+    if mmr_lambda is None or mmr_lambda is False or str(mmr_lambda).lower() in ('false', 'off', 'none'):
+        return None
+    try:
+        mmr_lambda = float(mmr_lambda)
+    except (ValueError, TypeError):
+        return default
+    return mmr_lambda if 0 <= mmr_lambda <= 1 else default
+
+
 class SearchRateThrottle(UserRateThrottle):
     scope = 'search'
     rate = '100/hour'
@@ -40,71 +90,18 @@ class SearchAPIView(APIView):
     
     def post(self, request):
         try:
-            # Validate input
-            question = request.data.get('question', '').strip()
-            if not question:
-                return Response(
-                    {"error": "Question is required and cannot be empty"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if len(question) > 1000:
-                return Response(
-                    {"error": "Question is too long. Maximum 1000 characters allowed."}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Validate limit parameter
-            limit = request.data.get('limit', 5)
-            try:
-                limit = int(limit)
-                if limit < 1 or limit > 20:
-                    limit = 5
-            except (ValueError, TypeError):
-                limit = 5
-            
-            # Optional: Allow custom embedding dimensions for cost optimization
-            embedding_dimensions = request.data.get('embedding_dimensions')
-            if embedding_dimensions:
-                try:
-                    embedding_dimensions = int(embedding_dimensions)
-                    if embedding_dimensions < 256 or embedding_dimensions > 3072:
-                        embedding_dimensions = None
-                except (ValueError, TypeError):
-                    embedding_dimensions = None
-            
-            logger.info(f"Search request: '{question[:50]}...' with limit {limit}")
+            options, error = self._parse_search_options(request.data)
+            if error:
+                return Response(error, status=status.HTTP_400_BAD_REQUEST)
+            question = options['question']
             
             # Search for relevant documents using text-embedding-3-large
-            with WeaviateManager(admin_access=True) as manager:
-                results = manager.search_documents(question, limit=limit, embedding_dimensions=embedding_dimensions)
-                
-                # Format the response
-                response_data = []
-                for i, result in enumerate(results):
-                    try:
-                        response_data.append({
-                            "rank": i + 1,
-                            "title": result.properties.get("title", "Unknown"),
-                            "content": result.properties.get("content", ""),
-                            "file_path": result.properties.get("file_path", ""),
-                            "content_preview": self._get_content_preview(
-                                result.properties.get("content", ""), 200
-                            ),
-                            "score": getattr(result, "score", None)
-                        })
-                    except Exception as e:
-                        logger.warning(f"Error processing search result {i}: {e}")
-                        continue
-                
-                logger.info(f"Search completed: {len(response_data)} results returned")
-                
-                return Response({
-                    "results": response_data,
-                    "total_results": len(response_data),
-                    "query": question,
-                    "embedding_model": "text-embedding-3-large"
-                })
+            with get_weaviate_manager(admin_access=True) as manager:
+                results = manager.search_documents(
+                    question, limit=options['limit'], embedding_dimensions=options['embedding_dimensions'],
+                    alpha=options['alpha'], fusion_type=options['fusion_type'], mmr_lambda=options['mmr_lambda']
+                )
+                return Response(self._search_payload(options, results))
                 
         except Exception as e:
             logger.error(f"Search API error: {e}", exc_info=True)
@@ -112,6 +109,89 @@ class SearchAPIView(APIView):
                 {"error": "An error occurred while searching. Please try again."}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    def _parse_search_options(self, data):
+        """Validate search parameters, returning ``(options, error_payload)``"""
+        # Validate input
+        question = data.get('question', '').strip()
+        if not question:
+            return None, {"error": "Question is required and cannot be empty"}
+        
+        if len(question) > 1000:
+            return None, {"error": "Question is too long. Maximum 1000 characters allowed."}
+        
+        # Validate limit parameter
+        limit = data.get('limit', 5)
+        try:
+            limit = int(limit)
+            if limit < 1 or limit > 20:
+                limit = 5
+        except (ValueError, TypeError):
+            limit = 5
+        
+        # Optional: Pick the vector size (256 for speed ... 3072 for recall)
+        embedding_dimensions = data.get('embedding_dimensions')
+        if embedding_dimensions:
+            try:
+                embedding_dimensions = int(embedding_dimensions)
+                if embedding_dimensions < 256 or embedding_dimensions > 3072:
+                    embedding_dimensions = None
+            except (ValueError, TypeError):
+                embedding_dimensions = None
+        # Snap to the stored named vector the search will actually use
+        embedding_dimensions = resolve_search_dimensions(embedding_dimensions or None)
+        
+        # Optional: Hybrid BM25 + vector search
+        alpha, fusion_type = parse_hybrid_options(data)
+        
+        # Optional: Diversify results with MMR re-ranking
+        mmr_lambda = parse_mmr_lambda(data)
+        
+        logger.info(f"Search request: '{question[:50]}...' with limit {limit}")
+        return {
+            "question": question,
+            "limit": limit,
+            "embedding_dimensions": embedding_dimensions,
+            "alpha": alpha,
+            "fusion_type": fusion_type,
+            "mmr_lambda": mmr_lambda,
+        }, None
+
+    def _search_payload(self, options, results):
+        # Format the response
+        response_data = []
+        for i, result in enumerate(results):
+            try:
+                metadata = getattr(result, "metadata", None)
+                response_data.append({
+                    "rank": i + 1,
+                    "title": result.properties.get("title", "Unknown"),
+                    "content": result.properties.get("content", ""),
+                    "file_path": result.properties.get("file_path", ""),
+                    "parent_id": result.properties.get("parent_id"),
+                    "chunk_index": result.properties.get("chunk_index"),
+                    "chunk_count": result.properties.get("chunk_count"),
+                    "cluster_id": result.properties.get("cluster_id"),
+                    "content_preview": self._get_content_preview(
+                        result.properties.get("content", ""), 200
+                    ),
+                    "score": getattr(metadata, "score", None),
+                    "distance": getattr(metadata, "distance", None)
+                })
+            except Exception as e:
+                logger.warning(f"Error processing search result {i}: {e}")
+                continue
+        
+        logger.info(f"Search completed: {len(response_data)} results returned")
+        
+        return {
+            "results": response_data,
+            "total_results": len(response_data),
+            "query": options['question'],
+            "embedding_model": "text-embedding-3-large",
+            "embedding_dimensions": options['embedding_dimensions'],
+            "search_mode": search_variant(options['alpha'], options['fusion_type'], options['mmr_lambda'])
+        }
     
     def _get_content_preview(self, content: str, max_length: int = 200) -> str:
         """Get a preview of the content with proper truncation"""
@@ -131,13 +211,27 @@ class SearchAPIView(APIView):
             return truncated + "..."
 
 
+def conversation_paginator():
+    return KeysetPaginator('last_updated', settings.CONVERSATION_PAGE_SIZE, settings.HISTORY_MAX_PAGE_SIZE)
+
+
 class ConversationListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        conversations = Conversation.objects.filter(user=request.user, is_deleted=False).order_by('-last_updated')
+        conversations = Conversation.objects.filter(
+            user=request.user, is_deleted=False
+        ).with_last_message()
+        try:
+            conversations, next_cursor = conversation_paginator().paginate(conversations, request)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
         serializer = ConversationSerializer(conversations, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        # The body stays a plain list; the cursor for older conversations goes in a header
+        if next_cursor:
+            response['X-Next-Cursor'] = next_cursor
+        return response
         
 class ChatAPIView(APIView):
     """Enhanced API endpoint for React Native chat integration"""
@@ -147,234 +241,420 @@ class ChatAPIView(APIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [ChatRateThrottle]
 
+    default_prompt_file = 'default_prompt.txt'
+
     def post(self, request):
         try:
-            # Get user information for React Native (handle anonymous users for testing)
-            user = getattr(request, 'user', None)
-            if user and user.is_anonymous:
-                user = None
-            
-            # Validate required input
-            question = request.data.get('question', '').strip()
-            if not question:
-                return Response({
-                    "success": False,  # Add success field for React Native
-                    "error": "Question is required and cannot be empty",
-                    "error_code": "MISSING_QUESTION"  # Add error codes
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # React Native specific fields
-            conversation_id = request.data.get('conversation_id', str(uuid.uuid4()))
-            message_id = request.data.get('message_id', str(uuid.uuid4()))
+            options, error_response = self._parse_chat_request(request)
+            if error_response:
+                return error_response
 
-            default_prompt_file = 'default_prompt.txt'
-            
-            # Validate limit
-            limit = request.data.get('limit', 3)
+            # A retried message_id gets the stored answer instead of a second pipeline run
+            flight, stored = self._claim_message_id(options)
+            if flight is None:
+                return self._replay_response(options, stored)
             try:
-                limit = int(limit)
-                if limit < 1 or limit > 10:
-                    limit = 3
-            except (ValueError, TypeError):
-                limit = 3
-            
-            # Model validation
-            model = request.data.get('model', 'gpt-4o-mini')
-            allowed_models = ['gpt-4o-mini', 'gpt-4o', 'gpt-4-turbo', 'gpt-4']
-            if model not in allowed_models:
-                model = 'gpt-4o-mini'
-            
-            username = user.username if user else "anonymous"
-            logger.info(f"Chat request from user {username} (mobile): '{question[:50]}...'")
-
-            # Load prompt
-            prompt_manager = PromptManager()
-            custom_prompt = prompt_manager.load_prompt(default_prompt_file)
-            if custom_prompt is None:
-                custom_prompt = prompt_manager.get_default_prompt()
-                logger.warning(f"Prompt file '{default_prompt_file}' not found, using fallback prompt")
-
-            # Search in vector DB
-            with WeaviateManager(admin_access=True) as manager:
-                logger.debug(f"Searching documents for question: '{question}' with limit: {limit}")
-                try:
-                    results = manager.search_documents(question, limit=limit)
-                    logger.debug(f"Search returned {len(results)} results")
-                except Exception as search_error:
-                    logger.error(f"Vector search failed: {search_error}", exc_info=True)
-                    
-                    # Try fallback search
-                    logger.info("Attempting fallback document search...")
-                    results = self._fallback_document_search(question, limit)
-                    logger.debug(f"Fallback search returned {len(results)} results")
-                    
-                    # Check for specific error types for user feedback
-                    error_message = str(search_error)
-                    if "insufficient_quota" in error_message:
-                        search_error_type = "OpenAI API quota exceeded"
-                    elif "vector lengths don't match" in error_message:
-                        search_error_type = "Vector dimension mismatch in knowledge base"
-                    else:
-                        search_error_type = "Knowledge base search error"
-
-                # Build context from results
-                context_parts = []
-                sources = []
-
-                for i, result in enumerate(results):
-                    try:
-                        content = result.properties.get("content", "").strip()
-                        title = result.properties.get("title", f"Document {i+1}")
-                        logger.debug(f"Result {i+1}: {title}, content length: {len(content)}")
-
-                        if content:
-                            context_parts.append(f"Document: {title}\n{content}")
-                            sources.append(title)
-                    except Exception as e:
-                        logger.warning(f"Error processing result {i}: {e}")
-                        continue
-
-                # Always create conversation and save message, even if no context found
-                # Skip conversation creation if user is None (for testing)
-                conversation = None
-                if user:
-                    conversation, created = Conversation.objects.get_or_create(
-                        conversation_id=conversation_id,
-                        user=user,
-                        defaults={
-                            'title': question[:50] + "..." if len(question) > 50 else question
-                        }
-                    )
-                    
-                    # Update conversation timestamp
-                    conversation.last_updated = timezone.now()
-                    conversation.save(update_fields=['last_updated'])
-
-                if not context_parts:
-                    # No context found - determine the appropriate response based on search results
-                    if 'search_error_type' in locals():
-                        # There was a search error
-                        if "quota exceeded" in search_error_type:
-                            answer = "I'm currently unable to search the knowledge base due to API limits. Please contact support or try again later."
-                        elif "dimension mismatch" in search_error_type:
-                            answer = "The knowledge base needs to be updated. Please contact support to resolve this technical issue."
-                        else:
-                            answer = f"I'm experiencing technical difficulties ({search_error_type}). Please try again or contact support."
-                    else:
-                        # Search worked but no relevant documents found
-                        answer = "I couldn't find any relevant documents to answer your question. Please try rephrasing or check document availability."
-                    
-                    # Save message only if user is available
-                    if user:
-                        ChatMessage.objects.create(
-                            user=user,
-                            conversation=conversation,
-                            message_id=message_id,
-                            question=question,
-                            answer=answer,
-                            model_used=model,
-                            sources=[],
-                        )
-                    
-                    return Response({
-                        "success": False,  # React Native success indicator
-                        "message": "No relevant information found",
-                        "answer": answer,
-                        "sources": [],
-                        "context_used": False,
-                        "model_used": model,
-                        "prompt_file_used": default_prompt_file,
-                        "conversation_id": conversation_id,
-                        "message_id": message_id,
-                        "user_id": user.id if user else None,
-                        "timestamp": timezone.now().isoformat(),
-                        "error_code": "NO_CONTEXT"
-                    })
+                payload, record = self._answer(options)
+            except BaseException:
+                flight.fail()
+                raise
+            flight.finish(record)
+            if payload is None:
+                # Another worker saved this message_id first; answer with its message
+                return self._replay_response(options, record)
+            return Response(payload)
+
+        except Exception as e:
+            logger.error(f"Chat API error for user {getattr(request.user, 'username', 'anonymous')}: {e}", exc_info=True)
+            return Response({
+                "success": False,
+                "message": "An error occurred while processing your request",
+                "error": str(e),
+                "error_code": "INTERNAL_ERROR",
+                "conversation_id": request.data.get('conversation_id'),
+                "message_id": request.data.get('message_id'),
+                "timestamp": timezone.now().isoformat()
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _answer(self, options):
+        """Run the retrieval and generation pipeline and save the message.
+
+        Returns ``(payload, record)`` with the saved message's record (None if
+        it wasn't saved); ``payload`` is None if the message_id turned out to
+        be stored already, in which case ``record`` is the stored message.
+        """
+        user = options['user']
+        question = options['question']
+        conversation_id = options['conversation_id']
+        message_id = options['message_id']
+        model = options['model']
+
+        prompt = self._load_prompt()
 
-                # Properly formatted context with separators
-                context = "\n\n".join(["=" * 50 + "\n" + part for part in context_parts])
+        # Search in vector DB
+        with get_weaviate_manager(admin_access=True) as manager:
+            results, search_error_type = self._retrieve(manager, question, options)
 
+            # Build context from results
+            context, sources, packing = self._build_context(results, model)
+
+            # The conversation and message are saved even if no context was found
+            if not context:
+                answer = self._no_context_answer(search_error_type)
+                record, created = self._save_message(user, conversation_id, message_id, question, answer, model, [])
+                return (self._no_context_payload(options, answer) if created else None), record
+
+            # Near-duplicate questions over the same documents reuse a cached answer
+            question_embedding, cache_key, cached_answer = self._lookup_cached_answer(
+                manager, question, results, prompt, model,
+                options['use_answer_cache'] and search_error_type is None
+            )
+
+            if cached_answer:
+                answer = cached_answer["answer"]
+                ai_model_used = model
+            else:
                 # Generate response - try OpenAI first, fallback to simple response
                 try:
-                    answer = self._generate_response_with_custom_prompt(
-                        question=question,
-                        context=context,
-                        custom_prompt=custom_prompt,
-                        model=model
+                    # Identical questions in flight over the same documents share one completion
+                    (answer, total_tokens), is_leader = completion_flights.do(
+                        self._completion_key(question, prompt, model, results),
+                        lambda: self._generate_response_with_custom_prompt(
+                            question=question,
+                            context=context,
+                            prompt=prompt,
+                            model=model
+                        ),
+                        shared=True, cacheable=lambda result: result[1] is not None
                     )
                     ai_model_used = model
+                    # total_tokens is None when generation failed; never cache the apology
+                    if is_leader and question_embedding is not None and total_tokens:
+                        answer_cache.store(
+                            manager, question, question_embedding,
+                            answer=answer, sources=sources, total_tokens=total_tokens, **cache_key
+                        )
                 except Exception as openai_error:
                     logger.warning(f"OpenAI response generation failed: {openai_error}")
                     # Use simple fallback response
                     answer = self._generate_simple_response(question, context)
                     ai_model_used = "fallback-simple"
 
-                # Save message to history (conversation was already created above)
-                if user:
-                    ChatMessage.objects.create(
-                        user=user,
-                        conversation=conversation,
-                        message_id=message_id,
-                        question=question,
-                        answer=answer,
-                        model_used=ai_model_used,
-                        sources=sources,
-                    )
+            # Save message to history, creating or bumping the conversation
+            record, created = self._save_message(user, conversation_id, message_id, question, answer,
+                                                 ai_model_used, sources, prompt.version)
+            if not created:
+                return None, record
 
-                # Enhanced response for React Native
-                return Response({
-                    "success": True,  # Success indicator
-                    "message": "Response generated successfully",
-                    "answer":  answer,
-                    "sources": sources,
-                    "context_used": True,
-                    "model_used": ai_model_used,
-                    "embedding_model": "text-embedding-3-large" if 'search_error_type' not in locals() else "fallback-search",
-                    "query": question,
-                    "prompt_file_used": default_prompt_file,
-                    "conversation_id": conversation_id,
-                    "message_id": message_id,
-                    "user_id": user.id if user else None,
-                    "timestamp": timezone.now().isoformat(),
-                    "context_summary": {
-                        "total_sources": len(sources),
-                        "context_length": len(context),
-                        "search_results_count": len(results)
-                    },
-                    # React Native UI helpers
-                    "ui_metadata": {
-                        "show_sources": len(sources) > 0,
-                        "message_type": "ai_response",
-                        "requires_follow_up": False,
-                        "is_fallback": ai_model_used == "fallback-simple"
-                    }
-                })
+            # Enhanced response for React Native
+            return self._answer_payload(
+                options, answer, sources, ai_model_used, search_error_type, context, results,
+                self._answer_cache_summary(question_embedding, cached_answer), packing
+            ), record
 
-        except Exception as e:
-            logger.error(f"Chat API error for user {getattr(request.user, 'username', 'anonymous')}: {e}", exc_info=True)
-            return Response({
+    def _claim_message_id(self, options):
+        """Claim the request's message_id, or find the answer already stored for it.
+
+        Returns ``(flight, stored)``. With ``flight`` set this request runs the
+        pipeline and must end the flight with the saved record (``finish``) or
+        ``fail``. With ``stored`` set, the message was already answered (the
+        client retried) and ``stored`` is its record. A request for a
+        message_id that is in flight, in this worker or (through the shared
+        cache lock) in another one, waits for it rather than starting a second
+        pipeline; both are None if it did not finish within CHAT_IN_FLIGHT_TIMEOUT.
+        """
+        message_id = options['message_id']
+        while True:
+            flight = chat_request_flights.join(message_id, shared=True)
+            if flight.timed_out:
+                return None, None
+            if not flight.leader:
+                if flight.result is not None:
+                    return None, flight.result
+                # The first request failed or saved nothing: run it ourselves
+                continue
+            try:
+                # Messages of anonymous (test) requests are never saved
+                stored = find_chat_message(message_id) if options['user'] else None
+            except BaseException:
+                flight.fail()
+                raise
+            if stored is not None:
+                flight.finish(stored)
+                return None, stored
+            return flight, None
+
+    def _replay_error(self, options, stored):
+        """Error payload when a stored or in-flight message_id can't be replayed, else None"""
+        if stored is None:
+            return {
                 "success": False,
-                "message": "An error occurred while processing your request",
-                "error": str(e),
-                "error_code": "INTERNAL_ERROR",
-                "conversation_id": request.data.get('conversation_id'),
-                "message_id": request.data.get('message_id'),
+                "message": "A request with this message_id is still being processed",
+                "error_code": "REQUEST_IN_PROGRESS",
+                "conversation_id": options['conversation_id'],
+                "message_id": options['message_id'],
                 "timestamp": timezone.now().isoformat()
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            }
+        if stored['user_id'] != options['user'].pk:
+            return {
+                "success": False,
+                "message": "This message_id has already been used",
+                "error_code": "DUPLICATE_MESSAGE_ID",
+                "conversation_id": options['conversation_id'],
+                "message_id": options['message_id'],
+                "timestamp": timezone.now().isoformat()
+            }
+        return None
 
-    def _generate_response_with_custom_prompt(self, question, context, custom_prompt, model):
-        """Generate AI response using custom prompt and context"""
-        # Enhanced system message for health assistant
-        system_message = f"""{custom_prompt}
+    def _replay_response(self, options, stored):
+        error = self._replay_error(options, stored)
+        if error:
+            return Response(error, status=status.HTTP_409_CONFLICT)
+        return Response(self._replay_payload(options, stored))
 
-CONTEXT HANDLING RULES:
-- Use ONLY the information provided in the context documents below
-- If the context doesn't contain enough information, clearly state this
-- Never make up information not present in the context
-- Always cite which documents you're referencing
-- Provide helpful, accurate, and compassionate responses
-- Focus on sexual health, reproductive wellness, and contraception topics"""
+    def _replay_payload(self, options, stored):
+        """Response payload for a message_id that was already answered"""
+        user = options['user']
+        if not stored['sources']:
+            # Only answers without context are saved without sources
+            payload = self._no_context_payload(options, stored['answer'])
+        else:
+            payload = {
+                "success": True,
+                "message": "Response generated successfully",
+                "answer": stored['answer'],
+                "sources": stored['sources'],
+                "context_used": True,
+                "model_used": stored['model_used'],
+                "query": stored['question'],
+                "prompt_file_used": self.default_prompt_file,
+                "conversation_id": stored['conversation_id'],
+                "message_id": stored['message_id'],
+                "user_id": user.id if user else None,
+                "timestamp": timezone.now().isoformat(),
+                "ui_metadata": {
+                    "show_sources": True,
+                    "message_type": "ai_response",
+                    "requires_follow_up": False,
+                    "is_fallback": stored['model_used'] == "fallback-simple"
+                }
+            }
+        payload["replayed"] = True
+        return payload
+
+    def _parse_chat_request(self, request):
+        """Validate the request body, returning ``(options, error_response)``"""
+        options, error = self._parse_chat_options(request.data, getattr(request, 'user', None))
+        if error:
+            return None, Response(error, status=status.HTTP_400_BAD_REQUEST)
+        return options, None
+
+    def _parse_chat_options(self, data, user):
+        """Validate chat parameters, returning ``(options, error_payload)``"""
+        # Get user information for React Native (handle anonymous users for testing)
+        if user and user.is_anonymous:
+            user = None
+        
+        # Validate required input
+        question = data.get('question', '').strip()
+        if not question:
+            return None, {
+                "success": False,  # Add success field for React Native
+                "error": "Question is required and cannot be empty",
+                "error_code": "MISSING_QUESTION"  # Add error codes
+            }
+
+        # Validate limit
+        limit = data.get('limit', 3)
+        try:
+            limit = int(limit)
+            if limit < 1 or limit > 10:
+                limit = 3
+        except (ValueError, TypeError):
+            limit = 3
+        
+        # Model validation
+        model = data.get('model', 'gpt-4o-mini')
+        allowed_models = ['gpt-4o-mini', 'gpt-4o', 'gpt-4-turbo', 'gpt-4']
+        if model not in allowed_models:
+            model = 'gpt-4o-mini'
+        
+        # Per-request opt-out of the semantic answer cache
+        use_cache = data.get('use_cache', True)
+        if isinstance(use_cache, str):
+            use_cache = use_cache.lower() not in ('false', '0', 'no')
+        
+        # Optional hybrid BM25 + vector retrieval
+        alpha, fusion_type = parse_hybrid_options(data)
+        
+        # Diverse context: re-rank candidates so near-duplicate chunks aren't all sent
+        mmr_lambda = parse_mmr_lambda(data, settings.CHAT_MMR_LAMBDA if settings.CHAT_MMR_ENABLED else None)
+        
+        username = user.username if user else "anonymous"
+        logger.info(f"Chat request from user {username} (mobile): '{question[:50]}...'")
+
+        return {
+            "user": user,
+            "question": question,
+            # React Native specific fields
+            "conversation_id": data.get('conversation_id', str(uuid.uuid4())),
+            "message_id": data.get('message_id', str(uuid.uuid4())),
+            "limit": limit,
+            "model": model,
+            "alpha": alpha,
+            "fusion_type": fusion_type,
+            "mmr_lambda": mmr_lambda,
+            # Keyword-only retrieval skips embedding, so skip the (embedding-keyed) answer cache too
+            "use_answer_cache": settings.ANSWER_CACHE_ENABLED and bool(use_cache) and alpha != 0,
+        }, None
+
+    def _load_prompt(self):
+        """The chat ``Prompt`` (pre-rendered system message and version) from the process-wide registry"""
+        return prompt_registry.get(self.default_prompt_file)
+
+    def _retrieve(self, manager, question, options):
+        """Search the knowledge base, returning ``(results, search_error_type)``"""
+        limit = options['limit']
+        logger.debug(f"Searching documents for question: '{question}' with limit: {limit}")
+        try:
+            results = manager.search_documents(
+                question, limit=limit, alpha=options['alpha'], fusion_type=options['fusion_type'],
+                mmr_lambda=options['mmr_lambda'], raise_errors=True
+            )
+            logger.debug(f"Search returned {len(results)} results")
+            return results, None
+        except Exception as search_error:
+            logger.error(f"Vector search failed: {search_error}", exc_info=True)
+            
+            # Try fallback search
+            logger.info("Attempting fallback document search...")
+            results = self._fallback_document_search(question, limit)
+            logger.debug(f"Fallback search returned {len(results)} results")
+            return results, self._classify_search_error(search_error)
+
+    def _fallback_document_search(self, query, limit=3):
+        """BM25 search over the local documents directory for when Weaviate or OpenAI is down"""
+        try:
+            return get_lexical_index().search(query, limit=limit)
+        except Exception as e:
+            logger.error(f"Fallback search failed: {e}", exc_info=True)
+            return []
+
+    def _classify_search_error(self, search_error):
+        """Check for specific error types for user feedback"""
+        error_message = str(search_error)
+        if "insufficient_quota" in error_message:
+            return "OpenAI API quota exceeded"
+        elif "vector lengths don't match" in error_message:
+            return "Vector dimension mismatch in knowledge base"
+        return "Knowledge base search error"
+
+    def _build_context(self, results, model=None):
+        """Pack search results into prompt context, returning ``(context, sources, packing_summary)``"""
+        context, sources, packing = pack_context(results, context_token_budget(model))
+        logger.debug(f"Packed {len(results)} results into {packing['packed_tokens']} context tokens")
+        return context, sources, packing
+
+    def _no_context_answer(self, search_error_type):
+        """Answer to give when no context was found, depending on why"""
+        if search_error_type:
+            # There was a search error
+            if "quota exceeded" in search_error_type:
+                return "I'm currently unable to search the knowledge base due to API limits. Please contact support or try again later."
+            elif "dimension mismatch" in search_error_type:
+                return "The knowledge base needs to be updated. Please contact support to resolve this technical issue."
+            return f"I'm experiencing technical difficulties ({search_error_type}). Please try again or contact support."
+        # Search worked but no relevant documents found
+        return "I couldn't find any relevant documents to answer your question. Please try rephrasing or check document availability."
+
+    def _save_message(self, user, conversation_id, message_id, question, answer, model_used, sources,
+                      prompt_version=''):
+        """``save_chat_message``'s ``(record, created)``, or ``(None, True)`` if there is no user to save for"""
+        # Save message only if user is available
+        if user:
+            return save_chat_message(user, conversation_id, message_id, question, answer, model_used, sources,
+                                     prompt_version)
+        return None, True
 
+    def _lookup_cached_answer(self, manager, question, results, prompt, model, enabled):
+        """Return ``(question_embedding, cache_key, cached_answer)`` for the answer cache"""
+        if not enabled:
+            return None, None, None
+        question_embedding = answer_cache.embed(question)
+        cache_key = {
+            "doc_set_hash": document_set_hash(results),
+            "prompt_version": prompt.version,
+            "model": model,
+        }
+        cached_answer = None
+        if question_embedding is not None:
+            cached_answer = answer_cache.lookup(manager, question_embedding, **cache_key)
+            if cached_answer:
+                logger.info(f"Answer cache hit (distance {cached_answer['distance']:.4f})")
+        return question_embedding, cache_key, cached_answer
+
+    def _no_context_payload(self, options, answer):
+        user = options['user']
+        return {
+            "success": False,  # React Native success indicator
+            "message": "No relevant information found",
+            "answer": answer,
+            "sources": [],
+            "context_used": False,
+            "model_used": options['model'],
+            "prompt_file_used": self.default_prompt_file,
+            "conversation_id": options['conversation_id'],
+            "message_id": options['message_id'],
+            "user_id": user.id if user else None,
+            "timestamp": timezone.now().isoformat(),
+            "error_code": "NO_CONTEXT"
+        }
+
+    def _answer_payload(self, options, answer, sources, ai_model_used, search_error_type, context, results,
+                        answer_cache_summary, packing=None):
+        user = options['user']
+        return {
+            "success": True,  # Success indicator
+            "message": "Response generated successfully",
+            "answer":  answer,
+            "sources": sources,
+            "context_used": True,
+            "model_used": ai_model_used,
+            "embedding_model": "text-embedding-3-large" if search_error_type is None else "fallback-search",
+            "query": options['question'],
+            "prompt_file_used": self.default_prompt_file,
+            "conversation_id": options['conversation_id'],
+            "message_id": options['message_id'],
+            "user_id": user.id if user else None,
+            "timestamp": timezone.now().isoformat(),
+            "context_summary": {
+                "total_sources": len(sources),
+                "context_length": len(context),
+                "search_results_count": len(results),
+                "search_mode": search_variant(options['alpha'], options['fusion_type'], options['mmr_lambda']),
+                **(packing or {})
+            },
+            "answer_cache": answer_cache_summary,
+            # React Native UI helpers
+            "ui_metadata": {
+                "show_sources": len(sources) > 0,
+                "message_type": "ai_response",
+                "requires_follow_up": False,
+                "is_fallback": ai_model_used == "fallback-simple"
+            }
+        }
+
+    @staticmethod
+    def _answer_cache_summary(question_embedding, cached_answer):
+        return {
+            "used": question_embedding is not None,
+            "hit": cached_answer is not None,
+            "distance": cached_answer["distance"] if cached_answer else None,
+            "saved_tokens": cached_answer["total_tokens"] if cached_answer else 0
+        }
+
+    def _build_messages(self, question, context, prompt):
+        """Chat messages for answering ``question`` from ``context``"""
         user_message = f"""CONTEXT DOCUMENTS:
 {context}
 
@@ -382,25 +662,35 @@ QUESTION: {question}
 
 Please answer the question based on the context provided above."""
 
-        try:
-            openai_api_key = os.environ.get('OPENAI_API_KEY')
-            client = OpenAI(api_key=openai_api_key)
+        return [
+            {"role": "system", "content": prompt.system_message},
+            {"role": "user", "content": user_message}
+        ]
+
+    @staticmethod
+    def _completion_key(question, prompt, model, results):
+        """Single-flight key of a completion: answers to it depend on nothing else"""
+        return normalize_query(question), model, prompt.version, document_set_hash(results)
 
-            response = client.chat.completions.create(
+    def _generate_response_with_custom_prompt(self, question, context, prompt, model):
+        """Generate AI response using custom prompt and context.
+
+        Returns ``(answer, total_tokens)``; ``total_tokens`` is None if generation failed.
+        """
+        try:
+            response = get_openai_client().chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
+                messages=self._build_messages(question, context, prompt),
                 temperature=0.3,
                 max_tokens=1000,
             )
 
-            return response.choices[0].message.content
+            total_tokens = response.usage.total_tokens if response.usage else None
+            return response.choices[0].message.content, total_tokens
 
         except Exception as e:
             logger.error(f"Error generating AI response: {e}", exc_info=True)
-            return "I apologize, but I encountered an error while generating the response. Please try again."
+            return "I apologize, but I encountered an error while generating the response. Please try again.", None
 
     def _generate_simple_response(self, question, context):
         """
@@ -419,11 +709,229 @@ Please answer the question based on the context provided above."""
             
         return response
 
+class ChatStreamAPIView(ChatAPIView):
+    """Streaming variant of ChatAPIView using server-sent events.
+
+    Emits a ``metadata`` event (sources, IDs) as soon as retrieval is done,
+    then one ``token`` event per streamed completion delta, then a ``done``
+    event once the ChatMessage has been saved. Failures after streaming has
+    started are reported as an ``error`` event.
+    """
+
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def post(self, request):
+        options, error_response = self._parse_chat_request(request)
+        if error_response:
+            return error_response
+
+        response = StreamingHttpResponse(
+            self._stream_chat(options),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    def _stream_chat(self, options):
+        flight, stored = self._claim_message_id(options)
+        if flight is None:
+            yield from self._stream_replay(options, stored)
+            return
+        try:
+            record = yield from self._stream_answer(options)
+        except BaseException:
+            # Includes the client disconnecting mid-stream
+            flight.fail()
+            raise
+        flight.finish(record)
+
+    def _stream_replay(self, options, stored):
+        """The events of an already answered message_id, with the whole answer as one token"""
+        error = self._replay_error(options, stored)
+        if error:
+            yield sse_event("error", error)
+            return
+        payload = self._replay_payload(options, stored)
+        yield sse_event("metadata", {
+            "conversation_id": payload["conversation_id"],
+            "message_id": payload["message_id"],
+            "sources": payload["sources"],
+            "context_used": payload["context_used"],
+            "model": options['model'],
+            "prompt_file_used": self.default_prompt_file,
+            "replayed": True,
+        })
+        yield sse_event("token", {"delta": payload["answer"]})
+        yield sse_event("done", {
+            "success": payload["success"],
+            "conversation_id": payload["conversation_id"],
+            "message_id": payload["message_id"],
+            "model_used": payload["model_used"],
+            "user_id": payload["user_id"],
+            "timestamp": payload["timestamp"],
+            "is_fallback": payload["model_used"] == "fallback-simple",
+        })
+
+    def _stream_answer(self, options):
+        """Stream the pipeline's events; returns the saved message's record, if any"""
+        user = options['user']
+        question = options['question']
+        conversation_id = options['conversation_id']
+        message_id = options['message_id']
+        model = options['model']
+        record = None
+
+        try:
+            prompt = self._load_prompt()
+
+            with get_weaviate_manager(admin_access=True) as manager:
+                results, search_error_type = self._retrieve(manager, question, options)
+                context, sources, packing = self._build_context(results, model)
+
+                question_embedding, cache_key, cached_answer = None, None, None
+                if context:
+                    question_embedding, cache_key, cached_answer = self._lookup_cached_answer(
+                        manager, question, results, prompt, model,
+                        options['use_answer_cache'] and search_error_type is None
+                    )
+
+                yield sse_event("metadata", {
+                    "conversation_id": conversation_id,
+                    "message_id": message_id,
+                    "sources": sources,
+                    "context_used": bool(context),
+                    "model": model,
+                    "prompt_file_used": self.default_prompt_file,
+                    "prompt_version": prompt.version,
+                    "search_results_count": len(results),
+                    "packed_tokens": packing["packed_tokens"],
+                    "answer_cache": self._answer_cache_summary(question_embedding, cached_answer),
+                })
+
+                if not context:
+                    answer = self._no_context_answer(search_error_type)
+                    ai_model_used = model
+                    yield sse_event("token", {"delta": answer})
+                elif cached_answer:
+                    answer = cached_answer["answer"]
+                    ai_model_used = model
+                    yield sse_event("token", {"delta": answer})
+                else:
+                    # Identical questions in flight over the same documents share one completion
+                    flight = None
+                    if settings.SINGLE_FLIGHT_ENABLED:
+                        flight = completion_flights.join(
+                            self._completion_key(question, prompt, model, results), shared=True
+                        )
+                        if not flight.leader and (flight.timed_out or flight.error is not None):
+                            # The leader is stuck or failed: generate our own
+                            flight = None
+
+                    if flight is not None and not flight.leader:
+                        # Followers get the leader's finished answer as one token
+                        answer, total_tokens = flight.result
+                        ai_model_used = model if total_tokens is not None else "fallback-simple"
+                        yield sse_event("token", {"delta": answer})
+                    else:
+                        answer, total_tokens, ai_model_used = yield from self._stream_leader(
+                            flight, question, context, prompt, model
+                        )
+
+                    if (flight is None or flight.leader) and question_embedding is not None and total_tokens:
+                        answer_cache.store(
+                            manager, question, question_embedding,
+                            answer=answer, sources=sources, total_tokens=total_tokens, **cache_key
+                        )
+
+                record, created = self._save_message(user, conversation_id, message_id, question, answer,
+                                                     ai_model_used, sources if context else [],
+                                                     prompt.version if context else '')
+                if not created:
+                    # Too late to take back the streamed answer; the stored one is what a retry replays
+                    logger.warning(f"Chat message {message_id} was already saved by another request")
+
+            yield sse_event("done", {
+                "success": bool(context),
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "model_used": ai_model_used,
+                "user_id": user.id if user else None,
+                "timestamp": timezone.now().isoformat(),
+                "is_fallback": ai_model_used == "fallback-simple",
+            })
+
+        except Exception as e:
+            logger.error(f"Chat stream error for message {message_id}: {e}", exc_info=True)
+            yield sse_event("error", {
+                "success": False,
+                "message": "An error occurred while processing your request",
+                "error": str(e),
+                "error_code": "INTERNAL_ERROR",
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "timestamp": timezone.now().isoformat()
+            })
+        return record
+
+    def _stream_leader(self, flight, question, context, prompt, model):
+        """Stream a completion, falling back to a simple answer; returns ``(answer, total_tokens, model_used)``.
+
+        The finished answer is handed to ``flight``'s followers, if any.
+        """
+        parts = []
+        total_tokens = None
+        ai_model_used = model
+        try:
+            try:
+                for delta, usage in self._stream_completion(question, context, prompt, model):
+                    if delta:
+                        parts.append(delta)
+                        yield sse_event("token", {"delta": delta})
+                    if usage:
+                        total_tokens = usage.total_tokens
+            except Exception as openai_error:
+                if parts:
+                    # Part of the answer was already sent; don't append a fallback to it
+                    raise
+                logger.warning(f"OpenAI response generation failed: {openai_error}")
+                fallback = self._generate_simple_response(question, context)
+                parts = [fallback]
+                ai_model_used = "fallback-simple"
+                yield sse_event("token", {"delta": fallback})
+        except BaseException as e:
+            if flight is not None:
+                if not isinstance(e, Exception):
+                    # The client disconnected mid-stream; followers generate their own answer
+                    e = RuntimeError("The leading stream was closed before its answer finished")
+                flight.fail(e)
+            raise
+        answer = "".join(parts)
+        if flight is not None:
+            # Like the non-streamed path, a fallback is shared in-process but never across workers
+            flight.finish((answer, total_tokens), cacheable=total_tokens is not None)
+        return answer, total_tokens, ai_model_used
+
+    def _stream_completion(self, question, context, prompt, model):
+        """Yield ``(delta, usage)`` pairs from a streamed chat completion"""
+        stream = get_openai_client().chat.completions.create(
+            model=model,
+            messages=self._build_messages(question, context, prompt),
+            temperature=0.3,
+            max_tokens=1000,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            yield delta, chunk.usage
+
 class ChatHistoryAPIView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """Latest page of a conversation's messages; pass ``next_cursor`` as ``cursor`` to load older ones"""
         conversation_id = request.query_params.get('conversation_id')
         if not conversation_id:
             return Response({"error": "conversation_id is required"}, status=400)
@@ -431,49 +939,67 @@ class ChatHistoryAPIView(APIView):
         try:
             # Get the conversation first
             conversation = Conversation.objects.get(conversation_id=conversation_id, user=request.user, is_deleted=False)
-            messages = ChatMessage.objects.filter(user=request.user, conversation=conversation).order_by('timestamp')
-            serializer = ChatMessageSerializer(messages, many=True)
+            messages = ChatMessage.objects.filter(user=request.user, conversation=conversation)
+            paginator = KeysetPaginator('timestamp', settings.CHAT_HISTORY_PAGE_SIZE, settings.HISTORY_MAX_PAGE_SIZE)
+            messages, next_cursor = paginator.paginate(messages, request)
+            # Pages are fetched newest first but returned in chronological order
+            serializer = ChatMessageSerializer(messages[::-1], many=True)
             return Response({
                 "success": True,
                 "conversation_id": conversation_id,
                 "conversation_title": conversation.title,
-                "messages": serializer.data
+                "messages": serializer.data,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             })
         except Conversation.DoesNotExist:
             return Response({"error": "Conversation not found"}, status=404)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
 
 class ChatHistoryListAPIView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """Most recently updated conversations first; pass ``next_cursor`` as ``cursor`` to load older ones"""
         user = request.user
 
         # Get conversations directly from the Conversation model
         conversations = Conversation.objects.filter(
             user=user, 
             is_deleted=False
-        ).order_by('-last_updated')
+        ).with_last_message()
+        try:
+            conversations, next_cursor = conversation_paginator().paginate(conversations, request)
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
 
         # Use the existing ConversationSerializer
         serializer = ConversationSerializer(conversations, many=True)
         return Response({
             "success": True,
-            "conversations": serializer.data
+            "conversations": serializer.data,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         })
 
 class HealthCheckAPIView(APIView):
     """Health check endpoint to verify system status"""
     
     def get(self, request):
-        try:
-            # Test Weaviate connection
-            with WeaviateManager(admin_access=False) as manager:
-                collections = manager.collections
-                weaviate_status = "healthy"
-        except Exception as e:
-            logger.error(f"Weaviate health check failed: {e}")
-            weaviate_status = "unhealthy"
+        # Report the pooled connection's background health check; only probe
+        # Weaviate here if no check has completed yet
+        manager = get_weaviate_manager(admin_access=False)
+        healthy = manager.healthy
+        if healthy is None:
+            try:
+                manager.ensure_connected()
+                healthy = manager.client.is_live()
+            except Exception as e:
+                logger.error(f"Weaviate health check failed: {e}")
+                healthy = False
+        weaviate_status = "healthy" if healthy else "unhealthy"
         
         # Test OpenAI API key
         openai_api_key = os.environ.get('OPENAI_API_KEY') or getattr(settings, 'OPENAI_API_KEY', None)
@@ -499,8 +1025,8 @@ class DocumentStatsAPIView(APIView):
     
     def get(self, request):
         try:
-            with WeaviateManager(admin_access=True) as manager:
-                documents = manager.collections.get("Document")
+            with get_weaviate_manager(admin_access=True) as manager:
+                documents = manager.get_collection("Document")
                 
                 # Get total count
                 total_count = documents.aggregate.over_all().total_count
@@ -522,7 +1048,18 @@ class DocumentStatsAPIView(APIView):
                     "total_documents": total_count,
                     "sample_documents": sample_list,
                     "embedding_model": "text-embedding-3-large",
-                    "vector_dimensions": 3072
+                    "vector_dimensions": list(VECTOR_DIMENSIONS),
+                    "default_search_dimensions": SEARCH_DIMENSIONS,
+                    "embedding_cache": embedding_cache.get_stats(),
+                    "search_cache": search_cache.get_stats(),
+                    "answer_cache": answer_cache.get_stats(),
+                    "local_vector_index": local_vector_index.get_stats(),
+                    "chat_write_behind": chat_write_buffer.get_stats(),
+                    "single_flight": {
+                        "embedding": embedding_flights.get_stats(),
+                        "completion": completion_flights.get_stats(),
+                        "chat_request": chat_request_flights.get_stats(),
+                    }
                 })
                 
         except Exception as e:
@@ -532,60 +1069,6 @@ class DocumentStatsAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _fallback_document_search(self, query, limit=3):
-        """
-        Fallback search method using simple text matching when vector search fails
-        This is a temporary solution until OpenAI quota issues are resolved
-        """
-        try:
-            import os
-            import glob
-            from django.conf import settings
-            
-            # Search in the documents directory
-            docs_path = os.path.join(settings.BASE_DIR, 'documents')
-            if not os.path.exists(docs_path):
-                return []
-                
-            results = []
-            query_words = query.lower().split()
-            
-            # Get all text files in documents directory
-            txt_files = glob.glob(os.path.join(docs_path, '*.txt'))
-            
-            for file_path in txt_files[:limit * 2]:  # Check more files than limit
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Simple keyword matching
-                    content_lower = content.lower()
-                    matches = sum(1 for word in query_words if word in content_lower)
-                    
-                    if matches > 0:
-                        # Create a mock result object similar to Weaviate results
-                        mock_result = {
-                            'properties': {
-                                'title': os.path.basename(file_path).replace('.txt', '').replace('_', ' ').title(),
-                                'content': content[:500] + "..." if len(content) > 500 else content,
-                                'file_path': file_path
-                            }
-                        }
-                        
-                        results.append((matches, mock_result))
-                        
-                except Exception as e:
-                    logger.warning(f"Error reading file {file_path}: {e}")
-                    continue
-            
-            # Sort by number of matches and return top results
-            results.sort(key=lambda x: x[0], reverse=True)
-            return [result[1] for result in results[:limit]]
-            
-        except Exception as e:
-            logger.error(f"Fallback search failed: {e}")
-            return []
-
 class OpenAIStatusAPIView(APIView):
     """Check OpenAI API key status and usage"""
     
@@ -603,7 +1086,7 @@ class OpenAIStatusAPIView(APIView):
                     "status": "not_configured"
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            client = OpenAI(api_key=api_key)
+            client = get_openai_client()
             
             # Test with a simple completion request
             try:
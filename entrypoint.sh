@@ -2,6 +2,8 @@
 
 echo "Running migrations..."
 python manage.py migrate
+python manage.py createcachetable
+python manage.py build_lexical_index
 
 echo "Starting server..."
 python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
@@ -1,8 +1,23 @@
 from django.contrib import admin
 from .models import AIDocument
+from .ingest_queue import enqueue_document
 
 # Register your models here.
 
 @admin.register(AIDocument)
 class AIDocumentAdmin(admin.ModelAdmin):
-    list_display = ('title', 'uploaded_by', 'uploaded_at')
+    list_display = ('title', 'uploaded_by', 'uploaded_at', 'ingest_status', 'ingest_attempts', 'ingest_finished_at')
+    list_filter = ('ingest_status',)
+    readonly_fields = (
+        'ingest_status', 'ingest_attempts', 'ingest_error',
+        'ingest_available_at', 'ingest_started_at', 'ingest_finished_at', 'ingest_requeue'
+    )
+    actions = ['retry_ingestion']
+
+    @admin.action(description='Retry ingestion of selected documents')
+    def retry_ingestion(self, request, queryset):
+        queued = sum(enqueue_document(document.pk) for document in queryset)
+        message = f"Queued {queued} document(s) for ingestion"
+        if queued < len(queryset):
+            message += f"; {len(queryset) - queued} being processed will run again when they finish"
+        self.message_user(request, message)
@@ -0,0 +1,131 @@
+# knowledgebase/chunking.py
+import hashlib
+import re
+
+from django.conf import settings
+
+from .tokenization import count_tokens, split_by_tokens
+
+# Sentence ends followed by whitespace and the start of a new sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+
+# Markdown headings, numbered section titles and short "Title:" lines
+HEADING = re.compile(r'^(#{1,6}\s+.+|\d+(\.\d+)*\.?\s+[A-Z].{0,80}|[A-Z][^.!?]{0,80}:)$')
+
+
+def iter_units(lines):
+    """Yield ``(text, is_heading, starts_paragraph)`` units from an iterable of lines.
+
+    Paragraphs are accumulated line by line and split into sentences, so
+    the input can be an open file that is never read into memory whole.
+    """
+    paragraph = []
+
+    def flush():
+        text = " ".join(paragraph).strip()
+        paragraph.clear()
+        sentences = [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+        for position, sentence in enumerate(sentences):
+            yield sentence, False, position == 0
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            yield from flush()
+        elif HEADING.match(stripped):
+            yield from flush()
+            yield stripped, True, True
+        else:
+            paragraph.append(stripped)
+
+    yield from flush()
+
+
+def chunk_lines(lines, max_tokens=None, overlap_tokens=None):
+    """Split text into token-counted windows on sentence and heading boundaries.
+
+    Consecutive chunks share up to ``overlap_tokens`` of trailing sentences,
+    except across a heading, which always starts a new chunk. Yields dicts
+    with ``text`` and ``token_count``.
+    """
+    if max_tokens is None:
+        max_tokens = settings.CHUNK_MAX_TOKENS
+    if overlap_tokens is None:
+        overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+
+    window = []  # list of (text, tokens, starts_paragraph)
+    window_tokens = 0
+    has_new_content = False
+
+    def emit():
+        parts = []
+        for position, (text, _, starts_paragraph) in enumerate(window):
+            if position:
+                parts.append("\n\n" if starts_paragraph else " ")
+            parts.append(text)
+        return {
+            "text": "".join(parts),
+            "token_count": window_tokens,
+        }
+
+    for text, is_heading, starts_paragraph in iter_units(lines):
+        tokens = count_tokens(text)
+
+        if is_heading and has_new_content:
+            yield emit()
+            window, window_tokens, has_new_content = [], 0, False
+
+        # A single unit too large for any window is split on token boundaries
+        pieces = [(text, tokens)] if tokens <= max_tokens else [
+            (piece, count_tokens(piece)) for piece in split_by_tokens(text, max_tokens)
+        ]
+
+        for position, (piece, piece_tokens) in enumerate(pieces):
+            if window and window_tokens + piece_tokens > max_tokens:
+                if has_new_content:
+                    yield emit()
+                # Carry trailing sentences forward as overlap
+                overlap = []
+                overlap_total = 0
+                for unit in reversed(window):
+                    if overlap_total + unit[1] > overlap_tokens or overlap_total + unit[1] + piece_tokens > max_tokens:
+                        break
+                    overlap.insert(0, unit)
+                    overlap_total += unit[1]
+                window, window_tokens, has_new_content = overlap, overlap_total, False
+
+            window.append((piece, piece_tokens, starts_paragraph and position == 0))
+            window_tokens += piece_tokens
+            has_new_content = True
+
+    if has_new_content:
+        yield emit()
+
+
+def chunk_file(file_path, max_tokens=None, overlap_tokens=None):
+    """Stream a text file through ``chunk_lines`` without reading it whole"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        yield from chunk_lines(file, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def chunk_text(content, max_tokens=None, overlap_tokens=None):
+    """Chunk an in-memory string"""
+    return list(chunk_lines(content.splitlines(), max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+
+
+def file_is_blank(file_path):
+    """Whether a text file has nothing but whitespace, i.e. yields no chunks"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return not any(line.strip() for line in file)
+
+
+def hash_file(file_path):
+    """SHA-256 of a text file's content, read incrementally.
+
+    Matches ``compute_content_hash`` of the same content read in text mode.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
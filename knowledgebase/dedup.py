@@ -0,0 +1,140 @@
+# knowledgebase/dedup.py
+import hashlib
+import re
+from collections import defaultdict, deque
+
+import numpy as np
+from django.conf import settings
+
+# MinHash over word shingles, bucketed with LSH: 32 bands of 4 rows make
+# pairs above ~0.4 Jaccard candidates, which are then checked against the threshold
+NUM_PERMUTATIONS = 128
+BANDS = 32
+SHINGLE_SIZE = 3
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_random = np.random.default_rng(20240611)
+_A = _random.integers(1, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _random.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+WORD = re.compile(r"\w+")
+
+
+def _shingle_hashes(lines):
+    """32-bit hashes of the distinct word shingles in an iterable of lines"""
+    window = deque(maxlen=SHINGLE_SIZE)
+    hashes = set()
+    for line in lines:
+        for word in WORD.findall(line.casefold()):
+            window.append(word)
+            if len(window) == SHINGLE_SIZE:
+                shingle = " ".join(window).encode('utf-8')
+                hashes.add(int.from_bytes(hashlib.blake2b(shingle, digest_size=4).digest(), 'little'))
+    if not hashes and window:
+        # Shorter than one shingle: the whole text is the only shingle
+        shingle = " ".join(window).encode('utf-8')
+        hashes.add(int.from_bytes(hashlib.blake2b(shingle, digest_size=4).digest(), 'little'))
+    return hashes
+
+
+def minhash_signature(lines):
+    """MinHash signature (NUM_PERMUTATIONS uint64 values) of an iterable of lines"""
+    hashes = _shingle_hashes(lines)
+    if not hashes:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    # (a * x + b) mod p fits in 64 bits because a, b and x are all below 2**32
+    permuted = ((values[:, None] * _A + _B) % _PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def file_signature(file_path):
+    with open(file_path, 'r', encoding='utf-8') as handle:
+        return minhash_signature(handle)
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+
+def cluster_signatures(signatures, threshold=None):
+    """Group near-duplicates, returning a dict mapping each key to its cluster's canonical key.
+
+    ``signatures`` maps keys (e.g. file paths) to MinHash signatures. Keys
+    whose estimated similarity reaches ``threshold`` (DEDUP_THRESHOLD) are
+    linked, transitively; the smallest key of each cluster is canonical.
+    """
+    if threshold is None:
+        threshold = settings.DEDUP_THRESHOLD
+    keys = sorted(signatures)
+    parent = {key: key for key in keys}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    rows = NUM_PERMUTATIONS // BANDS
+    checked = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for key in keys:
+            buckets[signatures[key][band * rows:(band + 1) * rows].tobytes()].append(key)
+        for bucket in buckets.values():
+            for index, first in enumerate(bucket):
+                for second in bucket[index + 1:]:
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    if estimated_similarity(signatures[first], signatures[second]) >= threshold:
+                        root_a, root_b = find(first), find(second)
+                        if root_a != root_b:
+                            # The smallest key stays the root, so it ends up canonical
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return {key: find(key) for key in keys}
+
+
+def cluster_documents(documents, threshold=None):
+    """Set ``cluster_id`` and ``is_duplicate`` on document dicts with a ``signature``.
+
+    The cluster ID is the document UUID of the cluster's canonical document
+    (the smallest file path), so a document that is unique is its own cluster.
+    With DEDUP_ENABLED off every document is its own cluster.
+    """
+    from ai_assistant.utils.weaviate_client import WeaviateManager
+
+    if settings.DEDUP_ENABLED:
+        canonical = cluster_signatures({doc['file_path']: doc['signature'] for doc in documents}, threshold)
+    else:
+        canonical = {doc['file_path']: doc['file_path'] for doc in documents}
+
+    for doc in documents:
+        canonical_path = canonical[doc['file_path']]
+        doc['cluster_id'] = WeaviateManager.document_uuid(canonical_path)
+        doc['is_duplicate'] = canonical_path != doc['file_path']
+    return documents
+
+
+def collapse_duplicates(results, limit):
+    """Keep only the best-ranked result per cluster and chunk position, up to ``limit`` results.
+
+    Different chunks of one document share a cluster but not a position, so
+    they are never collapsed into each other.
+    """
+    seen = set()
+    collapsed = []
+    for result in results:
+        properties = result.properties
+        cluster_id = properties.get("cluster_id")
+        key = (cluster_id, properties.get("chunk_index") or 0) if cluster_id else str(result.uuid)
+        if key in seen:
+            continue
+        seen.add(key)
+        collapsed.append(result)
+        if len(collapsed) == limit:
+            break
+    return collapsed
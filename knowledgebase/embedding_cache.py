@@ -0,0 +1,195 @@
+# knowledgebase/embedding_cache.py
+import hashlib
+import logging
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Only refresh last_used_at (and bump touch_count) in the database when it is
+# older than this, so repeated hits on hot entries don't each cost an UPDATE
+TOUCH_INTERVAL = timedelta(hours=1)
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies of a text share a cache key"""
+    return " ".join(text.split())
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def pack_vector(vector, dtype):
+    if dtype == 'float16':
+        return struct.pack(f'<{len(vector)}e', *vector)
+    return array('f', vector).tobytes()
+
+
+def unpack_vector(data, dtype):
+    data = bytes(data)
+    if dtype == 'float16':
+        return list(struct.unpack(f'<{len(data) // 2}e', data))
+    return array('f', data).tolist()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model, dimensions, normalized-text hash).
+
+    An in-process LRU sits in front of the shared EmbeddingCacheEntry table.
+    It holds vectors as float32 ``array``s (12 KB for 3072 dimensions, against
+    ~100 KB as a list of floats) and hands out lists. The table is bounded to
+    EMBEDDING_CACHE_MAX_ROWS by evicting the least recently used rows.
+    Database errors degrade to cache misses.
+    """
+
+    def __init__(self, max_memory_entries=None, max_rows=None, dtype=None):
+        self.max_memory_entries = max_memory_entries or settings.EMBEDDING_CACHE_LRU_SIZE
+        self.max_rows = max_rows or settings.EMBEDDING_CACHE_MAX_ROWS
+        self.dtype = dtype or settings.EMBEDDING_CACHE_DTYPE
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.inserts_since_prune = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self.memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, vector):
+        vector = vector if isinstance(vector, array) else array('f', vector)
+        with self.lock:
+            self.memory[key] = vector
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory_entries:
+                self.memory.popitem(last=False)
+
+    def get_many(self, model, dimensions, texts):
+        """Return a list with the cached vector (or None) for each text"""
+        from .models import EmbeddingCacheEntry
+
+        hashes = [text_hash(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for index, digest in enumerate(hashes):
+                key = (model, dimensions, digest)
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[index] = self.memory[key].tolist()
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.setdefault(digest, []).append(index)
+
+        if missing:
+            try:
+                entries = list(
+                    EmbeddingCacheEntry.objects
+                    .filter(model=model, dimensions=dimensions, text_hash__in=list(missing))
+                    .only('pk', 'text_hash', 'vector', 'dtype', 'last_used_at')
+                )
+            except DatabaseError as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                entries = []
+
+            now = timezone.now()
+            to_touch = []
+            for entry in entries:
+                vector = unpack_vector(entry.vector, entry.dtype)
+                self._remember((model, dimensions, entry.text_hash), vector)
+                for index in missing.pop(entry.text_hash):
+                    results[index] = vector
+                    self._count("db_hits")
+                if now - entry.last_used_at > TOUCH_INTERVAL:
+                    to_touch.append(entry.pk)
+
+            if to_touch:
+                try:
+                    EmbeddingCacheEntry.objects.filter(pk__in=to_touch).update(
+                        last_used_at=now, touch_count=F('touch_count') + 1
+                    )
+                except DatabaseError as e:
+                    logger.warning(f"Embedding cache touch failed: {e}")
+
+            self._count("misses", sum(len(indexes) for indexes in missing.values()))
+
+        return results
+
+    def get(self, model, dimensions, text):
+        return self.get_many(model, dimensions, [text])[0]
+
+    def set_many(self, model, dimensions, texts, vectors):
+        """Store freshly generated vectors in both tiers"""
+        from .models import EmbeddingCacheEntry
+
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            digest = text_hash(text)
+            self._remember((model, dimensions, digest), vector)
+            entries[digest] = EmbeddingCacheEntry(
+                model=model,
+                dimensions=dimensions,
+                text_hash=digest,
+                vector=pack_vector(vector, self.dtype),
+                dtype=self.dtype
+            )
+
+        try:
+            EmbeddingCacheEntry.objects.bulk_create(entries.values(), ignore_conflicts=True)
+        except DatabaseError as e:
+            logger.warning(f"Embedding cache store failed: {e}")
+            return
+        self._count("stores", len(entries))
+
+        with self.lock:
+            self.inserts_since_prune += len(entries)
+            should_prune = self.inserts_since_prune >= settings.EMBEDDING_CACHE_PRUNE_EVERY
+            if should_prune:
+                self.inserts_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def set(self, model, dimensions, text, vector):
+        self.set_many(model, dimensions, [text], [vector])
+
+    def prune(self):
+        """Evict the least recently used rows beyond EMBEDDING_CACHE_MAX_ROWS"""
+        from .models import EmbeddingCacheEntry
+
+        try:
+            overflow = list(
+                EmbeddingCacheEntry.objects
+                .order_by('-last_used_at')
+                .values_list('pk', flat=True)[self.max_rows:]
+            )
+            if overflow:
+                deleted, _ = EmbeddingCacheEntry.objects.filter(pk__in=overflow).delete()
+                self._count("evictions", deleted)
+                logger.info(f"Evicted {deleted} embedding cache entries")
+        except DatabaseError as e:
+            logger.warning(f"Embedding cache prune failed: {e}")
+
+    def clear_memory(self):
+        with self.lock:
+            self.memory.clear()
+
+
+# Process-wide cache instance
+embedding_cache = EmbeddingCache()
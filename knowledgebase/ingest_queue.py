@@ -0,0 +1,182 @@
+# knowledgebase/ingest_queue.py
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ai_assistant.utils.weaviate_client import WeaviateManager
+from .document_processor import process_text_document
+from .models import AIDocument
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_document(document_id):
+    """Mark a document for (re-)ingestion by the background workers.
+
+    A document a worker is processing right now isn't reset to pending (a
+    second worker could claim it mid-run); it is flagged instead, and the
+    worker queues it again when the run ends. Returns whether the document
+    was queued straight away.
+    """
+    documents = AIDocument.objects.filter(pk=document_id)
+    while True:
+        if documents.exclude(ingest_status=AIDocument.INGEST_PROCESSING).update(
+            ingest_status=AIDocument.INGEST_PENDING,
+            ingest_attempts=0,
+            ingest_error='',
+            ingest_available_at=timezone.now()
+        ):
+            return True
+        if documents.filter(ingest_status=AIDocument.INGEST_PROCESSING).update(ingest_requeue=True):
+            return False
+        if not documents.exists():
+            return False
+        # The run ended between the two updates: queue it normally
+
+
+def _finish_job(document, **fields):
+    """Record a job's outcome, unless the document was re-queued mid-run: then queue it again"""
+    if AIDocument.objects.filter(pk=document.pk, ingest_requeue=False).update(**fields):
+        return
+    AIDocument.objects.filter(pk=document.pk).update(
+        ingest_status=AIDocument.INGEST_PENDING,
+        ingest_requeue=False,
+        ingest_attempts=0,
+        ingest_error='',
+        ingest_available_at=timezone.now(),
+        ingest_finished_at=timezone.now()
+    )
+    logger.info(f"Document {document.pk} ({document.title}) changed during ingestion; queued again")
+
+
+def claim_next_document():
+    """Atomically claim the next due job, or return None if the queue is empty.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never claim
+    the same row. Jobs stuck in processing longer than
+    INGEST_JOB_TIMEOUT_SECONDS (e.g. after a worker crash) are reclaimed.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.INGEST_JOB_TIMEOUT_SECONDS)
+
+    with transaction.atomic():
+        document = (
+            AIDocument.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(ingest_status=AIDocument.INGEST_PENDING, ingest_available_at__lte=now)
+                | Q(ingest_status=AIDocument.INGEST_PROCESSING, ingest_started_at__lt=stale_before)
+            )
+            .order_by('ingest_available_at', 'id')
+            .first()
+        )
+        if document is None:
+            return None
+
+        AIDocument.objects.filter(pk=document.pk).update(
+            ingest_status=AIDocument.INGEST_PROCESSING,
+            ingest_attempts=F('ingest_attempts') + 1,
+            ingest_started_at=now,
+            ingest_finished_at=None,
+            ingest_requeue=False
+        )
+        document.refresh_from_db()
+        return document
+
+
+def run_job(document, weaviate_manager):
+    """Ingest one claimed document and record the outcome on its row"""
+    try:
+        process_text_document(document.document.path, weaviate_manager)
+    except Exception as e:
+        logger.error(f"Ingestion of document {document.pk} ({document.title}) failed: {e}", exc_info=True)
+        if document.ingest_attempts >= settings.INGEST_MAX_ATTEMPTS:
+            status = AIDocument.INGEST_FAILED
+            available_at = timezone.now()
+        else:
+            # Exponential backoff between retries
+            status = AIDocument.INGEST_PENDING
+            delay = settings.INGEST_RETRY_BASE_SECONDS * (2 ** (document.ingest_attempts - 1))
+            available_at = timezone.now() + timedelta(seconds=delay)
+        _finish_job(
+            document,
+            ingest_status=status,
+            ingest_error=str(e),
+            ingest_available_at=available_at,
+            ingest_finished_at=timezone.now()
+        )
+        return False
+
+    _finish_job(
+        document,
+        ingest_status=AIDocument.INGEST_DONE,
+        ingest_error='',
+        ingest_finished_at=timezone.now()
+    )
+    logger.info(f"Ingested document {document.pk} ({document.title})")
+    return True
+
+
+def worker_loop(stop_event, poll_interval=None, burst=False):
+    """Claim and run jobs until ``stop_event`` is set (or the queue is empty with ``burst``)"""
+    if poll_interval is None:
+        poll_interval = settings.INGEST_POLL_INTERVAL_SECONDS
+
+    processed = 0
+    weaviate_manager = None
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            document = claim_next_document()
+            if document is None:
+                if burst:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+
+            if weaviate_manager is None:
+                weaviate_manager = WeaviateManager(admin_access=True)
+            run_job(document, weaviate_manager)
+            processed += 1
+    finally:
+        if weaviate_manager is not None:
+            weaviate_manager.close()
+        close_old_connections()
+    return processed
+
+
+def run_workers(concurrency=None, poll_interval=None, burst=False, stop_event=None):
+    """Run ``concurrency`` worker threads in this process, returning the number of jobs processed"""
+    if concurrency is None:
+        concurrency = settings.INGEST_WORKER_CONCURRENCY
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    results = []
+    results_lock = threading.Lock()
+
+    def target():
+        processed = worker_loop(stop_event, poll_interval=poll_interval, burst=burst)
+        with results_lock:
+            results.append(processed)
+
+    threads = [
+        threading.Thread(target=target, name=f"ingest-worker-{index}", daemon=True)
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+    return sum(results)
@@ -0,0 +1,280 @@
+# knowledgebase/ingestion.py
+import json
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .chunking import chunk_file, file_is_blank, hash_file
+from .dedup import cluster_documents, file_signature
+from .rate_limiter import RateLimiter, call_with_backoff
+from .tokenization import count_tokens
+from .vectorization import EMBEDDING_DIMENSIONS, batch_texts, embed_batch, embed_with_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointJournal:
+    """Append-only JSON-lines journal of embedded and written chunks.
+
+    Embeddings are journaled as soon as they come back from OpenAI, so an
+    interrupted run can resume without paying for them again, and chunks
+    once Weaviate has accepted them, so it doesn't write them twice either.
+    The journal is removed once a run completes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.embedded = {}  # chunk uuid -> (chunk_hash, vector)
+        self.written = {}   # chunk uuid -> (chunk_hash, content_hash, cluster_id)
+
+    def load(self):
+        """Load a journal left behind by an interrupted run, returning the number of entries read"""
+        if not os.path.exists(self.path):
+            return 0
+
+        entries = 0
+        with open(self.path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be truncated if the process was killed mid-write
+                    continue
+                if entry["stage"] == "embedded":
+                    self.embedded[entry["uuid"]] = (entry["chunk_hash"], entry["vector"])
+                elif entry["stage"] == "written":
+                    self.written[entry["uuid"]] = (
+                        entry["chunk_hash"], entry.get("content_hash"), entry.get("cluster_id")
+                    )
+                entries += 1
+        return entries
+
+    def cached_vector(self, chunk):
+        """Return a journaled embedding for this exact chunk content, if any"""
+        cached = self.embedded.get(chunk['uuid'])
+        if cached and cached[0] == chunk['chunk_hash']:
+            return cached[1]
+        return None
+
+    def is_written(self, chunk):
+        """Whether an interrupted run already wrote this chunk with the same content and properties"""
+        return self.written.get(chunk['uuid']) == (chunk['chunk_hash'], chunk['content_hash'], chunk['cluster_id'])
+
+    def _append(self, entries):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as journal:
+            for entry in entries:
+                journal.write(json.dumps(entry) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def record_embedded(self, chunks, vectors):
+        self._append(
+            {"stage": "embedded", "uuid": chunk['uuid'], "chunk_hash": chunk['chunk_hash'], "vector": vector}
+            for chunk, vector in zip(chunks, vectors)
+        )
+
+    def record_written(self, chunks):
+        self._append(
+            {
+                "stage": "written", "uuid": chunk['uuid'], "chunk_hash": chunk['chunk_hash'],
+                "content_hash": chunk['content_hash'], "cluster_id": chunk['cluster_id'],
+            }
+            for chunk in chunks
+        )
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.embedded.clear()
+        self.written.clear()
+
+
+class IngestionPipeline:
+    """Staged scan -> read -> dedupe -> chunk -> embed -> write ingestion of a documents directory.
+
+    Files are hashed and chunked as streams. Reads, chunking and embedding
+    requests run on a bounded worker pool; embedding
+    requests are paced by a token bucket sized to the OpenAI RPM/TPM quotas
+    and retried with exponential backoff. Writes happen on the calling thread
+    while embedding continues in the background.
+    """
+
+    def __init__(self, weaviate_manager, workers=None, batch_size=None, resume=True,
+                 journal_path=None, progress=None):
+        self.manager = weaviate_manager
+        self.workers = workers or settings.INGEST_WORKERS
+        self.batch_size = batch_size or settings.WEAVIATE_BATCH_SIZE
+        self.resume = resume
+        self.journal = CheckpointJournal(journal_path or settings.INGEST_CHECKPOINT_PATH)
+        self.limiter = RateLimiter(
+            requests_per_minute=settings.OPENAI_EMBEDDING_RPM,
+            tokens_per_minute=settings.OPENAI_EMBEDDING_TPM
+        )
+        self.progress = progress or (lambda **kwargs: None)
+        self.started_at = None
+        self.stats_lock = threading.Lock()
+        self.tokens_embedded = 0
+        self.chunks_written = 0
+        self.written_parents = set()
+
+    def run(self, directory):
+        """Ingest every .txt file in ``directory``, returning the sync counts"""
+        self.started_at = time.monotonic()
+
+        if self.resume:
+            if self.journal.load():
+                logger.info(
+                    f"Resuming from checkpoint journal: {len(self.journal.embedded)} embedded, "
+                    f"{len(self.journal.written)} written"
+                )
+        else:
+            self.journal.clear()
+
+        paths = self.scan(directory)
+        documents = self.dedupe(self.read(paths))
+        changed, vanished, stats = self.manager.diff_documents(documents, scope_dir=directory)
+        self._report("diff", len(changed), len(documents))
+
+        chunks, stale = self.chunk(changed)
+        self.embed_and_write(chunks)
+
+        # Only drop old chunks once their replacements are written
+        self.manager.delete_documents(list(vanished) + stale)
+
+        self.journal.clear()
+        return stats
+
+    def scan(self, directory):
+        with os.scandir(directory) as entries:
+            paths = sorted(
+                entry.path for entry in entries
+                if entry.is_file() and entry.name.endswith('.txt')
+            )
+        self._report("scan", len(paths), len(paths))
+        return paths
+
+    def read(self, paths):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            documents = list(pool.map(self._read_document, paths))
+        self._report("read", len(documents), len(paths))
+        return documents
+
+    @staticmethod
+    def _read_document(file_path):
+        file_path = os.path.normpath(file_path)
+        return {
+            'title': os.path.basename(file_path),
+            'file_path': file_path,
+            'content_hash': hash_file(file_path),
+            'is_blank': file_is_blank(file_path),
+            'signature': file_signature(file_path) if settings.DEDUP_ENABLED else None,
+        }
+
+    def dedupe(self, documents):
+        """Assign near-duplicate cluster IDs, dropping duplicates if DEDUP_SKIP_DUPLICATES is set.
+
+        Dropped duplicates are absent from the returned documents, so any
+        previously stored copies are deleted like vanished files.
+        """
+        cluster_documents(documents)
+        duplicates = sum(1 for doc in documents if doc['is_duplicate'])
+        if duplicates:
+            clusters = len({doc['cluster_id'] for doc in documents if doc['is_duplicate']})
+            logger.info(f"Found {duplicates} near-duplicate documents in {clusters} clusters")
+        if settings.DEDUP_SKIP_DUPLICATES:
+            documents = [doc for doc in documents if not doc['is_duplicate']]
+        self._report("dedupe", duplicates, len(documents))
+        return documents
+
+    def chunk(self, documents):
+        """Chunk changed documents, returning all chunks and the stale chunk UUIDs they replace"""
+        def chunk_document(doc):
+            return self.manager.build_chunks(doc, chunk_file(doc['file_path']))
+
+        chunks = []
+        stale = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for doc, doc_chunks in zip(documents, pool.map(chunk_document, documents)):
+                chunks.extend(doc_chunks)
+                stale.extend(self.manager.stale_chunk_uuids(doc, doc_chunks))
+        self._report("chunk", len(chunks), len(chunks))
+        return chunks, stale
+
+    def embed_and_write(self, chunks):
+        """Embed chunks concurrently and write them in batches as results arrive"""
+        total = len(chunks)
+        pending_write = []
+        to_embed = []
+
+        already_written = [chunk for chunk in chunks if self.journal.is_written(chunk)]
+        if already_written:
+            logger.info(f"Skipping {len(already_written)} chunks already written before the interruption")
+            self.chunks_written += len(already_written)
+            self.written_parents.update(chunk['parent_id'] for chunk in already_written)
+            chunks = [chunk for chunk in chunks if not self.journal.is_written(chunk)]
+
+        for chunk in chunks:
+            vector = self.journal.cached_vector(chunk)
+            if vector is not None:
+                pending_write.append((chunk, vector))
+            else:
+                to_embed.append(chunk)
+        if pending_write:
+            logger.info(f"Reusing {len(pending_write)} embeddings from the checkpoint journal")
+
+        batches = [
+            [to_embed[index] for index, _ in batch]
+            for batch in batch_texts([chunk['content'] for chunk in to_embed], settings.EMBEDDING_BATCH_SIZE)
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._embed, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                vectors = future.result()
+                self.journal.record_embedded(batch, vectors)
+                pending_write.extend(zip(batch, vectors))
+
+                while len(pending_write) >= self.batch_size:
+                    self._write(pending_write[:self.batch_size], total)
+                    pending_write = pending_write[self.batch_size:]
+
+        if pending_write:
+            self._write(pending_write, total)
+
+    def _embed(self, batch):
+        def embed_uncached(texts):
+            tokens = sum(count_tokens(text) for text in texts)
+            self.limiter.acquire(tokens)
+            # The pipeline does its own backoff, so disable the client's retries
+            vectors = call_with_backoff(lambda: embed_batch(texts, max_retries=0))
+            with self.stats_lock:
+                self.tokens_embedded += tokens
+            return vectors
+
+        # Cached chunks (e.g. unchanged paragraphs of an edited document) cost no API call
+        return embed_with_cache([chunk['content'] for chunk in batch], EMBEDDING_DIMENSIONS, embed_uncached)
+
+    def _write(self, items, total):
+        chunks = [chunk for chunk, _ in items]
+        failures = self.manager.write_chunks(chunks, [vector for _, vector in items])
+        written = [chunk for index, chunk in enumerate(chunks) if index not in failures]
+        self.journal.record_written(written)
+        self.chunks_written += len(written)
+        self.written_parents.update(chunk['parent_id'] for chunk in written)
+        self._report("write", self.chunks_written, total)
+
+    def _report(self, stage, done, total):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        self.progress(
+            stage=stage,
+            done=done,
+            total=total,
+            docs_per_sec=len(self.written_parents) / elapsed,
+            tokens_per_sec=self.tokens_embedded / elapsed
+        )
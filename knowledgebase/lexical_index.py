@@ -0,0 +1,241 @@
+# knowledgebase/lexical_index.py
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from ai_assistant.utils.search_cache import SearchHit
+from .chunking import chunk_file
+from .dedup import cluster_signatures, collapse_duplicates, file_signature
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its "
+    "me my of on or so that the their there this to was what when where which who why "
+    "will with you your".split()
+)
+
+# BM25 parameters (the usual defaults, as used by Weaviate)
+K1 = 1.2
+B = 0.75
+
+# A title term counts as this many body terms, like the title^2 boost of the hybrid search
+TITLE_WEIGHT = 2
+
+# How often (seconds) the loaded index checks whether the documents directory changed
+SIGNATURE_CHECK_INTERVAL = 60
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def corpus_signature(directory):
+    """Fingerprint of the .txt files in ``directory`` (names, sizes, mtimes)"""
+    digest = hashlib.sha256()
+    with os.scandir(directory) as entries:
+        for entry in sorted((e for e in entries if e.is_file() and e.name.endswith('.txt')), key=lambda e: e.name):
+            stat = entry.stat()
+            digest.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over the chunks of the documents directory.
+
+    Chunks, UUIDs and properties match what ingestion stores in Weaviate, and
+    ``search`` returns Weaviate-shaped result objects, so the index can stand
+    in for the vector search when Weaviate or OpenAI is unavailable.
+    Postings are kept as parallel arrays of chunk ids and term frequencies.
+    """
+
+    def __init__(self, chunks, postings, lengths, signature):
+        self.chunks = chunks
+        self.postings = postings  # term -> (array of chunk ids, array of term frequencies)
+        self.lengths = lengths
+        self.average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.signature = signature
+
+    @classmethod
+    def build(cls, directory):
+        from ai_assistant.utils.weaviate_client import WeaviateManager
+
+        started = time.monotonic()
+        chunks = []
+        postings = defaultdict(lambda: (array('I'), array('I')))
+        lengths = array('I')
+        signature = corpus_signature(directory)
+
+        with os.scandir(directory) as entries:
+            paths = sorted(os.path.normpath(e.path) for e in entries if e.is_file() and e.name.endswith('.txt'))
+        clusters = cls._clusters(paths)
+
+        for file_path in paths:
+            title = os.path.basename(file_path)
+            title_terms = Counter(tokenize(title))
+            try:
+                file_chunks = list(chunk_file(file_path))
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"Skipping {file_path} in lexical index: {e}")
+                continue
+
+            for index, chunk in enumerate(file_chunks):
+                chunk_id = len(chunks)
+                chunks.append({
+                    "uuid": WeaviateManager.chunk_uuid(file_path, index),
+                    "title": title,
+                    "content": chunk['text'],
+                    "file_path": file_path,
+                    "parent_id": WeaviateManager.document_uuid(file_path),
+                    "cluster_id": WeaviateManager.document_uuid(clusters.get(file_path, file_path)),
+                    "chunk_index": index,
+                    "chunk_count": len(file_chunks),
+                })
+
+                terms = Counter(tokenize(chunk['text']))
+                for term, count in title_terms.items():
+                    terms[term] += TITLE_WEIGHT * count
+                for term, count in terms.items():
+                    ids, frequencies = postings[term]
+                    ids.append(chunk_id)
+                    frequencies.append(count)
+                lengths.append(sum(terms.values()))
+
+        logger.info(
+            f"Built lexical index: {len(paths)} documents, {len(chunks)} chunks, "
+            f"{len(postings)} terms in {time.monotonic() - started:.2f}s"
+        )
+        return cls(chunks, dict(postings), lengths, signature)
+
+    @staticmethod
+    def _clusters(paths):
+        """Map each path to the canonical path of its near-duplicate cluster, as ingestion does"""
+        if not settings.DEDUP_ENABLED:
+            return {}
+        signatures = {}
+        for path in paths:
+            try:
+                signatures[path] = file_signature(path)
+            except (OSError, UnicodeDecodeError):
+                continue
+        return cluster_signatures(signatures)
+
+    def search(self, query, limit=5):
+        """Return the ``limit`` best BM25 matches as Weaviate-shaped result objects.
+
+        Like the vector search, near-duplicates are collapsed to their
+        best-ranked hit when SEARCH_COLLAPSE_DUPLICATES is on.
+        """
+        total = len(self.chunks)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, frequencies = posting
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            for chunk_id, frequency in zip(ids, frequencies):
+                length_ratio = self.lengths[chunk_id] / self.average_length
+                scores[chunk_id] += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length_ratio))
+
+        collapse = settings.SEARCH_COLLAPSE_DUPLICATES
+        if collapse:
+            # Walk the full ranking: a big cluster could otherwise fill any fixed over-fetch
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        hits = (self._hit(chunk_id, score) for chunk_id, score in ranked)
+        return collapse_duplicates(hits, limit) if collapse else list(hits)
+
+    def _hit(self, chunk_id, score):
+        properties = dict(self.chunks[chunk_id])
+        return SearchHit(properties.pop("uuid"), properties, score=score)
+
+    def save(self, path):
+        """Write the index as gzipped JSON, atomically replacing any previous file"""
+        data = {
+            "version": INDEX_VERSION,
+            "signature": self.signature,
+            "chunks": self.chunks,
+            "lengths": self.lengths.tolist(),
+            "postings": {term: [ids.tolist(), frequencies.tolist()] for term, (ids, frequencies) in self.postings.items()},
+        }
+        temp_path = f"{path}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as index_file:
+            json.dump(data, index_file, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as index_file:
+            data = json.load(index_file)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported lexical index version {data.get('version')}")
+        postings = {
+            term: (array('I', ids), array('I', frequencies))
+            for term, (ids, frequencies) in data["postings"].items()
+        }
+        return cls(data["chunks"], postings, array('I', data["lengths"]), data["signature"])
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(directory=None):
+    """Return this process's lexical index, loading or building it on first use.
+
+    The prebuilt file at LEXICAL_INDEX_PATH (see ``build_lexical_index``) is
+    used when it matches the documents directory; otherwise the index is
+    rebuilt and the file refreshed. Changes to the directory are picked up
+    within SIGNATURE_CHECK_INTERVAL seconds.
+    """
+    global _index, _index_checked_at
+
+    directory = directory or os.path.join(settings.BASE_DIR, 'documents')
+    if _index is not None and time.monotonic() - _index_checked_at < SIGNATURE_CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        if _index is not None and time.monotonic() - _index_checked_at < SIGNATURE_CHECK_INTERVAL:
+            return _index
+
+        signature = corpus_signature(directory)
+        if _index is None or _index.signature != signature:
+            _index = _load_or_build(directory, signature)
+        _index_checked_at = time.monotonic()
+        return _index
+
+
+def _load_or_build(directory, signature):
+    path = settings.LEXICAL_INDEX_PATH
+    if os.path.exists(path):
+        try:
+            index = LexicalIndex.load(path)
+            if index.signature == signature:
+                logger.info(f"Loaded lexical index from {path}")
+                return index
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable lexical index {path}: {e}")
+
+    index = LexicalIndex.build(directory)
+    try:
+        index.save(path)
+    except OSError as e:
+        logger.warning(f"Could not save lexical index to {path}: {e}")
+    return index
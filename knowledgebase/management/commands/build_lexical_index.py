@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledgebase.lexical_index import LexicalIndex
+
+
+class Command(BaseCommand):
+    help = 'Build the local BM25 index used for search when Weaviate or OpenAI is unavailable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=os.path.join(settings.BASE_DIR, 'documents'),
+                            help='Directory of .txt documents to index')
+        parser.add_argument('--output', default=settings.LEXICAL_INDEX_PATH, help='Where to write the index')
+        parser.add_argument('--query', help='Run a test query against the built index')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        index = LexicalIndex.build(options['directory'])
+        index.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index.chunks)} chunks ({len(index.postings)} terms) in "
+            f"{time.monotonic() - started:.2f}s -> {options['output']} "
+            f"({os.path.getsize(options['output']) / 1024:.0f} KiB)"
+        ))
+
+        if options['query']:
+            started = time.perf_counter()
+            hits = index.search(options['query'], limit=5)
+            self.stdout.write(f"Query took {(time.perf_counter() - started) * 1000:.1f} ms")
+            for hit in hits:
+                self.stdout.write(f"- {hit.metadata.score:.3f} {hit.properties['title']} "
+                                  f"(part {hit.properties['chunk_index'] + 1}/{hit.properties['chunk_count']})")
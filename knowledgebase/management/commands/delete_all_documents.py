@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from ai_assistant.utils.weaviate_client import WeaviateManager
+from ai_assistant.utils.search_cache import search_cache
 from weaviate.classes.query import Filter
 
 class Command(BaseCommand):
@@ -28,6 +29,7 @@ class Command(BaseCommand):
                 for doc in result.objects:
                     documents.data.delete_by_id(doc.uuid)
                     deleted_count += 1
+                search_cache.bump_generation()
                     
                 self.stdout.write(self.style.SUCCESS(f"Deleted {deleted_count} documents successfully"))
                 
@@ -15,23 +15,31 @@ class Command(BaseCommand):
         with WeaviateManager(admin_access=True) as manager:
             documents = manager.collections.get("Document")
             
-            success_count = 0
+            found = []
             for uuid in uuids:
+                # First, verify the document exists
                 try:
-                    # First, verify the document exists
-                    try:
-                        doc = documents.data.get_by_id(uuid)
-                        title = doc.properties.get('title', 'Unknown')
-                    except Exception:
-                        self.stdout.write(self.style.ERROR(f"Document with UUID {uuid} not found"))
-                        continue
-                    
-                    # Delete the document
-                    documents.data.delete_by_id(uuid)
-                    success_count += 1
-                    self.stdout.write(f"Deleted document: {title} (UUID: {uuid})")
-                    
+                    doc = documents.data.get_by_id(uuid)
                 except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Error deleting document {uuid}: {e}"))
-            
-            self.stdout.write(self.style.SUCCESS(f"Successfully deleted {success_count} out of {len(uuids)} document(s)"))
+                    self.stdout.write(self.style.ERROR(f"Error looking up document {uuid}: {e}"))
+                    continue
+                if doc is None:
+                    self.stdout.write(self.style.ERROR(f"Document with UUID {uuid} not found"))
+                    continue
+                found.append(uuid)
+                self.stdout.write(f"Deleting document: {doc.properties.get('title', 'Unknown')} (UUID: {uuid})")
+
+            if not found:
+                self.stdout.write(self.style.WARNING("No documents to delete"))
+                return
+
+            # Chunks after the first have UUIDs of their own and point back
+            # through parent_id, so delete them along with the document
+            try:
+                deleted = manager.delete_documents(found, with_chunks=True)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error deleting documents: {e}"))
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f"Successfully deleted {len(found)} out of {len(uuids)} document(s) ({deleted} object(s) including chunks)"
+            ))
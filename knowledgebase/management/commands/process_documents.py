@@ -6,7 +6,40 @@ from knowledgebase.document_processor import process_all_text_documents
 class Command(BaseCommand):
     help = 'Process all documents in the documents directory'
     
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.WEAVIATE_BATCH_SIZE,
+            help='Number of chunks written to Weaviate per insert_many batch'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.INGEST_WORKERS,
+            help='Number of concurrent read/embedding workers'
+        )
+        parser.add_argument(
+            '--no-resume',
+            action='store_true',
+            help='Discard the checkpoint journal of an interrupted run and start over'
+        )
+    
     def handle(self, *args, **options):
         self.stdout.write('Processing text documents...')
-        count = process_all_text_documents()
-        self.stdout.write(self.style.SUCCESS(f'Successfully processed {count} documents'))
+        stats = process_all_text_documents(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            resume=not options['no_resume'],
+            progress=self.report_progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully synced documents: {stats['added']} added, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['empty']} empty, {stats['deleted']} deleted"
+        ))
+
+    def report_progress(self, stage, done, total, docs_per_sec, tokens_per_sec):
+        self.stdout.write(
+            f"[{stage}] {done}/{total} "
+            f"({docs_per_sec:.1f} docs/sec, {tokens_per_sec:.0f} tokens/sec)"
+        )
@@ -0,0 +1,58 @@
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledgebase.dedup import cluster_signatures, file_signature
+
+
+class Command(BaseCommand):
+    help = 'Report clusters of near-duplicate documents in the documents directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=os.path.join(settings.BASE_DIR, 'documents'),
+                            help='Directory of .txt documents to scan')
+        parser.add_argument('--threshold', type=float, default=settings.DEDUP_THRESHOLD,
+                            help='Estimated Jaccard similarity at which documents count as duplicates')
+        parser.add_argument('--show', type=int, default=5,
+                            help='Members listed per cluster (0 lists all)')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        with os.scandir(directory) as entries:
+            paths = sorted(
+                os.path.normpath(entry.path) for entry in entries
+                if entry.is_file() and entry.name.endswith('.txt')
+            )
+
+        signatures = {}
+        for path in paths:
+            try:
+                signatures[path] = file_signature(path)
+            except (OSError, UnicodeDecodeError) as e:
+                self.stdout.write(self.style.WARNING(f"Skipping {path}: {e}"))
+
+        clusters = defaultdict(list)
+        for path, canonical in cluster_signatures(signatures, options['threshold']).items():
+            clusters[canonical].append(path)
+        duplicate_clusters = sorted(
+            (members for members in clusters.values() if len(members) > 1),
+            key=len, reverse=True
+        )
+
+        for members in duplicate_clusters:
+            canonical, duplicates = members[0], members[1:]
+            self.stdout.write(f"\n{os.path.basename(canonical)} ({len(duplicates)} duplicates)")
+            shown = duplicates if not options['show'] else duplicates[:options['show']]
+            for path in shown:
+                self.stdout.write(f"  - {os.path.basename(path)}")
+            if len(shown) < len(duplicates):
+                self.stdout.write(f"  ... and {len(duplicates) - len(shown)} more")
+
+        duplicates = sum(len(members) - 1 for members in duplicate_clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{len(signatures)} documents, {len(duplicate_clusters)} duplicate clusters, "
+            f"{duplicates} duplicates ({duplicates / max(len(signatures), 1):.0%} of the corpus) "
+            f"at threshold {options['threshold']}"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from knowledgebase.ingest_queue import run_workers
+
+class Command(BaseCommand):
+    help = 'Run background workers that ingest uploaded AI documents into Weaviate'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.INGEST_WORKER_CONCURRENCY,
+            help='Number of documents ingested in parallel by this worker'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.INGEST_POLL_INTERVAL_SECONDS,
+            help='Seconds to wait before polling an empty queue again'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling forever'
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write(f"Starting ingest worker with concurrency {options['concurrency']}...")
+        processed = run_workers(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Ingest worker stopped after processing {processed} documents'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0004_embeddingcacheentry'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='embeddingcacheentry',
+            old_name='hit_count',
+            new_name='touch_count',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledgebase', '0005_rename_hit_count_embeddingcacheentry_touch_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aidocument',
+            name='ingest_requeue',
+            field=models.BooleanField(default=False),
+        ),
+    ]
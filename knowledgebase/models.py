@@ -1,10 +1,22 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 # Create your models here.
 User = get_user_model()
 
 class AIDocument(models.Model):
+    INGEST_PENDING = 'pending'
+    INGEST_PROCESSING = 'processing'
+    INGEST_DONE = 'done'
+    INGEST_FAILED = 'failed'
+    INGEST_STATUS_CHOICES = [
+        (INGEST_PENDING, 'Pending'),
+        (INGEST_PROCESSING, 'Processing'),
+        (INGEST_DONE, 'Done'),
+        (INGEST_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=255)
     uploaded_by = models.ForeignKey(
         User,
@@ -15,5 +27,40 @@ class AIDocument(models.Model):
     document = models.FileField(upload_to='documents/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Background ingestion job state (see knowledgebase.ingest_queue)
+    ingest_status = models.CharField(max_length=20, choices=INGEST_STATUS_CHOICES, default=INGEST_PENDING)
+    ingest_attempts = models.PositiveIntegerField(default=0)
+    ingest_error = models.TextField(blank=True)
+    ingest_available_at = models.DateTimeField(default=timezone.now)  # earliest time the job may be (re)tried
+    ingest_started_at = models.DateTimeField(null=True, blank=True)
+    ingest_finished_at = models.DateTimeField(null=True, blank=True)
+    ingest_requeue = models.BooleanField(default=False)  # file replaced mid-run: ingest again once the run ends
+
     def __str__(self):
         return self.title
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingest_status', 'ingest_available_at'], name='aidocument_ingest_queue_idx'),
+        ]
+
+
+class EmbeddingCacheEntry(models.Model):
+    """Shared, persistent tier of the embedding cache (see knowledgebase.embedding_cache)"""
+    model = models.CharField(max_length=100)
+    dimensions = models.PositiveIntegerField()
+    text_hash = models.CharField(max_length=64)  # SHA-256 of the normalized text
+    vector = models.BinaryField()  # packed float32 or float16 values
+    dtype = models.CharField(max_length=10, default='float32')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Times last_used_at was refreshed, i.e. at most one per TOUCH_INTERVAL of use; not a hit counter
+    touch_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model}/{self.dimensions}/{self.text_hash[:12]}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'dimensions', 'text_hash'], name='unique_embedding_cache_key'),
+        ]
@@ -0,0 +1,75 @@
+# knowledgebase/rate_limiter.py
+import random
+import threading
+import time
+import logging
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# OpenAI errors that are worth retrying; anything else fails immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount):
+        """Take ``amount`` tokens, returning how long the caller must wait before using them"""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Limits calls to both a requests-per-minute and a tokens-per-minute quota"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens=0):
+        """Block until one request carrying ``tokens`` tokens fits in both quotas"""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def call_with_backoff(func, *args, max_retries=5, base_delay=1.0, max_delay=60.0, **kwargs):
+    """Call ``func`` retrying retryable OpenAI errors with exponential backoff and jitter"""
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            logger.warning(f"{type(e).__name__} on attempt {attempt}/{max_retries}, retrying in {delay:.1f}s")
+            time.sleep(delay)
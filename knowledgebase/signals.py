@@ -1,14 +1,31 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 from .models import AIDocument
-from .document_processor import process_text_document
+from .ingest_queue import enqueue_document
+
+
+@receiver(post_init, sender=AIDocument)
+def remember_document_file(sender, instance, **kwargs):
+    """Remember the loaded file name so a save can tell whether it was replaced"""
+    # Reading a deferred field would cost a query per row; such saves count as a replacement
+    deferred = 'document' in instance.get_deferred_fields()
+    instance._loaded_document_name = None if deferred else instance.document.name
+
 
 @receiver(post_save, sender=AIDocument)
-def process_document(sender, instance, created, **kwargs):
-    """Process document after it's saved"""
-    if created and instance.document:
-        # Get the file path
-        file_path = instance.document.path
-        
-        # Process the document
-        process_text_document(file_path)
+def process_document(sender, instance, created, update_fields=None, **kwargs):
+    """Queue the document for background ingestion after it's saved"""
+    file_changed = instance.document.name != instance._loaded_document_name
+    instance._loaded_document_name = instance.document.name
+    if not instance.document:
+        return
+
+    if created:
+        # New rows start out pending; the run_ingest_worker command picks them up
+        return
+
+    # Re-uploading the file (e.g. in the admin) re-queues the document; saves
+    # that only edit other fields, like the title, don't.
+    # A document being ingested right now is queued again when that run ends.
+    if update_fields is None and file_changed:
+        enqueue_document(instance.pk)
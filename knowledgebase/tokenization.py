@@ -0,0 +1,40 @@
+# knowledgebase/tokenization.py
+import logging
+from functools import lru_cache
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# text-embedding-3-* and the gpt-4 family share this encoding
+ENCODING_NAME = "cl100k_base"
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Load the tokenizer once per process, or None if it cannot be loaded (e.g. offline)"""
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{ENCODING_NAME}', estimating token counts instead: {e}")
+        return None
+
+
+def count_tokens(text):
+    """Count tokens locally, falling back to a conservative estimate without a tokenizer"""
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text, max_tokens):
+    """Hard-split text that has no natural boundary into pieces of at most ``max_tokens``"""
+    encoding = get_encoding()
+    if encoding is None:
+        # Inverse of the count_tokens estimate, so every piece counts as <= max_tokens
+        step = max(1, max_tokens - 1) * 3
+        return [text[start:start + step] for start in range(0, len(text), step)]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens), max_tokens)]
@@ -1,13 +1,30 @@
 # knowledgebase/vectorization.py
-import os
-from openai import OpenAI
+import math
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from ai_assistant.utils.openai_client import get_async_openai_client, get_openai_client
+from ai_assistant.utils.single_flight import embedding_flights
+from .embedding_cache import embedding_cache, normalize_text
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+EMBEDDING_MODEL = "text-embedding-3-large"
 
-def generate_embedding(text, dimensions=1536):
-    """Generate embeddings using OpenAI's text-embedding-3-large model with consistent dimensions"""
+# Documents are embedded once at full size; the smaller named vectors are
+# derived locally (text-embedding-3 embeddings are Matryoshka-trained, so a
+# truncated and renormalized vector equals asking the API for fewer dimensions)
+EMBEDDING_DIMENSIONS = 3072
+VECTOR_DIMENSIONS = tuple(sorted(settings.EMBEDDING_VECTOR_DIMENSIONS))
+SEARCH_DIMENSIONS = settings.EMBEDDING_SEARCH_DIMENSIONS
+
+# OpenAI embeddings endpoint limits (per request / per input)
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300000
+MAX_TOKENS_PER_INPUT = 8191
+
+def generate_embedding(text, dimensions=1536, raise_errors=False):
+    """Generate embeddings using OpenAI's text-embedding-3-large model with consistent dimensions
+
+    API errors return a zero vector unless ``raise_errors`` is set.
+    """
     # Ensure dimensions is always an integer
     if dimensions is None:
         dimensions = 1536
@@ -17,31 +34,200 @@ def generate_embedding(text, dimensions=1536):
     
     # Create the embedding request with consistent dimensions for cost efficiency
     embedding_params = {
-        "model": "text-embedding-3-large",
+        "model": EMBEDDING_MODEL,
         "input": text,
         "dimensions": dimensions  # Always specify dimensions for consistency
     }
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-
-def generate_embedding(text, dimensions=1536):
-    """Generate embeddings using OpenAI's text-embedding-3-large model with consistent dimensions"""
-    # Clean the text by replacing newlines with spaces
-    text = text.replace("\n", " ")
     
-    # Create the embedding request with consistent 1536 dimensions for cost efficiency
-    embedding_params = {
-        "model": "text-embedding-3-large",
-        "input": text,
-        "dimensions": dimensions  # Always specify dimensions for consistency
-    }
+    # Identical text has been embedded before: skip the API call
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cached = embedding_cache.get(EMBEDDING_MODEL, dimensions, text)
+        if cached is not None:
+            return cached
     
-    try:
+    def create():
         # Generate the embedding
-        response = client.embeddings.create(**embedding_params)
+        response = get_openai_client().embeddings.create(**embedding_params)
+        embedding = response.data[0].embedding
+        
+        if settings.EMBEDDING_CACHE_ENABLED:
+            embedding_cache.set(EMBEDDING_MODEL, dimensions, text, embedding)
         
         # Extract and return the embedding vector
-        return response.data[0].embedding
+        return embedding
+    
+    try:
+        # Concurrent requests for the same text share one API call
+        embedding, _ = embedding_flights.do((dimensions, normalize_text(text)), create, shared=True)
+        return embedding
     except Exception as e:
         print(f"Error generating embedding: {str(e)}")
+        if raise_errors:
+            raise
         # Return a zero vector as fallback (not ideal for production)
         return [0.0] * dimensions
+
+
+async def agenerate_embedding(text, dimensions=1536, raise_errors=False):
+    """Async ``generate_embedding`` for ASGI views, using the AsyncOpenAI client"""
+    if dimensions is None:
+        dimensions = 1536
+    text = text.replace("\n", " ")
+    
+    # The cache may hit the database, which must not run on the event loop
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cached = await sync_to_async(embedding_cache.get)(EMBEDDING_MODEL, dimensions, text)
+        if cached is not None:
+            return cached
+    
+    async def create():
+        response = await get_async_openai_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=text,
+            dimensions=dimensions
+        )
+        embedding = response.data[0].embedding
+        
+        if settings.EMBEDDING_CACHE_ENABLED:
+            await sync_to_async(embedding_cache.set)(EMBEDDING_MODEL, dimensions, text, embedding)
+        
+        return embedding
+    
+    try:
+        embedding, _ = await embedding_flights.ado((dimensions, normalize_text(text)), create, shared=True)
+        return embedding
+    except Exception as e:
+        print(f"Error generating embedding: {str(e)}")
+        if raise_errors:
+            raise
+        return [0.0] * dimensions
+
+
+def estimate_tokens(text):
+    """Cheap, conservative token estimate (roughly 3 characters per token)"""
+    return len(text) // 3 + 1
+
+
+def batch_texts(texts, batch_size):
+    """Split texts into request-sized batches respecting input and token limits"""
+    batch = []
+    batch_tokens = 0
+
+    for index, text in enumerate(texts):
+        tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > MAX_TOKENS_PER_REQUEST):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((index, text))
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+
+def generate_embeddings(texts, dimensions=EMBEDDING_DIMENSIONS, batch_size=None):
+    """Generate embeddings for many texts, packing them into as few requests as possible.
+
+    Returns the vectors in the same order as ``texts``. Unlike ``generate_embedding``
+    this raises on API errors instead of returning zero vectors, so that a failed
+    batch is never written to the knowledge base.
+    """
+    if dimensions is None:
+        dimensions = EMBEDDING_DIMENSIONS
+    if batch_size is None:
+        batch_size = getattr(settings, 'EMBEDDING_BATCH_SIZE', MAX_INPUTS_PER_REQUEST)
+    batch_size = max(1, min(batch_size, MAX_INPUTS_PER_REQUEST))
+
+    def embed_uncached(missing_texts):
+        embeddings = [None] * len(missing_texts)
+        for batch in batch_texts(missing_texts, batch_size):
+            vectors = embed_batch([text for _, text in batch], dimensions=dimensions)
+            for (original_index, _), vector in zip(batch, vectors):
+                embeddings[original_index] = vector
+        return embeddings
+
+    return embed_with_cache(texts, dimensions, embed_uncached)
+
+
+def embed_with_cache(texts, dimensions, embed_func):
+    """Serve texts from the embedding cache, calling ``embed_func`` only for the misses.
+
+    ``embed_func`` takes a list of texts and returns their vectors in order.
+    """
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embed_func(texts)
+
+    vectors = embedding_cache.get_many(EMBEDDING_MODEL, dimensions, texts)
+
+    # Texts that normalize to the same cache key are embedded once
+    missing = {}
+    for index, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(normalize_text(texts[index]), []).append(index)
+
+    if missing:
+        missing_texts = [texts[indexes[0]] for indexes in missing.values()]
+        fresh = embed_func(missing_texts)
+        embedding_cache.set_many(EMBEDDING_MODEL, dimensions, missing_texts, fresh)
+        for indexes, vector in zip(missing.values(), fresh):
+            for index in indexes:
+                vectors[index] = vector
+    return vectors
+
+
+def embed_batch(texts, dimensions=EMBEDDING_DIMENSIONS, max_retries=None):
+    """Embed one request-sized batch of texts (see ``batch_texts``), preserving order.
+
+    ``max_retries`` overrides the shared client's retry policy, e.g. 0 for
+    callers that run their own backoff.
+    """
+    client = get_openai_client()
+    if max_retries is not None:
+        client = client.with_options(max_retries=max_retries)
+    response = client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=[text.replace("\n", " ") for text in texts],
+        dimensions=dimensions
+    )
+    # The API returns one item per input, tagged with its position in the request
+    vectors = [None] * len(texts)
+    for item in response.data:
+        vectors[item.index] = item.embedding
+    return vectors
+
+
+def vector_name(dimensions):
+    """Name of the Weaviate named vector holding embeddings of this size"""
+    return f"dim_{dimensions}"
+
+
+def truncate_embedding(vector, dimensions):
+    """Shorten an embedding to ``dimensions`` and renormalize it to unit length"""
+    truncated = vector[:dimensions]
+    norm = math.sqrt(sum(value * value for value in truncated))
+    if norm == 0:
+        return list(truncated)
+    return [value / norm for value in truncated]
+
+
+def derive_named_vectors(vector):
+    """Derive every stored named vector from one full-size embedding"""
+    return {
+        vector_name(dimensions): truncate_embedding(vector, dimensions)
+        for dimensions in VECTOR_DIMENSIONS
+    }
+
+
+def resolve_search_dimensions(dimensions=None):
+    """Map requested query dimensions onto the closest stored named vector.
+
+    Exact matches are used as-is; otherwise the smallest stored size that is
+    at least as large is chosen (or the largest available).
+    """
+    if dimensions is None:
+        return SEARCH_DIMENSIONS
+    for stored in VECTOR_DIMENSIONS:
+        if stored >= dimensions:
+            return stored
+    return VECTOR_DIMENSIONS[-1]